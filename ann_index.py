@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+语义去重的近似最近邻（ANN）后端
+使用倒排聚类（IVF）生成候选：先用球面 k-means 把句子分到若干簇，
+每个句子同时放入最近的几个簇，只在同一簇内用矩阵乘法做精确余弦校验，
+避免全量两两比较。候选生成和校验都是 NumPy 批量运算，没有逐句的 Python 循环
+"""
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+def _normalize(embeddings) -> np.ndarray:
+    """归一化为单位向量（零向量保持为零，与任何句子都不相似）"""
+    emb = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(emb, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return emb / norms
+
+
+def _nearest_centroids(emb: np.ndarray, centroids: np.ndarray, k: int,
+                       block_size: int) -> np.ndarray:
+    """
+    每个向量最近的 k 个簇中心（按块计算，内存为 O(block_size * 簇数)）
+
+    Returns:
+        形状为 (n, k) 的簇编号数组
+    """
+    result = np.empty((len(emb), k), dtype=np.int64)
+    for start in range(0, len(emb), block_size):
+        sims = emb[start:start + block_size] @ centroids.T
+        if k == 1:
+            result[start:start + block_size, 0] = sims.argmax(axis=1)
+        else:
+            result[start:start + block_size] = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    return result
+
+
+def train_centroids(emb: np.ndarray, num_clusters: int, iters: int = 1,
+                    seed: int = 0, block_size: int = 4096) -> np.ndarray:
+    """
+    球面 k-means：从随机句子初始化，按余弦相似度分配并重新计算单位长度的中心
+
+    Args:
+        emb: 已归一化的嵌入
+        num_clusters: 簇数量
+        iters: 迭代次数（去重只需要粗分簇，1 次即可明显提高召回）
+        seed: 随机种子，保证结果可复现
+        block_size: 分配时每块的句子数
+
+    Returns:
+        形状为 (num_clusters, dim) 的簇中心
+    """
+    rng = np.random.default_rng(seed)
+    num_clusters = min(num_clusters, len(emb))
+    centroids = emb[rng.choice(len(emb), num_clusters, replace=False)].copy()
+    for _ in range(iters):
+        labels = _nearest_centroids(emb, centroids, 1, block_size)[:, 0]
+        order = np.argsort(labels, kind='stable')
+        sorted_labels = labels[order]
+        starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+        sums = np.add.reduceat(emb[order], starts, axis=0)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        # 没有分到句子的簇保留原中心
+        centroids[sorted_labels[starts]] = sums / norms
+    return centroids
+
+
+def _cluster_edges(emb: np.ndarray, members: np.ndarray, threshold: float,
+                   block_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    簇内所有相似度 >= threshold 的句子对（members 升序）
+
+    按行分块，每块只与排在它之前的成员比较，大簇的内存占用也是 O(block_size * 簇大小)
+
+    Returns:
+        (较晚句子下标, 较早句子下标)
+    """
+    later, earlier = [], []
+    vectors = emb[members]
+    for start in range(0, len(members), block_size):
+        end = min(start + block_size, len(members))
+        sims = vectors[start:end] @ vectors[:end].T
+        rows, cols = np.nonzero(sims >= threshold)
+        keep = cols < rows + start
+        later.append(members[rows[keep] + start])
+        earlier.append(members[cols[keep]])
+    return np.concatenate(later), np.concatenate(earlier)
+
+
+def ivf_duplicate_assignments(embeddings, threshold: float,
+                              num_clusters: Optional[int] = None, num_probes: int = 4,
+                              kmeans_iters: int = 1, seed: int = 0,
+                              block_size: int = 512) -> Tuple[List[int], int]:
+    """
+    用 IVF 候选 + 精确校验实现贪心去重
+
+    与精确算法的规则相同：每个句子归入相似度 >= threshold 的最早保留句子，
+    但只比较至少共享一个簇的句子对，因此可能漏掉少量重复（漏掉的句子会被保留）。
+    重复句子之间的边全部保存在内存中，适合重复率不高的大语料
+
+    Args:
+        embeddings: 形状为 (n, dim) 的句子嵌入
+        threshold: 余弦相似度阈值
+        num_clusters: 簇数量，None 表示 4·√n（分簇和簇内校验的开销大致平衡）
+        num_probes: 每个句子放入的最近簇数量（越多召回越高，候选也越多）
+        kmeans_iters: k-means 迭代次数
+        seed: 随机种子
+        block_size: 分块大小（控制相似度矩阵的内存占用）
+
+    Returns:
+        (assignments, 校验的候选对数量)；assignments 中 -1 表示保留，否则为归入的保留句子下标
+    """
+    emb = _normalize(embeddings)
+    n = len(emb)
+    if n == 0:
+        return [], 0
+
+    if num_clusters is None:
+        num_clusters = int(4 * np.sqrt(n))
+    num_clusters = max(1, min(num_clusters, n))
+    num_probes = max(1, min(num_probes, num_clusters))
+
+    centroids = train_centroids(emb, num_clusters, kmeans_iters, seed)
+    probes = _nearest_centroids(emb, centroids, num_probes, block_size)
+
+    # 按 (簇, 句子下标) 排序，得到每个簇升序排列的成员
+    clusters = probes.ravel()
+    items = np.repeat(np.arange(n), num_probes)
+    order = np.lexsort((items, clusters))
+    clusters = clusters[order]
+    items = items[order]
+    bounds = np.flatnonzero(clusters[1:] != clusters[:-1]) + 1
+
+    later, earlier = [], []
+    verified = 0
+    for members in np.split(items, bounds):
+        if len(members) < 2:
+            continue
+        verified += len(members) * (len(members) - 1) // 2
+        cluster_later, cluster_earlier = _cluster_edges(emb, members, threshold, block_size)
+        later.append(cluster_later)
+        earlier.append(cluster_earlier)
+
+    assignments = [-1] * n
+    if not later:
+        return assignments, verified
+
+    # 同一对句子可能出现在多个簇中，重复的边不影响结果
+    later = np.concatenate(later)
+    earlier = np.concatenate(earlier)
+    order = np.lexsort((earlier, later))
+    # 按原始顺序处理：较早的句子已确定是否保留，归入第一个仍被保留的相似句子
+    for i, j in zip(later[order].tolist(), earlier[order].tolist()):
+        if assignments[i] < 0 and assignments[j] < 0:
+            assignments[i] = j
+
+    return assignments, verified
+
+
+def assignment_recall(exact: List[int], approx: List[int]) -> Tuple[float, float]:
+    """
+    比较近似去重与精确去重的结果
+
+    Args:
+        exact: 精确算法的 assignments
+        approx: 近似算法在同一批句子上的 assignments
+
+    Returns:
+        (重复召回率, 完全一致率)：前者为精确算法判为重复的句子中近似算法同样判为重复的比例，
+        后者为两者 assignment 完全相同的句子比例
+    """
+    if not exact:
+        return 1.0, 1.0
+    exact_dups = [i for i, target in enumerate(exact) if target >= 0]
+    found = sum(1 for i in exact_dups if approx[i] >= 0)
+    recall = found / len(exact_dups) if exact_dups else 1.0
+    agreement = sum(1 for a, b in zip(exact, approx) if a == b) / len(exact)
+    return recall, agreement
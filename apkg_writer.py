@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+直接写出 .apkg 文件
+genanki.Package.write_to_file 要求所有媒体先作为文件放在磁盘上再整体读入；
+这里只借用 genanki 生成 collection.anki2，媒体直接从音频缓存路径或内存中的字节写入 ZIP。
+MP3 已经是压缩格式，媒体条目使用 ZIP_STORED，不再浪费 CPU 做 deflate
+"""
+
+import os
+import json
+import time
+import sqlite3
+import zipfile
+import tempfile
+import itertools
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Union
+
+import genanki
+
+
+MediaSource = Union[str, Path, bytes, Callable[[], bytes]]  # 路径、字节，或写入时才读取的函数
+
+
+class ApkgWriter:
+    """
+    收集媒体来源并导出 .apkg
+
+    媒体以 Anki 中的文件名为键，同名只写入一次（多个卡片共用同一音频时不会重复存储）
+    """
+
+    def __init__(self):
+        self.media: Dict[str, MediaSource] = {}
+        self.media_bytes = 0  # 上次导出写入的媒体字节数
+        self.elapsed = 0.0  # 上次导出耗时（秒）
+
+    def add_media(self, name: str, source: MediaSource) -> None:
+        """
+        添加一个媒体文件
+
+        Args:
+            name: 卡片中引用的文件名（[sound:name]）
+            source: 文件路径（如音频缓存中的文件）、MP3 字节，
+                    或无参函数（写入时才调用，例如从另一个 .apkg 中读取）
+        """
+        self.media.setdefault(name, source)
+
+    def write(self, decks: Union[genanki.Deck, Iterable[genanki.Deck]], output_path: Path,
+              timestamp: Optional[float] = None) -> Path:
+        """
+        导出 .apkg（先写入同目录临时文件，完成后原子替换）
+
+        Args:
+            decks: 一个或多个牌组
+            output_path: 输出文件路径
+            timestamp: 卡片的创建时间戳，默认为当前时间
+
+        Returns:
+            输出文件路径
+        """
+        decks = [decks] if isinstance(decks, genanki.Deck) else list(decks)
+        if timestamp is None:
+            timestamp = time.time()
+
+        fd, db_name = tempfile.mkstemp(suffix=".anki2")
+        os.close(fd)
+        try:
+            conn = sqlite3.connect(db_name)
+            try:
+                genanki.Package(decks).write_to_db(conn.cursor(), timestamp,
+                                                  itertools.count(int(timestamp * 1000)))
+                conn.commit()
+            finally:
+                conn.close()
+            return self.write_collection(db_name, output_path)
+        finally:
+            os.unlink(db_name)
+
+    def write_collection(self, db_path: Union[str, Path], output_path: Path) -> Path:
+        """
+        把已有的 collection.anki2 数据库和收集的媒体打包成 .apkg
+
+        Args:
+            db_path: Anki 集合数据库文件
+            output_path: 输出文件路径
+
+        Returns:
+            输出文件路径
+        """
+        start = time.perf_counter()
+        output_path = Path(output_path)
+        tmp_out = None
+        try:
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_out = tempfile.mkstemp(dir=output_path.parent, suffix=".apkg.tmp")
+            os.close(fd)
+            names = list(self.media)
+            self.media_bytes = 0
+            with zipfile.ZipFile(tmp_out, 'w') as z:
+                # 数据库和媒体清单压缩效果好，媒体本身原样存储
+                z.write(db_path, 'collection.anki2', compress_type=zipfile.ZIP_DEFLATED)
+                z.writestr('media', json.dumps({str(i): name for i, name in enumerate(names)}),
+                           compress_type=zipfile.ZIP_DEFLATED)
+                for i, name in enumerate(names):
+                    source = self.media[name]
+                    if callable(source):
+                        source = source()
+                    if isinstance(source, bytes):
+                        z.writestr(str(i), source, compress_type=zipfile.ZIP_STORED)
+                        self.media_bytes += len(source)
+                    else:
+                        z.write(source, str(i), compress_type=zipfile.ZIP_STORED)
+                        self.media_bytes += os.path.getsize(source)
+            os.replace(tmp_out, output_path)
+            tmp_out = None
+        finally:
+            if tmp_out is not None and os.path.exists(tmp_out):
+                os.unlink(tmp_out)
+
+        self.elapsed = time.perf_counter() - start
+        return output_path
+
+    def summary(self) -> str:
+        """返回上次导出的媒体统计"""
+        return f"{len(self.media)} 个媒体文件，{self.media_bytes / 1024 / 1024:.1f} MB（不压缩），耗时 {self.elapsed:.2f}s"
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TTS 音频持久缓存
+以 (文本, 语音, 语速, 音调) 的完整哈希为键，跨运行复用已合成的 MP3，
+并按总大小 / 存放时间做 LRU 淘汰
+"""
+
+import os
+import time
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from mp3_utils import validate_mp3
+
+
+# ============= 默认配置 =============
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024  # 缓存总大小上限：500 MB
+DEFAULT_MAX_AGE_DAYS = 90              # 超过此天数未被使用的条目会被淘汰
+TMP_GRACE_SECONDS = 3600               # 临时文件超过此时间未修改才视为中断写入的遗留（其他进程可能正在写入）
+
+
+class AudioCache:
+    """
+    基于内容寻址的音频缓存
+
+    文件按键的前两位分片存放: <cache_dir>/<key[:2]>/<key>.mp3
+    命中时刷新文件 mtime，淘汰时按 mtime 从旧到新删除，即 LRU；
+    读写时都会校验 MP3 帧头和时长，损坏的条目不会被返回
+    """
+
+    def __init__(self, cache_dir: Path,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age_days: float = DEFAULT_MAX_AGE_DAYS):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self.corrupt = 0  # 校验失败被删除的缓存条目数
+
+    @staticmethod
+    def make_key(text: str, voice: str, rate: str = "+0%", pitch: str = "+0Hz") -> str:
+        """
+        计算缓存键（SHA-256）
+
+        Args:
+            text: 要合成的文本
+            voice: Edge-TTS 语音名称
+            rate: 语速
+            pitch: 音调
+
+        Returns:
+            64 位十六进制哈希字符串
+        """
+        payload = "\x1f".join([text, voice, rate, pitch])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def media_name(cls, text: str, voice: str, rate: str = "+0%", pitch: str = "+0Hz") -> str:
+        """
+        音频在卡片包中的文件名（与缓存文件同名，由内容哈希决定）
+
+        相同句子在不同牌组、不同生成器中得到相同的文件名，
+        Anki 媒体文件夹中只保存一份，也不会与其他牌组的文件重名冲突
+        """
+        return f"{cls.make_key(text, voice, rate, pitch)}.mp3"
+
+    def path_for(self, key: str) -> Path:
+        """返回缓存键对应的文件路径"""
+        return self.cache_dir / key[:2] / f"{key}.mp3"
+
+    def get(self, text: str, voice: str, rate: str = "+0%", pitch: str = "+0Hz") -> Optional[Path]:
+        """
+        查询缓存
+
+        Returns:
+            命中返回缓存文件路径，未命中返回 None
+        """
+        path = self.path_for(self.make_key(text, voice, rate, pitch))
+        try:
+            problem = validate_mp3(path.read_bytes())
+            if problem is None:
+                # 刷新 mtime，作为 LRU 的访问时间
+                os.utime(path, None)
+                self.hits += 1
+                return path
+            print(f"  警告: 音频缓存损坏，已删除 ({path.name}): {problem}")
+            self.corrupt += 1
+            path.unlink()
+        except OSError:
+            pass
+        self.misses += 1
+        return None
+
+    def put(self, text: str, voice: str, rate: str, pitch: str, src: Path) -> Optional[Path]:
+        """
+        将已生成的音频文件写入缓存（先写临时文件再原子替换）
+
+        Returns:
+            缓存文件路径，写入失败返回 None
+        """
+        try:
+            data = src.read_bytes()
+        except OSError as e:
+            print(f"  警告: 写入音频缓存失败 ({src.name}): {e}")
+            return None
+        return self.put_data(text, voice, rate, pitch, data, label=src.name)
+
+    def put_data(self, text: str, voice: str, rate: str, pitch: str, data: bytes,
+                 label: str = "") -> Optional[Path]:
+        """
+        将内存中的音频直接写入缓存（批量合成切分出的片段无需先落盘到临时目录）
+
+        Args:
+            data: MP3 字节
+            label: 日志中显示的名称
+
+        Returns:
+            缓存文件路径，音频无效或写入失败返回 None
+        """
+        path = self.path_for(self.make_key(text, voice, rate, pitch))
+        problem = validate_mp3(data)
+        if problem is not None:
+            print(f"  警告: 音频无效，不写入缓存 ({label or path.name}): {problem}")
+            return None
+        tmp_name = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_name, path)
+            return path
+        except OSError as e:
+            print(f"  警告: 写入音频缓存失败 ({label or path.name}): {e}")
+            if tmp_name is not None and os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            return None
+
+    def evict(self) -> int:
+        """
+        淘汰过期条目，并在总大小超限时按最久未使用顺序删除
+
+        Returns:
+            删除的文件数
+        """
+        if not self.cache_dir.exists():
+            return 0
+
+        entries = []
+        for path in self.cache_dir.glob("*/*.mp3"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        # 清理中断写入遗留的临时文件；较新的可能是另一个进程（如并行的 Part 1 / Part 2）正在写入
+        tmp_cutoff = time.time() - TMP_GRACE_SECONDS
+        for tmp in self.cache_dir.glob("*/*.tmp"):
+            try:
+                if tmp.stat().st_mtime < tmp_cutoff:
+                    tmp.unlink()
+            except OSError:
+                pass
+
+        removed = 0
+        total = sum(size for _, size, _ in entries)
+        cutoff = time.time() - self.max_age_days * 86400
+        entries.sort()  # 最久未使用的排在最前
+
+        for mtime, size, path in entries:
+            if mtime >= cutoff and total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+
+        return removed
+
+    def summary(self) -> str:
+        """返回本次运行的命中统计"""
+        summary = f"命中 {self.hits} 次，未命中 {self.misses} 次"
+        if self.corrupt:
+            summary += f"，删除损坏条目 {self.corrupt} 个"
+        return summary
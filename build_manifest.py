@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量构建清单
+记录上次构建中每个问题-回答对和每个句子的内容哈希，以及句子的翻译和关键词；
+再次构建时与清单比较，只有新增或修改的句子才需要请求 DeepSeek，其余直接复用。
+同时记录每张卡片（按 GUID）的内容哈希，用于导出只包含变化卡片的增量包
+"""
+
+import json
+import time
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+MANIFEST_VERSION = 1
+
+
+def content_hash(*parts: str) -> str:
+    """多个字符串的内容哈希（以 \\x1f 分隔，避免拼接歧义）"""
+    return hashlib.sha256("\x1f".join(parts).encode('utf-8')).hexdigest()[:32]
+
+
+class BuildManifest:
+    """
+    构建清单（JSON 文件）
+
+    fingerprint 代表生成结果的所有配置（模型、温度、提示词模板等），
+    与上次构建不同时旧的句子结果全部作废，问题-回答对的记录仍用于报告差异
+    """
+
+    def __init__(self, path: Path, fingerprint: str):
+        """
+        Args:
+            path: 清单文件路径
+            fingerprint: 当前配置的指纹
+        """
+        self.path = Path(path)
+        self.fingerprint = fingerprint
+        self._previous_qa: Dict[str, Dict] = {}
+        self._previous_sentences: Dict[str, Dict] = {}
+        self._qa: Dict[str, Dict] = {}
+        self._sentences: Dict[str, Dict] = {}
+        self._previous_notes: Dict[str, str] = {}
+        self._notes: Dict[str, str] = {}
+        self.reused = 0
+        self.recorded = 0
+        self.stale = False  # 配置变化导致旧结果作废
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"  警告: 构建清单损坏，将完整重建: {e}")
+            return
+        if data.get("version") != MANIFEST_VERSION:
+            return
+        self._previous_qa = data.get("qa", {})
+        self._previous_notes = data.get("notes", {})
+        if data.get("fingerprint") == self.fingerprint:
+            self._previous_sentences = data.get("sentences", {})
+        else:
+            self.stale = True
+
+    @staticmethod
+    def qa_key(topic: str, question: str) -> str:
+        """问题-回答对的身份（话题 + 问题），回答内容变化时身份不变"""
+        return content_hash(topic, question)
+
+    def diff_qa(self, qa_pairs: List[Dict[str, str]]) -> Tuple[int, int, int, int]:
+        """
+        与上次构建比较问题-回答对
+
+        Returns:
+            (新增, 修改, 删除, 未变) 的数量
+        """
+        added = changed = unchanged = 0
+        seen = set()
+        for qa in qa_pairs:
+            key = self.qa_key(qa['topic'], qa['question'])
+            seen.add(key)
+            previous = self._previous_qa.get(key)
+            if previous is None:
+                added += 1
+            elif previous["hash"] != content_hash(qa['answer']):
+                changed += 1
+            else:
+                unchanged += 1
+        removed = sum(1 for key in self._previous_qa if key not in seen)
+        return added, changed, removed, unchanged
+
+    def record_qa(self, qa: Dict[str, str], sentences: List[str]) -> None:
+        """记录一个问题-回答对及其拆出的句子哈希"""
+        self._qa[self.qa_key(qa['topic'], qa['question'])] = {
+            "topic": qa['topic'],
+            "question": qa['question'],
+            "hash": content_hash(qa['answer']),
+            "sentences": [content_hash(sentence) for sentence in sentences],
+        }
+
+    def lookup(self, sentence: str) -> Optional[Dict[str, str]]:
+        """
+        查找上次构建中该句子的结果
+
+        Returns:
+            {english, chinese, keywords} 的副本；不存在或配置已变化时返回 None
+        """
+        entry = self._previous_sentences.get(content_hash(sentence))
+        if entry is None or entry.get("english") != sentence:
+            return None
+        self.reused += 1
+        self._sentences[content_hash(sentence)] = entry
+        return {"english": entry["english"], "chinese": entry["chinese"], "keywords": entry["keywords"]}
+
+    def record(self, item: Dict[str, str]) -> None:
+        """记录一个新生成的句子结果"""
+        self._sentences[content_hash(item['english'])] = {
+            "english": item['english'],
+            "chinese": item['chinese'],
+            "keywords": item['keywords'],
+        }
+        self.recorded += 1
+
+    def note_changed(self, guid: str, digest: str) -> bool:
+        """卡片是新增的，或内容哈希与上次构建不同"""
+        return self._previous_notes.get(guid) != digest
+
+    def record_note(self, guid: str, digest: str) -> None:
+        """记录一张卡片的内容哈希"""
+        self._notes[guid] = digest
+
+    def save(self) -> None:
+        """
+        写回清单（只包含本次构建用到的问题和句子，删除的内容随之清除）
+
+        先写入临时文件再替换，避免中断时留下损坏的清单
+        """
+        data = {
+            "version": MANIFEST_VERSION,
+            "fingerprint": self.fingerprint,
+            "built_at": time.time(),
+            "qa": self._qa,
+            "sentences": self._sentences,
+            "notes": self._notes,
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        tmp_path.replace(self.path)
+
+    def summary(self) -> str:
+        """返回本次构建的复用统计"""
+        note = "（配置已变化，旧结果作废）" if self.stale else ""
+        return f"复用 {self.reused} 个句子，新生成 {self.recorded} 个{note}"
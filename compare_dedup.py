@@ -5,10 +5,13 @@
 import re
 import sys
 from difflib import SequenceMatcher
+from pathlib import Path
 from typing import List, Dict, Tuple, Set
-from sentence_transformers import SentenceTransformer
 import numpy as np
 
+from embedding_cache import EmbeddingStore
+from model_registry import get_sentence_model
+
 # ---------- 旧算法 ----------
 def similarity(a: str, b: str) -> float:
     return SequenceMatcher(None, a.lower(), b.lower()).ratio()
@@ -98,10 +101,10 @@ def deduplicate_sentences_old(qa_pairs: List[Dict[str, str]], threshold: float =
     return unique_sentences, source_map
 
 # ---------- 新算法 ----------
-model = SentenceTransformer('all-MiniLM-L6-v2')
+embedding_store = EmbeddingStore(Path(".cache") / "embeddings", 'all-MiniLM-L6-v2')
 
 def compute_embeddings(sentences: List[str]) -> np.ndarray:
-    return model.encode(sentences, convert_to_tensor=False)
+    return embedding_store.encode(sentences, lambda: get_sentence_model('all-MiniLM-L6-v2'))
 
 def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
     from numpy import dot
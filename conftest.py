@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+pytest 公共配置
+
+- 调用真实 DeepSeek / Edge-TTS 或在导入时就执行的手动检查脚本不参与收集
+- 其余测试全部离线：模拟 DeepSeek 服务器 + 假 TTS 后端 + 字符串去重；
+  part1 / part2 夹具把生成器模块的缓存、输出目录和 TTS 状态换成临时目录下的新实例，
+  测试结束后由 monkeypatch 恢复，不影响之后运行的测试
+
+运行: python -m pytest -q
+"""
+
+import os
+from pathlib import Path
+
+import pytest
+
+# 在导入生成器之前设置，模块级的默认 TTS 后端即为离线假后端
+os.environ["TTS_BACKEND"] = "fake"
+os.environ.setdefault("TTS_FAKE_LATENCY", "0.01")
+
+from audio_cache import AudioCache
+from llm_cache import LLMCache
+from mock_deepseek_server import MockConfig, start_mock_server
+from rate_limit import AdaptiveLimiter
+from tts_backends import FakeTTSBackend
+from tts_batch import BatchSynthesizer
+from tts_retry import PermanentFailureStore
+from tts_sanitize import SanitizeReport
+from tts_stream import TTSMetrics
+
+
+collect_ignore = [
+    "test_setup.py",             # 检查本机环境和 API Key
+    "test_ai_output.py",         # 以下脚本请求真实 DeepSeek / Edge-TTS
+    "test_audio_batch.py",
+    "test_audio_concurrent.py",
+    "test_audio_failure.py",
+    "test_dedup.py",             # 导入时即运行的演示脚本
+    "test_semantic_dedup.py",    # 需要 sentence-transformers 模型
+    "generate_part1_anki_backup.py",
+]
+
+
+def _isolate(module, workdir: Path, monkeypatch):
+    """
+    让生成器模块只使用 workdir 下的文件和新的 TTS 状态（无延迟的假后端）
+
+    Args:
+        module: generate_part1_anki 或 generate_anki_cards
+        workdir: 临时目录
+        monkeypatch: 测试结束时恢复所有被替换的全局变量
+
+    Yields:
+        module
+    """
+    # output/ 和 .cache/ 下的所有路径都移到临时目录
+    for name, value in list(vars(module).items()):
+        if name.isupper() and isinstance(value, Path) and value.parts[:1] in (("output",), (".cache",)):
+            monkeypatch.setattr(module, name, workdir / value)
+
+    backend = FakeTTSBackend(latency=0.0)
+    metrics = TTSMetrics()
+    max_sentences = getattr(module, "TTS_BATCH_MAX_SENTENCES", 40)
+    llm_cache = LLMCache(module.LLM_CACHE_DB)
+    monkeypatch.setattr(module, "LLM_CACHE", llm_cache)
+    monkeypatch.setattr(module, "AUDIO_CACHE", AudioCache(module.AUDIO_CACHE_DIR))
+    monkeypatch.setattr(module, "TTS_FAILURES",
+                        PermanentFailureStore(workdir / ".cache" / "tts_permanent_failures.json"))
+    monkeypatch.setattr(module, "TTS_BACKEND", backend)
+    monkeypatch.setattr(module, "TTS_METRICS", metrics)
+    monkeypatch.setattr(module, "TTS_BATCHER", BatchSynthesizer(module.VOICE, module.RATE, module.PITCH,
+                                                                max_sentences=max_sentences,
+                                                                metrics=metrics, backend=backend))
+    monkeypatch.setattr(module, "TTS_LIMITER", AdaptiveLimiter(initial=module.TTS_CONCURRENCY_INITIAL,
+                                                               max_limit=module.TTS_CONCURRENCY_MAX))
+    monkeypatch.setattr(module, "TTS_SANITIZE", SanitizeReport())
+    monkeypatch.setattr(module, "DEEPSEEK_API_KEY", "mock")
+    if hasattr(module, "_client"):
+        monkeypatch.setattr(module, "_client", None)
+    yield module
+    llm_cache.close()
+
+
+@pytest.fixture
+def part1(tmp_path, monkeypatch):
+    """
+    隔离到临时目录的 generate_part1_anki（DEEPSEEK_BASE_URL 需由测试指向模拟服务器）
+
+    使用字符串去重：语义去重需要下载 sentence-transformers 模型
+    """
+    import generate_part1_anki
+    monkeypatch.setattr(generate_part1_anki, "USE_SEMANTIC_DEDUP", False)
+    yield from _isolate(generate_part1_anki, tmp_path, monkeypatch)
+
+
+@pytest.fixture
+def part2(tmp_path, monkeypatch):
+    """隔离到临时目录的 generate_anki_cards（DEEPSEEK_BASE_URL 需由测试指向模拟服务器）"""
+    import generate_anki_cards
+    yield from _isolate(generate_anki_cards, tmp_path, monkeypatch)
+
+
+@pytest.fixture
+def mock_deepseek():
+    """
+    启动模拟 DeepSeek 服务器的工厂，测试结束时关闭
+
+    用法: server, base_url = mock_deepseek(MockConfig(latency=0.05))
+    """
+    servers = []
+
+    def start(config: MockConfig = None):
+        server, base_url = start_mock_server(0, config or MockConfig())
+        servers.append(server)
+        return server, base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
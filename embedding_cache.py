@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+句子嵌入持久缓存
+嵌入矩阵保存为可内存映射的 .npy 文件，另用 JSON 保存 哈希 → 行号 的索引，
+键为 (模型名, 规范化句子)。只有新句子才需要调用 model.encode
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+
+def normalize_for_embedding(sentence: str) -> str:
+    """规范化句子（合并空白），避免仅空白不同的句子重复编码"""
+    return " ".join(sentence.split())
+
+
+class EmbeddingStore:
+    """
+    按模型分目录保存的嵌入缓存
+
+    目录结构: <cache_dir>/<模型名>/embeddings.npy + index.json
+    各脚本使用同一个 .cache/embeddings 目录，共用已编码的句子
+    """
+
+    def __init__(self, cache_dir: Path, model_name: str):
+        self.model_name = model_name
+        self.dir = Path(cache_dir) / model_name.replace("/", "__")
+        self.matrix_path = self.dir / "embeddings.npy"
+        self.index_path = self.dir / "index.json"
+        self.hits = 0
+        self.misses = 0
+        self._index: Optional[Dict[str, int]] = None
+        self._matrix: Optional[np.ndarray] = None
+
+    def key_for(self, sentence: str) -> str:
+        """计算 (模型名, 规范化句子) 的哈希键"""
+        payload = self.model_name + "\x1f" + normalize_for_embedding(sentence)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def _load(self) -> None:
+        """惰性加载索引和内存映射矩阵"""
+        if self._index is not None:
+            return
+        self._index = {}
+        self._matrix = None
+        if self.index_path.exists() and self.matrix_path.exists():
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                matrix = np.load(self.matrix_path, mmap_mode='r')
+                # 索引与矩阵不一致时视为损坏，丢弃整个缓存
+                # （矩阵可以多出行：写入矩阵后、写入索引前中断时，旧行仍然有效）
+                rows = list(index.values())
+                if (rows and matrix.ndim == 2 and len(set(rows)) == len(rows)
+                        and all(isinstance(r, int) and 0 <= r < len(matrix) for r in rows)):
+                    self._index = index
+                    self._matrix = matrix
+            except (OSError, ValueError) as e:
+                print(f"  警告: 嵌入缓存损坏，将重新编码: {e}")
+
+    def _save(self, new_keys: List[str], new_vectors: np.ndarray) -> None:
+        """把新向量追加到矩阵末尾（写入临时文件后原子替换）"""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        old_rows = 0 if self._matrix is None else len(self._matrix)
+        dim = new_vectors.shape[1]
+
+        fd, tmp_name = tempfile.mkstemp(dir=self.dir, suffix=".npy")
+        os.close(fd)
+        merged = np.lib.format.open_memmap(
+            tmp_name, mode='w+', dtype=np.float32, shape=(old_rows + len(new_vectors), dim)
+        )
+        if old_rows:
+            merged[:old_rows] = self._matrix
+        merged[old_rows:] = new_vectors
+        merged.flush()
+        del merged
+
+        for offset, key in enumerate(new_keys):
+            self._index[key] = old_rows + offset
+
+        # 先释放旧的内存映射再替换文件（Windows 下被映射的文件无法替换）
+        self._matrix = None
+        os.replace(tmp_name, self.matrix_path)
+        tmp_index = self.index_path.with_suffix(".json.tmp")
+        with open(tmp_index, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_index, self.index_path)
+        self._matrix = np.load(self.matrix_path, mmap_mode='r')
+
+    def encode(self, sentences: List[str], load_model: Callable[[], Any], **encode_kwargs) -> np.ndarray:
+        """
+        获取句子嵌入：缓存中已有的直接读取，其余调用 model.encode 后写回缓存
+
+        Args:
+            sentences: 句子列表
+            load_model: 返回 SentenceTransformer 模型的函数，只在有新句子时才调用
+            encode_kwargs: 传给 model.encode 的额外参数
+
+        Returns:
+            形状为 (len(sentences), dim) 的 float32 数组
+        """
+        self._load()
+        keys = [self.key_for(s) for s in sentences]
+
+        # 需要新编码的句子（同一批内的重复句子只编码一次）
+        pending: Dict[str, str] = {}
+        for key, sentence in zip(keys, sentences):
+            if key not in self._index and key not in pending:
+                pending[key] = normalize_for_embedding(sentence)
+
+        self.misses += len(pending)
+        self.hits += len(sentences) - sum(1 for k in keys if k in pending)
+
+        if pending:
+            vectors = load_model().encode(list(pending.values()), convert_to_tensor=False, **encode_kwargs)
+            vectors = np.asarray(vectors, dtype=np.float32)
+            if self._matrix is not None and vectors.shape[1] != self._matrix.shape[1]:
+                raise ValueError("嵌入维度与缓存不一致，请删除缓存目录: " + str(self.dir))
+            self._save(list(pending.keys()), vectors)
+
+        if not sentences:
+            return np.empty((0, 0), dtype=np.float32)
+        rows = [self._index[k] for k in keys]
+        return np.asarray(self._matrix[rows], dtype=np.float32)
+
+    def summary(self) -> str:
+        """返回本次运行的命中统计"""
+        return f"命中 {self.hits} 句，新编码 {self.misses} 句"
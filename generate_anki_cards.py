@@ -8,15 +8,27 @@
 import os
 import sys
 import json
+import argparse
 import asyncio
 import re
+import time
+import threading
 from pathlib import Path
-from typing import List, Dict
+from typing import Any, List, Dict, Optional, Tuple
 import openai
-import edge_tts
 import genanki
 from dotenv import load_dotenv
 
+from audio_cache import AudioCache
+from llm_cache import LLMCache
+from rate_limit import AdaptiveLimiter
+from tts_retry import RetryPolicy, PermanentFailureStore, run_with_retry, PERMANENT
+from tts_sanitize import SanitizeReport
+from tts_batch import BatchSynthesizer
+from tts_backends import get_backend
+from tts_stream import TTSMetrics, stream_to_file, write_atomic
+from apkg_writer import ApkgWriter
+
 
 # ============= 加载环境变量 =============
 # 从 .env 文件加载环境变量
@@ -24,14 +36,45 @@ load_dotenv()
 
 # ============= 配置项 =============
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-DEEPSEEK_BASE_URL = "https://api.deepseek.com"
+DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")  # 可指向 mock_deepseek_server.py
+LLM_MODEL = "deepseek-chat"
+LLM_TEMPERATURE = 0.3
 VOICE = "en-US-ChristopherNeural"  # Edge-TTS 语音
+RATE = "+0%"  # Edge-TTS 语速
+PITCH = "+0Hz"  # Edge-TTS 音调
+TTS_CONCURRENCY_INITIAL = 3  # Edge-TTS 初始并发数（之后按成功率和延迟自适应调整）
+TTS_CONCURRENCY_MAX = 16  # Edge-TTS 并发上限
+TTS_LIMITER = AdaptiveLimiter(initial=TTS_CONCURRENCY_INITIAL, max_limit=TTS_CONCURRENCY_MAX)
+TTS_RETRY_POLICY = RetryPolicy(max_attempts=3)  # 每个句子最多尝试 3 次（永久失败不重试）
+TTS_FAILURES = PermanentFailureStore(Path(".cache") / "tts_permanent_failures.json")  # 与 Part 1 共用
+TTS_SANITIZE = SanitizeReport()  # 合成前规范化全角标点、智能引号、中文字符等
+TTS_BATCH_MODE = True  # 多个句子合成一次，再按 WordBoundary 时间戳切成每句一个文件
+TTS_BACKEND = get_backend()  # 环境变量 TTS_BACKEND: edge（在线服务，默认）或 fake（离线测试/压测）
+TTS_METRICS = TTSMetrics()  # 每次请求的字节数、首字节延迟
+TTS_BATCHER = BatchSynthesizer(VOICE, RATE, PITCH, metrics=TTS_METRICS, backend=TTS_BACKEND)
 INPUT_FILE = Path("输入文本.md")  # 输入文本文件
 QUESTION_FILE = Path("问题本身.md")  # 雅思题目文件
 OUTPUT_DIR = Path("output")  # 输出目录
 TEMP_AUDIO_DIR = OUTPUT_DIR / "temp_audio"  # 临时音频文件目录
+TTS_SANITIZE_LOG = OUTPUT_DIR / "tts_sanitized_sentences.txt"  # TTS 预处理修改记录
+TTS_METRICS_CSV = OUTPUT_DIR / "tts_metrics.csv"  # 逐次 TTS 请求的字节数与延迟
 # OUTPUT_APKG 将根据题目动态生成
 
+# ============= 批量构建配置 =============
+BATCH_TOPIC_CONCURRENCY = 4  # --batch 模式下同时处理的话题数（共用 DeepSeek 客户端、TTS 并发控制和缓存）
+BATCH_COMBINED_APKG = OUTPUT_DIR / "IELTS_Part2_All.apkg"  # --combined 时所有话题合并导出的卡片包
+
+# ============= 音频缓存配置 =============
+AUDIO_CACHE_DIR = Path(".cache") / "tts_audio"  # 跨运行保留的音频缓存目录（与 Part 1 共用）
+AUDIO_CACHE_MAX_MB = 500  # 缓存总大小上限
+AUDIO_CACHE_MAX_AGE_DAYS = 90  # 超过此天数未使用的音频会被淘汰
+AUDIO_CACHE = AudioCache(AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_MB * 1024 * 1024, AUDIO_CACHE_MAX_AGE_DAYS)
+
+# ============= LLM 缓存配置 =============
+LLM_CACHE_DB = Path(".cache") / "llm_responses.sqlite3"  # DeepSeek 响应缓存（与 Part 1 共用）
+LLM_CACHE_TTL_DAYS = None  # 缓存有效天数，None 表示永不过期
+LLM_CACHE = LLMCache(LLM_CACHE_DB, LLM_CACHE_TTL_DAYS * 86400 if LLM_CACHE_TTL_DAYS else None)
+
 # Anki Model ID (随机生成的唯一ID)
 MODEL_ID = 1607392319
 # DECK_ID 将根据题目动态生成（使用题目哈希值确保唯一性）
@@ -125,29 +168,125 @@ def sanitize_filename(text: str) -> str:
     return first_line
 
 
+def topic_names(question: str, default_name: str = "IELTS_Speaking") -> Tuple[str, str]:
+    """
+    由题目得到输出文件名和牌组名称
+    
+    Args:
+        question: 雅思题目内容（可以为空）
+        default_name: 没有题目时使用的文件名
+        
+    Returns:
+        (输出文件名, 牌组名称) 的元组
+    """
+    if question:
+        # 获取题目第一行作为名称
+        return sanitize_filename(question), question.split('\n')[0].strip()
+    return default_name, default_name.replace('_', ' ')
+
+
 # ============= AI 拆解函数 =============
-def parse_text_with_ai(text: str, question: str) -> tuple[List[Dict[str, str]], str]:
+_client = None
+_client_lock = threading.Lock()  # 批量模式下多个话题在线程中同时请求
+
+
+def get_client() -> openai.OpenAI:
+    """
+    惰性创建 DeepSeek 客户端（全部命中缓存时无需 API Key）
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            # 检查 API Key
+            if not DEEPSEEK_API_KEY:
+                print("✗ 错误: 未设置 DEEPSEEK_API_KEY")
+                print("  请在 .env 文件中设置: DEEPSEEK_API_KEY=your-api-key-here")
+                sys.exit(1)
+            
+            _client = openai.OpenAI(
+                api_key=DEEPSEEK_API_KEY,
+                base_url=DEEPSEEK_BASE_URL
+            )
+    return _client
+
+
+def cached_completion(system_prompt: str, prompt: str, parse, refresh: bool = False):
+    """
+    带缓存的对话请求
+    
+    Args:
+        system_prompt: 系统提示词
+        prompt: 用户提示词
+        parse: 将返回文本转换为结果的函数，抛出异常表示结果无效（不会写入缓存）
+        refresh: 为 True 时跳过缓存，强制重新请求
+        
+    Returns:
+        parse 的返回值
+    """
+    cache_key = LLM_CACHE.make_key(LLM_MODEL, LLM_TEMPERATURE, system_prompt, prompt)
+    if not refresh:
+        cached = LLM_CACHE.get(cache_key)
+        if cached is not None:
+            print("✓ 命中 LLM 缓存")
+            return cached
+    
+    response = get_client().chat.completions.create(
+        model=LLM_MODEL,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=LLM_TEMPERATURE
+    )
+    
+    result = parse(response.choices[0].message.content.strip())
+    LLM_CACHE.put(cache_key, LLM_MODEL, result)
+    return result
+
+
+def parse_sentences_json(content: str) -> List[Dict[str, str]]:
+    """
+    解析并校验句子拆解结果
+    
+    Args:
+        content: API 返回的文本
+        
+    Returns:
+        句子列表
+    """
+    # 移除可能的 Markdown 代码块标记
+    content = re.sub(r'^```json\s*', '', content)
+    content = re.sub(r'^```\s*', '', content)
+    content = re.sub(r'\s*```$', '', content)
+    
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        print(f"API 返回内容:\n{content}")
+        raise
+    
+    # 验证数据结构
+    if not isinstance(data, list):
+        raise ValueError("API 返回的不是 JSON 数组")
+    for item in data:
+        if not all(key in item for key in ('english', 'chinese', 'keywords')):
+            raise ValueError("API 返回的 JSON 缺少必要字段")
+    
+    return data
+
+
+def parse_text_with_ai(text: str, question: str, refresh: bool = False) -> tuple[List[Dict[str, str]], str]:
     """
     使用 DeepSeek API 将文本拆解为句子，并生成中文翻译和关键词提示
     
     Args:
         text: 原始英文文本
         question: 雅思 Part 2 题目
+        refresh: 为 True 时跳过 LLM 缓存，强制重新请求
         
     Returns:
         (句子列表, 1分钟笔记) 的元组
     """
-    # 检查 API Key
-    if not DEEPSEEK_API_KEY:
-        print("✗ 错误: 未设置 DEEPSEEK_API_KEY")
-        print("  请在 .env 文件中设置: DEEPSEEK_API_KEY=your-api-key-here")
-        sys.exit(1)
-    
-    client = openai.OpenAI(
-        api_key=DEEPSEEK_API_KEY,
-        base_url=DEEPSEEK_BASE_URL
-    )
-    
     prompt = f"""
 你是一个雅思口语教学助手。请将下面的英文文本拆解成独立的句子，并为每个句子提供：
 1. english: 原英文句子
@@ -168,25 +307,13 @@ def parse_text_with_ai(text: str, question: str) -> tuple[List[Dict[str, str]],
     
     try:
         # 第一次调用：拆解句子
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that returns only valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3
+        data = cached_completion(
+            "You are a helpful assistant that returns only valid JSON.",
+            prompt,
+            parse_sentences_json,
+            refresh=refresh
         )
         
-        content = response.choices[0].message.content.strip()
-        
-        # 移除可能的 Markdown 代码块标记
-        content = re.sub(r'^```json\s*', '', content)
-        content = re.sub(r'^```\s*', '', content)
-        content = re.sub(r'\s*```$', '', content)
-        
-        # 解析 JSON
-        data = json.loads(content)
-        
         print(f"✓ 成功解析 {len(data)} 个句子")
         
         # 第二次调用：生成1分钟笔记
@@ -231,23 +358,18 @@ How feel: proud, inspired, help classmates
 请直接返回笔记内容。
 """
         
-        notes_response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": notes_prompt}
-            ],
-            temperature=0.3
+        notes = cached_completion(
+            "You are a helpful assistant.",
+            notes_prompt,
+            lambda content: content,
+            refresh=refresh
         )
-        
-        notes = notes_response.choices[0].message.content.strip()
         print(f"✓ 成功生成1分钟笔记")
         
         return data, notes
         
     except json.JSONDecodeError as e:
         print(f"✗ JSON 解析失败: {e}")
-        print(f"API 返回内容:\n{content}")
         raise
     except Exception as e:
         print(f"✗ API 调用失败: {e}")
@@ -255,65 +377,188 @@ How feel: proud, inspired, help classmates
 
 
 # ============= 音频生成函数 =============
-async def generate_audio(text: str, filename: Path) -> None:
+def prepare_audio(text: str) -> Tuple[Path, Optional[str]]:
     """
-    使用 Edge-TTS 生成英文语音
+    合成前的准备：预处理文本、查缓存、查永久失败记录
     
     Args:
         text: 要转换的英文文本
+        
+    Returns:
+        (音频文件路径, 需要合成的文本)；命中缓存时路径为缓存文件、文本为 None，
+        否则路径为临时目录中的输出文件。文件名与音频缓存相同，由内容哈希决定
+        
+    Raises:
+        ValueError: 文本无法朗读
+        RuntimeError: 文本已知无法合成
+    """
+    # 朗读预处理后的文本；无法朗读的文本不发送请求
+    sanitized = TTS_SANITIZE.sanitize(text)
+    if sanitized is None:
+        raise ValueError(f"句子无法朗读: {text}")
+    
+    # 命中缓存时直接使用缓存文件，打包时从缓存读取
+    cached = AUDIO_CACHE.get(sanitized, VOICE, RATE, PITCH)
+    if cached is not None:
+        print(f"  ✓ 使用缓存音频: {text[:40]}")
+        return cached, None
+    
+    filename = TEMP_AUDIO_DIR / AUDIO_CACHE.media_name(sanitized, VOICE, RATE, PITCH)
+    known = TTS_FAILURES.get(AUDIO_CACHE.make_key(sanitized, VOICE, RATE, PITCH))
+    if known is not None:
+        raise RuntimeError(f"已知无法合成的句子 ({text[:40]}): {known['reason']}")
+    return filename, sanitized
+
+
+async def synthesize_audio(text: str, filename: Path) -> Path:
+    """
+    调用 Edge-TTS 合成单个句子（按重试策略处理失败），成功后写入缓存
+    
+    Args:
+        text: 预处理后的英文文本
         filename: 输出的 MP3 文件路径
+        
+    Returns:
+        音频文件路径（写入缓存成功时为缓存文件）
     """
-    try:
-        communicate = edge_tts.Communicate(text, VOICE)
-        await communicate.save(str(filename))
-        print(f"  ✓ 生成音频: {filename.name}")
-    except Exception as e:
-        print(f"  ✗ 音频生成失败 ({filename.name}): {e}")
-        raise
+    async def synthesize():
+        communicate = TTS_BACKEND.communicate(text, VOICE, rate=RATE, pitch=PITCH)
+        # 流式写入临时文件，校验通过后才原子重命名为 filename
+        TTS_METRICS.record(await stream_to_file(communicate, filename))
+    
+    # 缓存未命中才占用并发名额，按重试策略处理失败
+    kind, error = await run_with_retry(synthesize, TTS_RETRY_POLICY, TTS_LIMITER, text[:40])
+    if kind is not None:
+        if kind == PERMANENT:
+            TTS_FAILURES.add(AUDIO_CACHE.make_key(text, VOICE, RATE, PITCH), text, repr(error))
+        print(f"  ✗ 音频生成失败 ({text[:40]}): {error}")
+        raise error
+    cached = AUDIO_CACHE.put(text, VOICE, RATE, PITCH, filename)
+    print(f"  ✓ 生成音频: {text[:40]}")
+    return cached or filename
+
+
+async def generate_audio(text: str) -> Path:
+    """
+    使用 Edge-TTS 生成英文语音
+    
+    Args:
+        text: 要转换的英文文本
+        
+    Returns:
+        音频文件路径
+    """
+    filename, sanitized = prepare_audio(text)
+    if sanitized is None:
+        return filename
+    return await synthesize_audio(sanitized, filename)
 
 
-async def generate_all_audio(sentences: List[Dict[str, str]]) -> List[Path]:
+async def generate_audio_batched(texts: List[str]) -> List[Path]:
+    """
+    批量模式：未命中缓存的句子按 TTS_BATCHER.plan 分批，每批只发一次请求；
+    某批失败或时间戳无法对齐时，该批逐句回退
+    
+    Args:
+        texts: 英文文本列表
+        
+    Returns:
+        与 texts 一一对应的音频文件路径
+    """
+    results: List[Optional[Path]] = [None] * len(texts)
+    pending = []  # (序号, 预处理后的文本, 文件路径)
+    for idx, text in enumerate(texts):
+        filename, sanitized = prepare_audio(text)
+        if sanitized is None:
+            results[idx] = filename
+        else:
+            pending.append((idx, sanitized, filename))
+    
+    async def fallback(idx: int, text: str, filename: Path):
+        results[idx] = await synthesize_audio(text, filename)
+    
+    async def run_batch(group: List[Tuple[int, str, Path]]):
+        segments = None
+        if len(group) > 1:
+            async def attempt():
+                nonlocal segments
+                segments = await TTS_BATCHER.synthesize([text for _, text, _ in group])
+            
+            await run_with_retry(attempt, TTS_RETRY_POLICY, TTS_LIMITER, f"批量 {len(group)} 句")
+        if segments is None:
+            await asyncio.gather(*[fallback(*item) for item in group])
+            return
+        
+        for (idx, text, filename), data in zip(group, segments):
+            # 片段直接写入缓存；缓存写入失败才落盘到临时目录
+            cached = AUDIO_CACHE.put_data(text, VOICE, RATE, PITCH, data, label=filename.name)
+            if cached is None:
+                write_atomic(filename, data)
+                cached = filename
+            results[idx] = cached
+        print(f"  ✓ 批量生成音频: {len(group)} 个")
+    
+    groups = [[pending[i] for i in batch] for batch in TTS_BATCHER.plan([text for _, text, _ in pending])]
+    await asyncio.gather(*[run_batch(group) for group in groups])
+    return results
+
+
+async def generate_all_audio(sentences: List[Dict[str, str]], report: bool = True) -> List[Path]:
     """
     批量生成所有句子的音频文件
     
     Args:
         sentences: 句子数据列表
+        report: 是否输出 TTS 统计并写入日志（批量模式下所有话题完成后统一输出）
         
     Returns:
-        生成的音频文件路径列表
+        生成的音频文件路径列表（以内容哈希命名，相同句子在不同牌组中共用同一文件）
     """
     TEMP_AUDIO_DIR.mkdir(parents=True, exist_ok=True)
     
-    tasks = []
-    audio_files = []
-    
-    for idx, sentence in enumerate(sentences):
-        audio_file = TEMP_AUDIO_DIR / f"audio_{idx:03d}.mp3"
-        audio_files.append(audio_file)
-        tasks.append(generate_audio(sentence["english"], audio_file))
+    texts = [sentence["english"] for sentence in sentences]
     
-    print(f"\n开始生成 {len(tasks)} 个音频文件...")
-    await asyncio.gather(*tasks)
-    print("✓ 所有音频文件生成完成\n")
+    print(f"\n开始生成 {len(texts)} 个音频文件 (初始并发: {int(TTS_LIMITER.limit)})...")
+    if TTS_BATCH_MODE:
+        audio_files = await generate_audio_batched(texts)
+    else:
+        audio_files = list(await asyncio.gather(*[generate_audio(text) for text in texts]))
+    print("✓ 所有音频文件生成完成")
+    if report:
+        report_audio_stats()
     
     return audio_files
 
 
+def report_audio_stats():
+    """输出 TTS 统计，并写入预处理记录和请求统计 CSV"""
+    print(f"  音频缓存: {AUDIO_CACHE.summary()}")
+    print(f"  TTS 并发: {TTS_LIMITER.summary()}")
+    print(f"  TTS 预处理: {TTS_SANITIZE.summary()}")
+    if TTS_BATCH_MODE:
+        print(f"  TTS 批量合成: {TTS_BATCHER.summary()}")
+    print(f"  TTS 请求: {TTS_METRICS.summary()}")
+    print()
+    TTS_SANITIZE.write(TTS_SANITIZE_LOG)
+    TTS_METRICS.write_csv(TTS_METRICS_CSV)
+
+
 # ============= Anki 卡片生成 =============
-def create_anki_deck(sentences: List[Dict[str, str]], audio_files: List[Path], one_minute_notes: str, question: str, output_filename: str, deck_name: str) -> str:
+def build_deck(sentences: List[Dict[str, str]], audio_files: List[Path], one_minute_notes: str, question: str,
+               deck_name: str, writer: ApkgWriter) -> genanki.Deck:
     """
-    创建 Anki 卡片包
+    创建一个话题的牌组，并把音频登记到 writer
     
     Args:
         sentences: 句子数据列表
         audio_files: 音频文件路径列表
         one_minute_notes: 1分钟准备笔记
         question: 雅思题目内容
-        output_filename: 输出文件名
         deck_name: 牌组名称
+        writer: 导出用的 ApkgWriter（多个牌组共用时同一音频只写入一次）
         
     Returns:
-        生成的 .apkg 文件路径
+        牌组
     """
     # 定义普通句子卡片模板
     model = genanki.Model(
@@ -416,14 +661,14 @@ def create_anki_deck(sentences: List[Dict[str, str]], audio_files: List[Path], o
     
     deck = genanki.Deck(deck_id, deck_name)
     
-    # 创建 Package
-    package = genanki.Package(deck)
-    
     print("开始创建 Anki 卡片...")
     
     # 添加普通句子卡片
     for idx, (sentence, audio_file) in enumerate(zip(sentences, audio_files)):
-        # 创建 Note
+        # GUID 由牌组名称和英文句子决定：重新导入时更新原有卡片，保留复习记录；
+        # 同一句子出现在其他话题或 Part 1 中时 GUID 不同，各牌组都保留自己的卡片
+        # （牌组 ID 由 hash() 得到，每次运行不同，不能用于 GUID）
+        guid = genanki.guid_for(deck_name, sentence['english'])
         note = genanki.Note(
             model=model,
             fields=[
@@ -431,12 +676,13 @@ def create_anki_deck(sentences: List[Dict[str, str]], audio_files: List[Path], o
                 sentence['keywords'],
                 sentence['english'],
                 f'[sound:{audio_file.name}]'
-            ]
+            ],
+            guid=guid
         )
         deck.add_note(note)
         
-        # 添加音频文件到 Package
-        package.media_files.append(str(audio_file))
+        # 添加音频文件
+        writer.add_media(audio_file.name, audio_file)
         
         print(f"  ✓ 添加句子卡片 {idx + 1}/{len(sentences)}")
     
@@ -448,25 +694,56 @@ def create_anki_deck(sentences: List[Dict[str, str]], audio_files: List[Path], o
         fields=[
             card_title,
             one_minute_notes
-        ]
+        ],
+        guid=genanki.guid_for(deck_name, '1分钟笔记')
     )
     deck.add_note(notes_card)
     print(f"  ✓ 添加1分钟笔记卡片")
     
+    return deck
+
+
+def create_anki_deck(sentences: List[Dict[str, str]], audio_files: List[Path], one_minute_notes: str, question: str, output_filename: str, deck_name: str) -> str:
+    """
+    创建 Anki 卡片包
+    
+    Args:
+        sentences: 句子数据列表
+        audio_files: 音频文件路径列表
+        one_minute_notes: 1分钟准备笔记
+        question: 雅思题目内容
+        output_filename: 输出文件名
+        deck_name: 牌组名称
+        
+    Returns:
+        生成的 .apkg 文件路径
+    """
+    # 媒体直接从音频文件写入 .apkg（MP3 不压缩存储）
+    writer = ApkgWriter()
+    deck = build_deck(sentences, audio_files, one_minute_notes, question, deck_name, writer)
+    
     # 导出 .apkg 文件
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     output_path = OUTPUT_DIR / f"{output_filename}.apkg"
-    package.write_to_file(str(output_path))
+    writer.write(deck, output_path)
     print(f"\n✓ 成功生成 Anki 包: {output_path}")
     print(f"  - {len(sentences)} 张句子卡片")
     print(f"  - 1 张1分钟笔记卡片")
+    print(f"  - {writer.summary()}")
     
     return str(output_path)
 
 
 # ============= 清理临时文件 =============
 def cleanup_temp_files():
-    """删除临时音频文件"""
+    """删除临时音频文件，并淘汰过期的音频/LLM 缓存"""
+    evicted = AUDIO_CACHE.evict()
+    if evicted:
+        print(f"✓ 音频缓存淘汰 {evicted} 个旧文件")
+    purged = LLM_CACHE.purge_expired()
+    if purged:
+        print(f"✓ LLM 缓存清除 {purged} 条过期记录")
+    
     if TEMP_AUDIO_DIR.exists():
         for file in TEMP_AUDIO_DIR.glob("*.mp3"):
             try:
@@ -481,15 +758,214 @@ def cleanup_temp_files():
             print(f"警告: 无法删除临时目录: {e}")
 
 
+# ============= 批量构建 =============
+def load_topics(source: Path) -> List[Dict[str, Any]]:
+    """
+    读取批量构建的话题列表
+    
+    source 可以是：
+    - 目录：每个子目录是一个话题，包含 输入文本.md 和（可选的）问题本身.md
+    - JSON 清单：[{"answer": "a.md", "question": "q.md", "name": "..."}, ...]，
+      路径相对于清单所在目录，question 和 name 可省略
+    
+    Args:
+        source: 目录或 JSON 清单路径
+        
+    Returns:
+        话题列表，每项包含 name, text, question, output_filename, deck_name
+        
+    Raises:
+        ValueError: 清单格式错误，或没有任何可用的话题
+    """
+    source = Path(source)
+    entries = []  # (名称, 回答文件, 题目文件)
+    if source.is_dir():
+        for topic_dir in sorted(path for path in source.iterdir() if path.is_dir()):
+            if (topic_dir / INPUT_FILE.name).exists():
+                entries.append((topic_dir.name, topic_dir / INPUT_FILE.name, topic_dir / QUESTION_FILE.name))
+    else:
+        with open(source, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if not isinstance(manifest, list):
+            raise ValueError(f"话题清单应为 JSON 数组: {source}")
+        for item in manifest:
+            if not isinstance(item, dict) or 'answer' not in item:
+                raise ValueError(f"话题清单条目缺少 answer 字段: {item}")
+            answer = source.parent / item['answer']
+            question = source.parent / item['question'] if item.get('question') else None
+            # 默认以文件名命名；回答文件沿用 输入文本.md 时以所在目录命名
+            default_name = answer.parent.name if answer.name == INPUT_FILE.name else answer.stem
+            entries.append((item.get('name') or default_name, answer, question))
+    
+    topics = []
+    used_names = set()
+    for name, answer_file, question_file in entries:
+        try:
+            text = answer_file.read_text(encoding='utf-8').strip()
+            question = ""
+            if question_file is not None and question_file.exists():
+                question = question_file.read_text(encoding='utf-8').strip()
+        except OSError as e:
+            print(f"  ✗ 跳过话题 {name}: {e}")
+            continue
+        if not text:
+            print(f"  ✗ 跳过话题 {name}: 回答文件 '{answer_file}' 是空的")
+            continue
+        
+        # 没有题目时用话题名称命名；重名的话题加序号，避免互相覆盖
+        output_filename, deck_name = topic_names(question, sanitize_filename(name))
+        unique_filename, n = output_filename, 1
+        while unique_filename.lower() in used_names:
+            n += 1
+            unique_filename = f"{output_filename}_{n}"
+        used_names.add(unique_filename.lower())
+        if n > 1:
+            deck_name = f"{deck_name} ({n})"
+        topics.append({
+            "name": name,
+            "text": text,
+            "question": question,
+            "output_filename": unique_filename,
+            "deck_name": deck_name,
+        })
+    
+    if not topics:
+        raise ValueError(f"没有找到可用的话题: {source}")
+    return topics
+
+
+async def process_topic(topic: Dict[str, Any], semaphore: asyncio.Semaphore,
+                        refresh: bool = False, write: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    处理一个话题：拆解句子、生成笔记和音频，并（可选）导出该话题的卡片包
+    
+    DeepSeek 请求是同步调用，放到线程中执行，不阻塞其他话题的音频合成；
+    所有话题共用同一个客户端、TTS 并发控制和缓存
+    
+    Args:
+        topic: load_topics 返回的话题
+        semaphore: 限制同时处理的话题数
+        refresh: 为 True 时跳过 LLM 缓存
+        write: 是否单独导出该话题的 .apkg
+        
+    Returns:
+        补充了 sentences, audio_files, notes（以及 output）的话题；失败返回 None
+    """
+    async with semaphore:
+        name = topic['name']
+        print(f"▶ 开始话题: {name}")
+        try:
+            sentences, notes = await asyncio.to_thread(parse_text_with_ai, topic['text'], topic['question'], refresh)
+            audio_files = await generate_all_audio(sentences, report=False)
+            topic.update(sentences=sentences, audio_files=audio_files, notes=notes)
+            if write:
+                topic['output'] = create_anki_deck(sentences, audio_files, notes, topic['question'],
+                                                   topic['output_filename'], topic['deck_name'])
+        except Exception as e:
+            print(f"✗ 话题失败 ({name}): {e}")
+            return None
+        print(f"✓ 话题完成: {name}（{len(sentences)} 个句子）")
+        return topic
+
+
+async def run_batch(source: Path, refresh: bool = False, combined: Optional[Path] = None,
+                    concurrency: int = BATCH_TOPIC_CONCURRENCY) -> List[str]:
+    """
+    批量构建多个 Part 2 话题
+    
+    Args:
+        source: 话题目录或 JSON 清单（见 load_topics）
+        refresh: 为 True 时跳过 LLM 缓存
+        combined: 指定时所有话题合并导出到这一个 .apkg（每个话题一个牌组，共用的音频只存一份），
+                  否则每个话题单独导出
+        concurrency: 同时处理的话题数
+        
+    Returns:
+        生成的 .apkg 文件路径列表
+        
+    Raises:
+        RuntimeError: 所有话题都失败
+    """
+    topics = load_topics(source)
+    print(f"✓ 共 {len(topics)} 个话题，同时处理 {concurrency} 个\n")
+    
+    start = time.perf_counter()
+    semaphore = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(*[
+        process_topic(topic, semaphore, refresh, write=combined is None) for topic in topics
+    ])
+    done = [topic for topic in results if topic is not None]
+    if not done:
+        raise RuntimeError("所有话题都失败了")
+    
+    if combined is None:
+        outputs = [topic['output'] for topic in done]
+    else:
+        # 按输入顺序建牌组，每个话题保留自己的全部卡片
+        print(f"\n📦 合并导出 {len(done)} 个话题...")
+        writer = ApkgWriter()
+        decks = [build_deck(topic['sentences'], topic['audio_files'], topic['notes'], topic['question'],
+                            topic['deck_name'], writer) for topic in done]
+        writer.write(decks, Path(combined))
+        print(f"\n✓ 成功生成合并 Anki 包: {combined}")
+        print(f"  - {len(decks)} 个牌组，{sum(len(topic['sentences']) for topic in done)} 张句子卡片")
+        print(f"  - {writer.summary()}")
+        outputs = [str(combined)]
+    elapsed = time.perf_counter() - start
+    
+    failed = [topic['name'] for topic, result in zip(topics, results) if result is None]
+    print(f"\n✓ 完成 {len(done)}/{len(topics)} 个话题，耗时 {elapsed:.1f}s，"
+          f"吞吐 {len(done) / elapsed * 60:.1f} 话题/分钟")
+    if failed:
+        print(f"  ✗ 失败的话题: {', '.join(failed)}")
+    report_audio_stats()
+    return outputs
+
+
 # ============= 主函数 =============
-async def main():
-    """主执行流程"""
+def parse_args() -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="雅思口语 Anki 卡片生成器")
+    parser.add_argument("--refresh-llm", action="store_true",
+                        help="忽略 LLM 缓存，重新请求 DeepSeek（结果仍会写回缓存）")
+    parser.add_argument("--retry-failed-audio", action="store_true",
+                        help="清空 TTS 永久失败记录，重新尝试之前无法合成的句子")
+    parser.add_argument("--batch", type=Path, metavar="PATH",
+                        help="批量构建：话题目录（每个子目录含 输入文本.md / 问题本身.md）或 JSON 清单")
+    parser.add_argument("--combined", type=Path, nargs="?", const=BATCH_COMBINED_APKG, metavar="APKG",
+                        help=f"批量构建时把所有话题合并为一个卡片包（默认 {BATCH_COMBINED_APKG}）")
+    parser.add_argument("--topic-concurrency", type=int, default=BATCH_TOPIC_CONCURRENCY, metavar="N",
+                        help=f"批量构建时同时处理的话题数（默认 {BATCH_TOPIC_CONCURRENCY}）")
+    args = parser.parse_args()
+    if args.combined is not None and args.batch is None:
+        parser.error("--combined 需要与 --batch 一起使用")
+    return args
+
+
+async def main(refresh_llm: bool = False, retry_failed_audio: bool = False, batch: Optional[Path] = None,
+               combined: Optional[Path] = None, topic_concurrency: int = BATCH_TOPIC_CONCURRENCY):
+    """主执行流程（指定 batch 时批量构建多个话题）"""
     print("=" * 60)
     print("雅思口语 Anki 卡片生成器".center(60))
     print("=" * 60)
     print()
     
+    if retry_failed_audio:
+        cleared = TTS_FAILURES.clear()
+        print(f"✓ 已清空 {cleared} 条 TTS 永久失败记录\n")
+    
     try:
+        if batch is not None:
+            print(f"📚 批量构建: {batch}")
+            outputs = await run_batch(batch, refresh=refresh_llm, combined=combined,
+                                      concurrency=topic_concurrency)
+            print()
+            print("=" * 60)
+            print("✅ 全部完成！".center(60))
+            print(f"生成 {len(outputs)} 个卡片包".center(60))
+            print("=" * 60)
+            return
+        
         # Step 0: 读取输入文件
         print("📄 Step 0: 读取输入文件...")
         raw_text = load_input_text()
@@ -498,7 +974,7 @@ async def main():
         
         # Step 1: 调用 AI 拆解文本并生成1分钟笔记
         print("📝 Step 1: 使用 DeepSeek API 拆解文本...")
-        sentences, one_minute_notes = parse_text_with_ai(raw_text, question)
+        sentences, one_minute_notes = parse_text_with_ai(raw_text, question, refresh=refresh_llm)
         print()
         
         # Step 2: 生成音频文件
@@ -506,16 +982,11 @@ async def main():
         audio_files = await generate_all_audio(sentences)
         
         # Step 3: 生成输出文件名和牌组名称
+        output_filename, deck_name = topic_names(question)
         if question:
-            # 获取题目第一行作为名称
-            question_first_line = question.split('\n')[0].strip()
-            output_filename = sanitize_filename(question)
-            deck_name = question_first_line
             print(f"📝 输出文件名: {output_filename}.apkg")
             print(f"📚 牌组名称: {deck_name}")
         else:
-            output_filename = "IELTS_Speaking"
-            deck_name = "IELTS Speaking"
             print(f"📝 使用默认文件名: {output_filename}.apkg")
             print(f"📚 使用默认牌组名称: {deck_name}")
         
@@ -545,4 +1016,6 @@ async def main():
 
 # ============= 程序入口 =============
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    args = parse_args()
+    asyncio.run(main(refresh_llm=args.refresh_llm, retry_failed_audio=args.retry_failed_audio,
+                     batch=args.batch, combined=args.combined, topic_concurrency=args.topic_concurrency))
\ No newline at end of file
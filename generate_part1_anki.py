@@ -8,39 +8,97 @@
 import os
 import sys
 import json
+import argparse
 import asyncio
 import re
-import hashlib
+import time
+import heapq
+import bisect
 from pathlib import Path
-from typing import List, Dict, Tuple, Set, Optional
+from typing import Callable, List, Dict, Tuple, Set, Optional, Union
 from difflib import SequenceMatcher
 import openai
-import edge_tts
 import genanki
 from dotenv import load_dotenv
 
-# 尝试导入 sentence-transformers（用于语义去重）
+import model_registry
+from audio_cache import AudioCache
+from llm_cache import LLMCache
+from llm_batching import SENTENCE_BOUNDARY_RE, TokenBudgetBatcher, TruncatedResponseError, split_batch
+from json_salvage import PartialResponseError, salvage_json_array
+from build_manifest import BuildManifest, content_hash
+from apkg_writer import ApkgWriter
+from rate_limit import TokenBucket, AdaptiveLimiter
+from tts_retry import RetryPolicy, PermanentFailureStore, run_with_retry, PERMANENT, INVALID
+from tts_sanitize import SanitizeReport
+from tts_batch import BatchSynthesizer
+from tts_backends import get_backend
+from tts_stream import TTSMetrics, stream_to_file, write_atomic
+
+# 检查 sentence-transformers 是否可用（用于语义去重）
+# 只检查是否安装，真正的导入（连带 torch）推迟到首次需要编码新句子时；
+# 导入失败时 model_registry 把它报告为不可用，回退到字符串去重
 try:
-    from sentence_transformers import SentenceTransformer
     import numpy as np
-    SEMANTIC_AVAILABLE = True
 except ImportError:
-    SEMANTIC_AVAILABLE = False
-    SentenceTransformer = None
     np = None
 
+SEMANTIC_AVAILABLE = np is not None and model_registry.is_available()
+
 
 # ============= 加载环境变量 =============
 load_dotenv()
 
 # ============= 配置项 =============
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-DEEPSEEK_BASE_URL = "https://api.deepseek.com"
+DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")  # 可指向 mock_deepseek_server.py
+LLM_MODEL = "deepseek-chat"
+LLM_TEMPERATURE = 0.3
+LLM_SYSTEM_PROMPT = "You are a helpful assistant that returns only valid JSON."
+LLM_CONCURRENCY = 4  # 同时进行的 DeepSeek 请求数
+LLM_REQUESTS_PER_SECOND = 2.0  # 平均请求速率上限
+LLM_BURST = 4  # 允许的瞬时突发请求数
+LOCAL_SPLIT_MODE = True  # 使用去重时已切好的句子，只让模型补充 chinese 和 keywords（按 id 对应）
+LLM_MAX_OUTPUT_TOKENS = 4096  # 每次请求的 max_tokens；输出被截断时把批次一分为二重新请求
+LLM_BATCHER = TokenBudgetBatcher(max_input_tokens=1500, max_output_tokens=1500, max_sentences=40,
+                                 include_english=not LOCAL_SPLIT_MODE)  # 按估算的 token 数分批
 VOICE = "en-US-ChristopherNeural"  # Edge-TTS 语音
+RATE = "+0%"  # Edge-TTS 语速
+PITCH = "+0Hz"  # Edge-TTS 音调
+TTS_CONCURRENCY_INITIAL = 3  # Edge-TTS 初始并发数（之后按成功率和延迟自适应调整）
+TTS_CONCURRENCY_MAX = 16  # Edge-TTS 并发上限
+TTS_PIPELINE_WORKERS = TTS_CONCURRENCY_MAX  # 流水线中的 TTS 工作协程数（缓存命中不占用并发名额）
+TTS_LIMITER = AdaptiveLimiter(initial=TTS_CONCURRENCY_INITIAL, max_limit=TTS_CONCURRENCY_MAX)
+TTS_MAX_ATTEMPTS = 3  # 每个句子最多尝试次数（永久失败不重试）
+TTS_RETRY_POLICY = RetryPolicy(max_attempts=TTS_MAX_ATTEMPTS)
+TTS_FAILURES_FILE = Path(".cache") / "tts_permanent_failures.json"  # 永久失败记录，之后的运行直接跳过
+TTS_FAILURES = PermanentFailureStore(TTS_FAILURES_FILE)
+TTS_SANITIZE = SanitizeReport()  # 合成前规范化全角标点、智能引号、中文字符等
+TTS_BATCH_MODE = True  # 多个句子合成一次，再按 WordBoundary 时间戳切成每句一个文件
+TTS_BATCH_MAX_SENTENCES = 40  # 每次批量请求最多句子数
+TTS_BACKEND = get_backend()  # 环境变量 TTS_BACKEND: edge（在线服务，默认）或 fake（离线测试/压测）
+TTS_METRICS = TTSMetrics()  # 每次请求的字节数、首字节延迟
+TTS_BATCHER = BatchSynthesizer(VOICE, RATE, PITCH, max_sentences=TTS_BATCH_MAX_SENTENCES,
+                               metrics=TTS_METRICS, backend=TTS_BACKEND)
 INPUT_FILE = Path("Part1文本.md")  # Part1 输入文件
 OUTPUT_DIR = Path("output")  # 输出目录
 TEMP_AUDIO_DIR = OUTPUT_DIR / "temp_audio_part1"  # 临时音频文件目录
 OUTPUT_APKG = OUTPUT_DIR / "IELTS_Part1_Speaking.apkg"
+OUTPUT_DELTA_APKG = OUTPUT_DIR / "IELTS_Part1_Speaking_delta.apkg"  # --delta: 只含上次构建后变化的卡片
+TTS_SANITIZE_LOG = OUTPUT_DIR / "tts_sanitized_sentences.txt"  # TTS 预处理修改记录
+TTS_METRICS_CSV = OUTPUT_DIR / "tts_metrics_part1.csv"  # 逐次 TTS 请求的字节数与延迟
+BUILD_MANIFEST_FILE = Path(".cache") / "build_manifest_part1.json"  # 增量构建清单：只为新增/修改的句子请求 DeepSeek
+
+# ============= 音频缓存配置 =============
+AUDIO_CACHE_DIR = Path(".cache") / "tts_audio"  # 跨运行保留的音频缓存目录
+AUDIO_CACHE_MAX_MB = 500  # 缓存总大小上限
+AUDIO_CACHE_MAX_AGE_DAYS = 90  # 超过此天数未使用的音频会被淘汰
+AUDIO_CACHE = AudioCache(AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_MB * 1024 * 1024, AUDIO_CACHE_MAX_AGE_DAYS)
+
+# ============= LLM 缓存配置 =============
+LLM_CACHE_DB = Path(".cache") / "llm_responses.sqlite3"  # DeepSeek 响应缓存
+LLM_CACHE_TTL_DAYS = None  # 缓存有效天数，None 表示永不过期
+LLM_CACHE = LLMCache(LLM_CACHE_DB, LLM_CACHE_TTL_DAYS * 86400 if LLM_CACHE_TTL_DAYS else None)
 
 # Anki Model ID (随机生成的唯一ID)
 MODEL_ID = 1607392320
@@ -52,6 +110,14 @@ SIMILARITY_THRESHOLD = 0.75  # 句子相似度超过此阈值认为是重复
 # ============= 去重算法配置 =============
 USE_SEMANTIC_DEDUP = True  # 使用语义相似度去重（需要 sentence-transformers）
 SEMANTIC_THRESHOLD = 0.75   # 语义相似度阈值
+SEMANTIC_MODEL_NAME = 'all-MiniLM-L6-v2'  # sentence-transformers 模型
+EMBEDDING_CACHE_DIR = Path(".cache") / "embeddings"  # 句子嵌入缓存（只对新句子调用模型）
+SEMANTIC_MODEL_WARMUP = False  # 为 True 时在读取/解析文本期间于后台线程预先加载模型
+SEMANTIC_BLOCK_SIZE = 512   # 语义去重分块大小（控制相似度矩阵的内存占用）
+SEMANTIC_DEDUP_BACKEND = "exact"  # "exact": 分块全量比较；"ivf": 聚类候选 + 精确校验（适合合并多个题库）
+ANN_NUM_CLUSTERS = 0   # IVF 簇数量（0 表示按句子数自动选择 4·√n）
+ANN_NUM_PROBES = 4     # 每个句子放入的最近簇数量（越多召回越高）
+ANN_RECALL_SAMPLE = 0  # 使用 IVF 时，用前 N 个句子再跑一次精确算法并报告召回率（0 表示不报告）
 
 
 def similarity(a: str, b: str) -> float:
@@ -145,6 +211,12 @@ def parse_part1_text(content: str) -> List[Dict[str, str]]:
     return qa_pairs
 
 
+def split_answer_sentences(answer: str) -> List[str]:
+    """把回答按句子分割（保留缩写），过滤少于 3 个词的短句"""
+    sentences = SENTENCE_BOUNDARY_RE.split(answer)
+    return [s.strip() for s in sentences if s.strip() and len(s.split()) >= 3]
+
+
 def normalize_sentence(s: str) -> str:
     """
     规范化句子以便比较：小写、去除标点、去除多余空格
@@ -158,6 +230,149 @@ def normalize_sentence(s: str) -> str:
     return s
 
 
+class StringDedupIndex:
+    """
+    字符串去重的候选索引
+
+    - 长度分桶：只返回长度比在 [0.7, 1.43] 内的已保存句子，按保存顺序排列
+    - 规范化字典：规范化文本 → 最早保存的句子，O(1) 检测完全重复
+
+    长度过滤与原算法的表达式完全相同，因此不会漏掉任何候选
+    """
+    
+    def __init__(self):
+        self.by_normalized: Dict[str, str] = {}
+        self.sentences: List[str] = []
+        self.length_skipped = 0  # 被长度分桶排除的句子对数量
+        self._by_length: Dict[int, List[int]] = {}
+        self._lengths: List[int] = []  # 已出现的长度（升序）
+    
+    def add(self, sent: str, normalized: str) -> int:
+        """
+        保存一个句子
+        
+        Returns:
+            句子在索引中的位置
+        """
+        pos = len(self.sentences)
+        self.sentences.append(sent)
+        
+        length = len(sent)
+        if length not in self._by_length:
+            self._by_length[length] = []
+            bisect.insort(self._lengths, length)
+        self._by_length[length].append(pos)
+        self.by_normalized.setdefault(normalized, sent)
+        return pos
+    
+    def candidates(self, sent: str) -> List[int]:
+        """
+        返回长度上可能与 sent 相似的已保存句子位置（按保存顺序）
+        """
+        length = len(sent)
+        
+        # 先用 bisect 粗略定位长度区间，再用与原算法相同的表达式精确判断
+        lo = bisect.bisect_left(self._lengths, int(length / 1.43) - 1)
+        hi = bisect.bisect_right(self._lengths, int(length / 0.7) + 1)
+        buckets = []
+        for existing_len in self._lengths[lo:hi]:
+            len_ratio = length / existing_len
+            if len_ratio < 0.7 or len_ratio > 1.43:
+                continue
+            buckets.append(self._by_length[existing_len])
+        
+        positions = list(heapq.merge(*buckets))
+        self.length_skipped += len(self.sentences) - len(positions)
+        return positions
+
+
+class TieredSimilarity:
+    """
+    分级相似度判定：先用代价低的上界排除不可能达到阈值的句子对，
+    只有通过所有上界检查的句子对才计算完整的 SequenceMatcher.ratio()
+
+    1. real_quick_ratio(): 仅由长度决定的上界
+    2. quick_ratio(): 字符多重集交集上界
+    3. LCS 上界: 匹配块构成公共子序列，匹配字符数不超过 LCS 长度（位并行算法计算）
+    4. ratio(): 精确值
+
+    每个已保存句子复用一个 SequenceMatcher（已保存句子作为 seq2），
+    b 端索引只在保存时构建一次。判定结果与 similarity() 完全一致
+    """
+    
+    TIERS = ('real_quick_ratio', 'quick_ratio', 'lcs_bound', 'ratio')
+    
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.eliminated = {tier: 0 for tier in self.TIERS}  # 各级排除的句子对数量
+        self.matched = 0  # 判为相似的句子对数量
+        self._matchers: List[SequenceMatcher] = []
+        self._lcs_masks: List[Dict[str, int]] = []
+        self._lengths: List[int] = []
+    
+    def add(self, sent: str) -> int:
+        """
+        登记一个已保存句子
+        
+        Returns:
+            句子位置（与 StringDedupIndex.add 的返回值一致）
+        """
+        lowered = sent.lower()
+        matcher = SequenceMatcher(None)
+        matcher.set_seq2(lowered)
+        
+        masks: Dict[str, int] = {}
+        for i, ch in enumerate(lowered):
+            masks[ch] = masks.get(ch, 0) | (1 << i)
+        
+        self._matchers.append(matcher)
+        self._lcs_masks.append(masks)
+        self._lengths.append(len(lowered))
+        return len(self._matchers) - 1
+    
+    def _lcs_length(self, lowered: str, pos: int) -> int:
+        """位并行计算 LCS 长度（Hyyrö 算法）"""
+        masks = self._lcs_masks[pos]
+        length = self._lengths[pos]
+        full = (1 << length) - 1
+        v = full
+        for ch in lowered:
+            u = v & masks.get(ch, 0)
+            v = ((v + u) | (v - u)) & full
+        return length - bin(v).count('1')
+    
+    def is_similar(self, lowered: str, pos: int) -> bool:
+        """
+        判断（已小写的）句子与位置 pos 的已保存句子相似度是否达到阈值
+        """
+        matcher = self._matchers[pos]
+        matcher.set_seq1(lowered)
+        
+        if matcher.real_quick_ratio() < self.threshold:
+            self.eliminated['real_quick_ratio'] += 1
+            return False
+        if matcher.quick_ratio() < self.threshold:
+            self.eliminated['quick_ratio'] += 1
+            return False
+        
+        total = len(lowered) + self._lengths[pos]
+        if total and 2.0 * self._lcs_length(lowered, pos) / total < self.threshold:
+            self.eliminated['lcs_bound'] += 1
+            return False
+        
+        if matcher.ratio() < self.threshold:
+            self.eliminated['ratio'] += 1
+            return False
+        
+        self.matched += 1
+        return True
+    
+    def summary(self) -> str:
+        """返回各级过滤统计"""
+        parts = [f"{tier} 排除 {self.eliminated[tier]}" for tier in self.TIERS]
+        return "，".join(parts) + f"，判为相似 {self.matched}"
+
+
 def deduplicate_sentences_string(qa_pairs: List[Dict[str, str]]) -> Tuple[List[Dict[str, str]], Dict[str, List[str]]]:
     """
     去除相似的句子，返回去重后的句子列表和来源映射
@@ -172,17 +387,9 @@ def deduplicate_sentences_string(qa_pairs: List[Dict[str, str]]) -> Tuple[List[D
     
     # 首先收集所有句子
     for qa in qa_pairs:
-        # 将回答按句子分割
+        # 将回答按句子分割（已过滤太短的句子）
         answer = qa['answer']
-        # 使用更智能的分句（保留缩写）
-        sentences = re.split(r'(?<=[.!?])\s+(?=[A-Z])', answer)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        
-        for sent in sentences:
-            # 过滤太短的句子
-            if len(sent.split()) < 3:
-                continue
-            
+        for sent in split_answer_sentences(answer):
             all_sentences.append({
                 'sentence': sent,
                 'topic': qa['topic'],
@@ -195,49 +402,37 @@ def deduplicate_sentences_string(qa_pairs: List[Dict[str, str]]) -> Tuple[List[D
     # 去重
     unique_sentences = []
     source_map = {}  # sentence -> list of sources
-    normalized_set = set()  # 用于快速检测完全重复
+    index = StringDedupIndex()
+    engine = TieredSimilarity(SIMILARITY_THRESHOLD)
     
     for item in all_sentences:
         sent = item['sentence']
         normalized = normalize_sentence(sent)
+        lowered = sent.lower()
         
-        # 检查是否与已保存的句子相似
-        is_duplicate = False
-        for existing in unique_sentences:
-            existing_sent = existing['sentence']
-            
-            # 如果长度相差太大，跳过相似度计算
-            len_ratio = len(sent) / len(existing_sent) if existing_sent else 0
-            if len_ratio < 0.7 or len_ratio > 1.43:
-                continue
-            
-            sim = similarity(sent, existing_sent)
-            if sim >= SIMILARITY_THRESHOLD:
-                is_duplicate = True
-                # 记录来源
-                key = existing_sent
-                if key not in source_map:
-                    source_map[key] = []
-                source_map[key].append(f"{item['topic']} - {item['question']}")
+        # 检查是否与已保存的句子相似（只比较索引给出的候选，顺序与保存顺序一致）
+        duplicate_of = None
+        for pos in index.candidates(sent):
+            if engine.is_similar(lowered, pos):
+                duplicate_of = index.sentences[pos]
                 break
         
         # 如果未发现相似，但规范化后完全相同，也视为重复
-        if not is_duplicate and normalized in normalized_set:
-            # 找到对应的原始句子
-            for existing in unique_sentences:
-                if normalize_sentence(existing['sentence']) == normalized:
-                    is_duplicate = True
-                    key = existing['sentence']
-                    if key not in source_map:
-                        source_map[key] = []
-                    source_map[key].append(f"{item['topic']} - {item['question']}")
-                    break
+        if duplicate_of is None:
+            duplicate_of = index.by_normalized.get(normalized)
         
-        if not is_duplicate:
+        if duplicate_of is not None:
+            # 记录来源
+            if duplicate_of not in source_map:
+                source_map[duplicate_of] = []
+            source_map[duplicate_of].append(f"{item['topic']} - {item['question']}")
+        else:
             unique_sentences.append(item)
             source_map[sent] = [f"{item['topic']} - {item['question']}"]
-            normalized_set.add(normalized)
+            index.add(sent, normalized)
+            engine.add(sent)
     
+    print(f"  相似度分级过滤: 长度分桶排除 {index.length_skipped}，{engine.summary()}")
     print(f"  去重后剩余 {len(unique_sentences)} 个句子")
     print(f"  去除了 {len(all_sentences) - len(unique_sentences)} 个重复句子")
     
@@ -248,16 +443,113 @@ def deduplicate_sentences(qa_pairs: List[Dict[str, str]]) -> Tuple[List[Dict[str
     """
     去重句子的主函数，根据配置选择算法
     """
-    if USE_SEMANTIC_DEDUP and SEMANTIC_AVAILABLE:
+    if USE_SEMANTIC_DEDUP and SEMANTIC_AVAILABLE and model_registry.is_available():
         print("使用语义相似度去重算法")
         return deduplicate_sentences_semantic(qa_pairs)
     else:
-        if USE_SEMANTIC_DEDUP and not SEMANTIC_AVAILABLE:
+        if USE_SEMANTIC_DEDUP:
             print("警告: 配置了使用语义去重但 sentence-transformers 不可用，回退到字符串相似度")
         print("使用字符串相似度去重算法")
         return deduplicate_sentences_string(qa_pairs)
 
 
+def semantic_duplicate_assignments(embeddings, threshold: float,
+                                   block_size: int = 512) -> List[int]:
+    """
+    贪心去重的向量化实现：按原始顺序，每个句子与已保留句子比较，
+    若存在相似度 >= threshold 的保留句子，则归入其中最早保留的那一个
+
+    嵌入只归一化一次，相似度用分块矩阵乘法计算，
+    内存占用为 O(block_size²) 而不是 O(n²)
+
+    Args:
+        embeddings: 形状为 (n, dim) 的句子嵌入
+        threshold: 余弦相似度阈值
+        block_size: 每次处理的句子数（同时也是已保留句子的分块大小）
+
+    Returns:
+        长度为 n 的列表：-1 表示该句子被保留，否则为其归入的保留句子下标
+    """
+    emb = np.asarray(embeddings, dtype=np.float32)
+    n = len(emb)
+    if n == 0:
+        return []
+    
+    # 归一化一次，之后点积即为余弦相似度（零向量与任何句子都不相似）
+    norms = np.linalg.norm(emb, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    emb = emb / norms
+    
+    assignments = [-1] * n
+    kept_indices: List[int] = []  # 已保留句子在原列表中的下标（按保留顺序）
+    kept_matrix = np.empty_like(emb)  # 前 len(kept_indices) 行为已保留句子的嵌入
+    
+    for start in range(0, n, block_size):
+        block = emb[start:start + block_size]
+        # 每个句子匹配到的最早保留句子（在 kept_indices 中的位置），-1 表示尚未匹配
+        first_match = np.full(len(block), -1, dtype=np.int64)
+        
+        # 1) 与之前批次保留的句子比较，按保留顺序分块，找到第一个命中即停止
+        kept_count = len(kept_indices)
+        for k_start in range(0, kept_count, block_size):
+            unresolved = np.nonzero(first_match < 0)[0]
+            if len(unresolved) == 0:
+                break
+            k_end = min(k_start + block_size, kept_count)
+            hits = (block[unresolved] @ kept_matrix[k_start:k_end].T) >= threshold
+            has_hit = hits.any(axis=1)
+            first_match[unresolved[has_hit]] = k_start + hits[has_hit].argmax(axis=1)
+        
+        # 2) 块内按顺序处理：之前批次的保留句子总是排在块内保留句子之前
+        intra = block @ block.T
+        block_kept: List[int] = []
+        for i in range(len(block)):
+            if first_match[i] >= 0:
+                assignments[start + i] = kept_indices[first_match[i]]
+                continue
+            if block_kept:
+                row_hits = intra[i, block_kept] >= threshold
+                if row_hits.any():
+                    assignments[start + i] = start + block_kept[int(row_hits.argmax())]
+                    continue
+            block_kept.append(i)
+        
+        for i in block_kept:
+            kept_matrix[len(kept_indices)] = block[i]
+            kept_indices.append(start + i)
+    
+    return assignments
+
+
+def semantic_duplicate_assignments_ann(embeddings) -> List[int]:
+    """
+    使用 IVF 近似最近邻后端计算去重结果，可选地在样本上报告相对精确算法的召回率
+    
+    Args:
+        embeddings: 形状为 (n, dim) 的句子嵌入
+        
+    Returns:
+        与 semantic_duplicate_assignments 格式相同的 assignments
+    """
+    from ann_index import ivf_duplicate_assignments, assignment_recall
+    
+    assignments, verified = ivf_duplicate_assignments(
+        embeddings, SEMANTIC_THRESHOLD, ANN_NUM_CLUSTERS or None, ANN_NUM_PROBES,
+        block_size=SEMANTIC_BLOCK_SIZE
+    )
+    n = len(assignments)
+    print(f"  IVF 后端: 校验 {verified} 个候选对（全量比较约 {n * (n - 1) // 2} 对）")
+    
+    # 贪心去重只依赖前面的句子，因此前缀样本上的结果可以直接与精确算法比较
+    sample = min(n, ANN_RECALL_SAMPLE)
+    if sample > 0:
+        exact = semantic_duplicate_assignments(embeddings[:sample], SEMANTIC_THRESHOLD, SEMANTIC_BLOCK_SIZE)
+        recall, agreement = assignment_recall(exact, assignments[:sample])
+        print(f"  IVF 召回率（前 {sample} 句）: 重复召回 {recall:.1%}，结果一致 {agreement:.1%}")
+    
+    return assignments
+
+
 def deduplicate_sentences_semantic(qa_pairs: List[Dict[str, str]]) -> Tuple[List[Dict[str, str]], Dict[str, List[str]]]:
     """
     基于语义相似度去重（使用 sentence-transformers）
@@ -276,16 +568,9 @@ def deduplicate_sentences_semantic(qa_pairs: List[Dict[str, str]]) -> Tuple[List
     
     # 首先收集所有句子
     for qa in qa_pairs:
+        # 将回答按句子分割（已过滤太短的句子）
         answer = qa['answer']
-        # 使用更智能的分句（保留缩写）
-        sentences = re.split(r'(?<=[.!?])\s+(?=[A-Z])', answer)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        
-        for sent in sentences:
-            # 过滤太短的句子
-            if len(sent.split()) < 3:
-                continue
-            
+        for sent in split_answer_sentences(answer):
             all_sentences.append({
                 'sentence': sent,
                 'topic': qa['topic'],
@@ -298,38 +583,33 @@ def deduplicate_sentences_semantic(qa_pairs: List[Dict[str, str]]) -> Tuple[List
     # 提取句子文本
     sentence_texts = [item['sentence'] for item in all_sentences]
     
-    # 加载模型（惰性加载）
-    assert SEMANTIC_AVAILABLE and SentenceTransformer is not None
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    embeddings = model.encode(sentence_texts, convert_to_tensor=False)
-    
-    # 余弦相似度计算辅助函数
-    def cosine_sim(a, b):
-        from numpy import dot
-        from numpy.linalg import norm
-        return dot(a, b) / (norm(a) * norm(b))
+    # 读取嵌入缓存，只有新句子才加载模型并编码
+    from embedding_cache import EmbeddingStore
+    store = EmbeddingStore(EMBEDDING_CACHE_DIR, SEMANTIC_MODEL_NAME)
+    try:
+        embeddings = store.encode(sentence_texts, lambda: model_registry.get_sentence_model(SEMANTIC_MODEL_NAME))
+    except model_registry.ModelUnavailableError as e:
+        print(f"警告: {e}，回退到基于字符串的相似度去重")
+        return deduplicate_sentences_string(qa_pairs)
+    print(f"  嵌入缓存: {store.summary()}")
+    print(f"  语义模型: {model_registry.timing_report(SEMANTIC_MODEL_NAME)}")
     
     # 去重
+    if SEMANTIC_DEDUP_BACKEND == "ivf":
+        assignments = semantic_duplicate_assignments_ann(embeddings)
+    else:
+        assignments = semantic_duplicate_assignments(embeddings, SEMANTIC_THRESHOLD, SEMANTIC_BLOCK_SIZE)
+    
     unique_sentences = []
-    unique_embeddings = []
     source_map = {}
     
-    for idx, (item, emb) in enumerate(zip(all_sentences, embeddings)):
-        sent = item['sentence']
-        duplicate = False
-        for j, (u_item, u_emb) in enumerate(zip(unique_sentences, unique_embeddings)):
-            sim = cosine_sim(emb, u_emb)
-            if sim >= SEMANTIC_THRESHOLD:
-                duplicate = True
-                key = u_item['sentence']
-                if key not in source_map:
-                    source_map[key] = []
-                source_map[key].append(f"{item['topic']} - {item['question']}")
-                break
-        if not duplicate:
+    for item, target in zip(all_sentences, assignments):
+        source = f"{item['topic']} - {item['question']}"
+        if target < 0:
             unique_sentences.append(item)
-            unique_embeddings.append(emb)
-            source_map[sent] = [f"{item['topic']} - {item['question']}"]
+            source_map[item['sentence']] = [source]
+        else:
+            source_map.setdefault(all_sentences[target]['sentence'], []).append(source)
     
     print(f"  去重后剩余 {len(unique_sentences)} 个句子")
     print(f"  去除了 {len(all_sentences) - len(unique_sentences)} 个重复句子")
@@ -337,31 +617,17 @@ def deduplicate_sentences_semantic(qa_pairs: List[Dict[str, str]]) -> Tuple[List
     return unique_sentences, source_map
 
 
-
-
-def parse_text_with_ai(text: str, max_retries: int = 3) -> List[Dict[str, str]]:
+def build_parse_prompt(text: str) -> str:
     """
-    使用 DeepSeek API 将文本拆解为句子，并生成中文翻译和关键词提示
+    构造句子拆解的用户提示词
 
     Args:
         text: 原始英文文本
-        max_retries: 最大重试次数
 
     Returns:
-        句子列表，每个包含 english, chinese, keywords
+        提示词字符串
     """
-    # 检查 API Key
-    if not DEEPSEEK_API_KEY:
-        print("✗ 错误: 未设置 DEEPSEEK_API_KEY")
-        print("  请在 .env 文件中设置: DEEPSEEK_API_KEY=your-api-key-here")
-        sys.exit(1)
-    
-    client = openai.OpenAI(
-        api_key=DEEPSEEK_API_KEY,
-        base_url=DEEPSEEK_BASE_URL
-    )
-    
-    prompt = f"""
+    return f"""
 你是一个雅思口语教学助手。请将下面的英文文本拆解成独立的句子，并为每个句子提供：
 1. english: 原英文句子
 2. chinese: 中文翻译
@@ -378,51 +644,214 @@ def parse_text_with_ai(text: str, max_retries: int = 3) -> List[Dict[str, str]]:
   {{"english": "He likes basketball.", "chinese": "他喜欢篮球。", "keywords": "he, likes, basketball"}}
 ]
 """
+
+
+def _has_fields(item, fields: Tuple[str, ...]) -> bool:
+    """条目是否为 dict 且各字段都是非空字符串"""
+    return isinstance(item, dict) and all(
+        isinstance(item.get(key), str) and item[key].strip() for key in fields)
+
+
+def parse_ai_response(content: Optional[str], text: Optional[str] = None) -> List[Dict[str, str]]:
+    """
+    从 API 返回文本中提取并校验句子 JSON 数组
+
+    返回内容被截断或个别条目缺少字段时，保留所有完整的条目；
+    提供 text 时按顺序在原文中定位这些句子，未覆盖的原文作为子批次重新请求
+
+    Args:
+        content: API 返回的文本
+        text: 发送给模型的原文（用于定位缺失部分）
+
+    Returns:
+        句子列表，每个包含 english, chinese, keywords
+
+    Raises:
+        json.JSONDecodeError: 返回内容中没有可解析的 JSON 条目
+        PartialResponseError: 只有部分条目有效，pieces 中的字符串为需要重新请求的原文片段
+        ValueError: 返回内容为空或结构不符合要求
+    """
+    if content is None:
+        raise ValueError("API 返回内容为空")
+    
+    # 逐个解析数组元素（自动处理 Markdown 代码块、多余文字和截断）
+    items, complete = salvage_json_array(content)
+    valid = [item for item in items if _has_fields(item, ('english', 'chinese', 'keywords'))]
+    if complete and len(valid) == len(items):
+        return valid
+    if text is None or not valid:
+        raise ValueError("API 返回的 JSON 缺少必要字段或被截断")
+    
+    # 按顺序在原文中定位有效句子，句子之间和末尾未覆盖的原文需要重新请求
+    pieces = []
+    cursor = 0
+    for item in valid:
+        pos = text.find(item['english'], cursor)
+        if pos == -1:
+            raise ValueError(f"无法在原文中定位句子: {item['english'][:40]}")
+        gap = text[cursor:pos].strip()
+        if re.search(r'[A-Za-z0-9]', gap):
+            pieces.append(gap)
+        pieces.append(item)
+        cursor = pos + len(item['english'])
+    tail = text[cursor:].strip()
+    if re.search(r'[A-Za-z0-9]', tail):
+        pieces.append(tail)
+    
+    missing = sum(1 for piece in pieces if isinstance(piece, str))
+    if missing == 0:
+        return valid
+    raise PartialResponseError(pieces, len(valid), missing)
+
+
+def build_annotate_prompt(sentences: List[str]) -> str:
+    """
+    构造句子标注的用户提示词（本地切分模式）
+
+    句子以带编号的 JSON 列表发送，模型只需返回 id、chinese 和 keywords
+
+    Args:
+        sentences: 已切分好的英文句子
+
+    Returns:
+        提示词字符串
+    """
+    numbered = [{"id": i + 1, "english": sentence} for i, sentence in enumerate(sentences)]
+    return f"""
+你是一个雅思口语教学助手。下面是已经拆分好的英文句子列表，请为每个句子提供：
+1. chinese: 中文翻译
+2. keywords: 3-5个英语关键词提示（用于帮助回忆句子）
+
+不要修改、合并或拆分句子，每个 id 返回一项，不需要返回 english。
+**重要**: 请只返回纯JSON数组，不要包含任何Markdown标记（如 ```json）或其他文字说明。
+
+输入句子（JSON）：
+{json.dumps(numbered, ensure_ascii=False)}
+
+返回格式示例：
+[
+  {{"id": 1, "chinese": "李华是一名学生。", "keywords": "Li Hua, student"}},
+  {{"id": 2, "chinese": "他喜欢篮球。", "keywords": "he, likes, basketball"}}
+]
+"""
+
+
+def parse_annotate_response(content: Optional[str], sentences: List[str]) -> List[Dict[str, str]]:
+    """
+    解析句子标注结果，并按 id 合并回原句
+
+    返回内容被截断或个别条目无效时，保留所有完整的条目，
+    缺失的句子（连续的合为一组）作为子批次重新请求
+
+    Args:
+        content: API 返回的文本
+        sentences: 发送给模型的句子（id 从 1 开始）
+
+    Returns:
+        与 sentences 一一对应的句子列表，每个包含 english, chinese, keywords
+
+    Raises:
+        json.JSONDecodeError: 返回内容中没有可解析的 JSON 条目
+        PartialResponseError: 只有部分句子有结果，pieces 中的列表为需要重新请求的句子
+        ValueError: 返回内容为空或没有任何有效条目
+    """
+    if content is None:
+        raise ValueError("API 返回内容为空")
+    
+    items, _ = salvage_json_array(content)
+    annotations = {}
+    for item in items:
+        if _has_fields(item, ('chinese', 'keywords')) and isinstance(item.get('id'), int):
+            annotations[item['id']] = item
+    
+    pieces = []
+    for i, sentence in enumerate(sentences):
+        annotation = annotations.get(i + 1)
+        if annotation is not None:
+            pieces.append({
+                'english': sentence,
+                'chinese': annotation['chinese'],
+                'keywords': annotation['keywords'],
+            })
+        elif pieces and isinstance(pieces[-1], list):
+            pieces[-1].append(sentence)
+        else:
+            pieces.append([sentence])
+    
+    missing = [piece for piece in pieces if isinstance(piece, list)]
+    if not missing:
+        return pieces
+    recovered = len(pieces) - len(missing)
+    if recovered == 0:
+        raise ValueError("API 返回的结果没有有效的句子条目")
+    raise PartialResponseError(pieces, recovered, len(missing))
+
+
+def check_api_key():
+    """检查 API Key，未设置时退出"""
+    if not DEEPSEEK_API_KEY:
+        print("✗ 错误: 未设置 DEEPSEEK_API_KEY")
+        print("  请在 .env 文件中设置: DEEPSEEK_API_KEY=your-api-key-here")
+        sys.exit(1)
+
+
+def parse_text_with_ai(text: str, max_retries: int = 3, refresh: bool = False) -> List[Dict[str, str]]:
+    """
+    使用 DeepSeek API 将文本拆解为句子，并生成中文翻译和关键词提示
+
+    Args:
+        text: 原始英文文本
+        max_retries: 最大重试次数
+        refresh: 为 True 时跳过 LLM 缓存，强制重新请求
+
+    Returns:
+        句子列表，每个包含 english, chinese, keywords
+    """
+    prompt = build_parse_prompt(text)
+    
+    # 先查缓存，相同批次直接返回
+    cache_key = LLM_CACHE.make_key(LLM_MODEL, LLM_TEMPERATURE, LLM_SYSTEM_PROMPT, prompt)
+    if not refresh:
+        cached = LLM_CACHE.get(cache_key)
+        if cached is not None:
+            print(f"✓ 命中 LLM 缓存，{len(cached)} 个句子")
+            return cached
+    
+    check_api_key()
+    client = openai.OpenAI(
+        api_key=DEEPSEEK_API_KEY,
+        base_url=DEEPSEEK_BASE_URL
+    )
     
+    content = None
     for attempt in range(max_retries):
         try:
             response = client.chat.completions.create(
-                model="deepseek-chat",
+                model=LLM_MODEL,
                 messages=[
-                    {"role": "system", "content": "You are a helpful assistant that returns only valid JSON."},
+                    {"role": "system", "content": LLM_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.3
+                temperature=LLM_TEMPERATURE
             )
             
             content = response.choices[0].message.content
-            
-            if content is None:
-                raise ValueError("API 返回内容为空")
-            
-            content = content.strip()
-            
-            # 移除可能的 Markdown 代码块标记
-            content = re.sub(r'^```json\s*', '', content)
-            content = re.sub(r'^```\s*', '', content)
-            content = re.sub(r'\s*```$', '', content)
-            
-            # 尝试提取 JSON 数组（处理可能的多余文本）
-            # 查找第一个 '[' 和最后一个 ']'
-            start = content.find('[')
-            end = content.rfind(']')
-            if start != -1 and end != -1 and end > start:
-                json_str = content[start:end+1]
-            else:
-                json_str = content
-            
-            # 解析 JSON
-            data = json.loads(json_str)
-            
-            # 验证数据结构
-            if not isinstance(data, list):
-                raise ValueError("API 返回的不是 JSON 数组")
-            
-            for item in data:
-                if not all(key in item for key in ('english', 'chinese', 'keywords')):
-                    raise ValueError("API 返回的 JSON 缺少必要字段")
+            data = parse_ai_response(content, text)
             
             print(f"✓ 成功解析 {len(data)} 个句子")
+            LLM_CACHE.put(cache_key, LLM_MODEL, data)
+            return data
+        
+        except PartialResponseError as e:
+            # 只重新请求缺失的原文片段，已解析的句子直接保留
+            print(f"↻ {e}")
+            data = []
+            for piece in e.pieces:
+                if isinstance(piece, dict):
+                    data.append(piece)
+                else:
+                    data.extend(parse_text_with_ai(piece, max_retries, refresh))
+            LLM_CACHE.put(cache_key, LLM_MODEL, data)
             return data
             
         except json.JSONDecodeError as e:
@@ -431,260 +860,771 @@ def parse_text_with_ai(text: str, max_retries: int = 3) -> List[Dict[str, str]]:
                 print(f"API 返回内容:\n{content}")
                 raise
             # 等待后重试
-            import time
             time.sleep(2 ** attempt)  # 指数退避
         except Exception as e:
             print(f"✗ API 调用失败 (尝试 {attempt + 1}/{max_retries}): {e}")
             if attempt == max_retries - 1:
                 raise
-            import time
             time.sleep(2 ** attempt)
     
     # 不应到达这里
     raise RuntimeError("重试次数用尽")
 
 
-async def generate_audio(text: str, filename: Path) -> bool:
+async def request_parsed_async(prompt: str,
+                               parse: Callable[[Optional[str]], List[Dict[str, str]]],
+                               client: openai.AsyncOpenAI,
+                               semaphore: asyncio.Semaphore,
+                               bucket: TokenBucket,
+                               label: str = "",
+                               max_retries: int = 3,
+                               refresh: bool = False,
+                               max_tokens: Optional[int] = None) -> List[Dict[str, str]]:
+    """
+    发送一次带缓存、限流和重试的 DeepSeek 请求
+
+    并发名额只在请求进行时占用，退避等待期间会释放，
+    因此某个批次重试不会拖慢其他批次
+
+    Args:
+        prompt: 用户提示词
+        parse: 把返回文本转换为句子列表的函数，抛出异常表示结果无效（会重试，不会写入缓存）
+        client: 共享的异步 DeepSeek 客户端
+        semaphore: 限制同时进行的请求数
+        bucket: 令牌桶，限制请求速率
+        label: 日志中显示的批次名称
+        max_retries: 最大重试次数
+        refresh: 为 True 时跳过 LLM 缓存，强制重新请求
+        max_tokens: 输出 token 上限，None 表示使用服务端默认值
+
+    Returns:
+        句子列表，每个包含 english, chinese, keywords
+
+    Raises:
+        TruncatedResponseError: 输出达到 max_tokens 被截断（不重试，由调用方缩小批次）
+        PartialResponseError: 只有部分条目有效（不重试，由调用方只请求缺失部分）
     """
-    使用 Edge-TTS 生成英文语音
+    cache_key = LLM_CACHE.make_key(LLM_MODEL, LLM_TEMPERATURE, LLM_SYSTEM_PROMPT, prompt)
+    if not refresh:
+        cached = LLM_CACHE.get(cache_key)
+        if cached is not None:
+            print(f"  ✓ {label} 命中 LLM 缓存，{len(cached)} 个句子")
+            return cached
+    
+    check_api_key()
+    
+    content = None
+    for attempt in range(max_retries):
+        try:
+            async with semaphore:
+                await bucket.acquire()
+                response = await client.chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=[
+                        {"role": "system", "content": LLM_SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=LLM_TEMPERATURE,
+                    max_tokens=max_tokens
+                )
+            
+            content = response.choices[0].message.content
+            truncated = response.choices[0].finish_reason == "length"
+            try:
+                data = parse(content)
+            except (json.JSONDecodeError, ValueError) as e:
+                # 截断前的完整条目仍然可用（PartialResponseError）；一条都没有时由调用方拆分批次
+                if truncated and not isinstance(e, PartialResponseError):
+                    raise TruncatedResponseError(f"{label} 输出达到 max_tokens={max_tokens} 被截断") from e
+                raise
+            
+            print(f"  ✓ {label} 成功解析 {len(data)} 个句子")
+            LLM_CACHE.put(cache_key, LLM_MODEL, data)
+            return data
+            
+        except (TruncatedResponseError, PartialResponseError):
+            raise  # 原样重试没有意义，由 parse_batch_async 只请求缺失部分
+        except json.JSONDecodeError as e:
+            print(f"  ✗ {label} JSON 解析失败 (尝试 {attempt + 1}/{max_retries}): {e}")
+            if attempt == max_retries - 1:
+                print(f"API 返回内容:\n{content}")
+                raise
+        except Exception as e:
+            print(f"  ✗ {label} API 调用失败 (尝试 {attempt + 1}/{max_retries}): {e}")
+            if attempt == max_retries - 1:
+                raise
+        
+        # 指数退避（不占用并发名额）
+        await asyncio.sleep(2 ** attempt)
+    
+    # 不应到达这里
+    raise RuntimeError("重试次数用尽")
+
+
+async def parse_text_with_ai_async(text: str,
+                                   client: openai.AsyncOpenAI,
+                                   semaphore: asyncio.Semaphore,
+                                   bucket: TokenBucket,
+                                   label: str = "",
+                                   max_retries: int = 3,
+                                   refresh: bool = False,
+                                   max_tokens: Optional[int] = None) -> List[Dict[str, str]]:
+    """
+    parse_text_with_ai 的异步版本，供多个批次并发调用（由模型拆分句子）
+
+    Returns:
+        句子列表，每个包含 english, chinese, keywords
+    """
+    return await request_parsed_async(build_parse_prompt(text), lambda content: parse_ai_response(content, text),
+                                      client, semaphore, bucket, label, max_retries, refresh, max_tokens)
+
+
+async def annotate_sentences_async(sentences: List[str],
+                                   client: openai.AsyncOpenAI,
+                                   semaphore: asyncio.Semaphore,
+                                   bucket: TokenBucket,
+                                   label: str = "",
+                                   max_retries: int = 3,
+                                   refresh: bool = False,
+                                   max_tokens: Optional[int] = None) -> List[Dict[str, str]]:
+    """
+    本地切分模式：只请求模型为已切好的句子补充 chinese 和 keywords
+
+    Returns:
+        与 sentences 一一对应的句子列表
+    """
+    return await request_parsed_async(build_annotate_prompt(sentences),
+                                      lambda content: parse_annotate_response(content, sentences),
+                                      client, semaphore, bucket, label, max_retries, refresh, max_tokens)
+
+
+async def parse_batch_async(batch: Union[str, List[str]],
+                            client: openai.AsyncOpenAI,
+                            semaphore: asyncio.Semaphore,
+                            bucket: TokenBucket,
+                            label: str = "",
+                            refresh: bool = False) -> List[Dict[str, str]]:
+    """
+    处理一个批次
+
+    只有部分条目有效时保留这些条目，只为缺失的句子重新请求；
+    输出被截断且没有完整条目时把批次一分为二分别请求。
+    合并后的结果以原批次的提示词写入缓存，下次运行直接命中
+
+    Args:
+        batch: 句子列表（本地切分模式）或拼接好的文本（由模型拆分句子）
+
+    Returns:
+        句子列表，每个包含 english, chinese, keywords
+    """
+    try:
+        if isinstance(batch, str):
+            return await parse_text_with_ai_async(batch, client, semaphore, bucket, label=label,
+                                                  refresh=refresh, max_tokens=LLM_MAX_OUTPUT_TOKENS)
+        return await annotate_sentences_async(batch, client, semaphore, bucket, label=label,
+                                              refresh=refresh, max_tokens=LLM_MAX_OUTPUT_TOKENS)
+    except PartialResponseError as e:
+        print(f"  ↻ {label} {e}")
+        pieces = e.pieces
+    except TruncatedResponseError:
+        halves = split_batch(batch)
+        if halves is None:
+            raise
+        LLM_BATCHER.splits += 1
+        print(f"  ↻ {label} 输出被截断，拆成两半重新请求")
+        pieces = halves
+    
+    subs = [piece for piece in pieces if not isinstance(piece, dict)]
+    results = iter(await asyncio.gather(*(
+        parse_batch_async(sub, client, semaphore, bucket, f"{label}.{i + 1}", refresh)
+        for i, sub in enumerate(subs)
+    )))
+    merged = []
+    for piece in pieces:
+        if isinstance(piece, dict):
+            merged.append(piece)
+        else:
+            merged.extend(next(results))
+    prompt = build_parse_prompt(batch) if isinstance(batch, str) else build_annotate_prompt(batch)
+    LLM_CACHE.put(LLM_CACHE.make_key(LLM_MODEL, LLM_TEMPERATURE, LLM_SYSTEM_PROMPT, prompt),
+                  LLM_MODEL, merged)
+    return merged
+
+
+async def parse_batches_concurrently(batch_texts: List[Union[str, List[str]]], refresh: bool = False,
+                                     on_batch=None) -> List[List[Dict[str, str]]]:
+    """
+    并发处理所有批次，结果按原始批次顺序返回
+
+    Args:
+        batch_texts: 每个批次的文本；批次为句子列表时使用本地切分模式（只请求翻译和关键词）
+        refresh: 为 True 时跳过 LLM 缓存，强制重新请求
+        on_batch: 可选的异步回调 on_batch(批次序号, 句子列表)，每个批次完成时立即调用
+
+    Returns:
+        与 batch_texts 一一对应的句子列表
+    """
+    semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+    bucket = TokenBucket(LLM_REQUESTS_PER_SECOND, LLM_BURST)
+    
+    # 全部命中缓存时不需要 API Key，缺少 Key 的情况在真正发请求前再检查
+    client = openai.AsyncOpenAI(
+        api_key=DEEPSEEK_API_KEY or "unset",
+        base_url=DEEPSEEK_BASE_URL
+    )
+    
+    total = len(batch_texts)
+    print(f"  共 {total} 个批次 (并发: {LLM_CONCURRENCY}, 速率: {LLM_REQUESTS_PER_SECOND}/s)")
+    
+    async def run_batch(idx: int, batch: Union[str, List[str]]) -> List[Dict[str, str]]:
+        parsed = await parse_batch_async(batch, client, semaphore, bucket,
+                                         label=f"批次 {idx + 1}/{total}", refresh=refresh)
+        if on_batch is not None:
+            await on_batch(idx, parsed)
+        return parsed
+    
+    try:
+        tasks = [run_batch(idx, batch) for idx, batch in enumerate(batch_texts)]
+        # gather 保证结果顺序与任务顺序一致
+        return await asyncio.gather(*tasks)
+    finally:
+        await client.close()
+
+
+async def generate_audio(text: str, filename: Path) -> None:
+    """
+    使用 Edge-TTS 生成英文语音（失败时删除残留文件并抛出异常，由重试策略分类处理）
     
     Args:
         text: 要转换的英文文本
         filename: 输出的 MP3 文件路径
-        
-    Returns:
-        成功返回 True，失败返回 False
     """
     try:
-        communicate = edge_tts.Communicate(text, VOICE)
-        await communicate.save(str(filename))
-        print(f"  ✓ 生成音频: {filename.name}")
-        return True
-    except Exception as e:
-        print(f"  ✗ 音频生成失败 ({filename.name}): {e}")
-        # 删除可能创建的空文件
+        communicate = TTS_BACKEND.communicate(text, VOICE, rate=RATE, pitch=PITCH)
+        # 流式写入临时文件，校验通过后才原子重命名为 filename
+        TTS_METRICS.record(await stream_to_file(communicate, filename))
+    except Exception:
+        # 删除旧运行残留的同名文件，避免无效音频进入卡片包
         if filename.exists():
             try:
                 filename.unlink()
-            except:
+            except OSError:
                 pass
-        return False
+        raise
+    AUDIO_CACHE.put(text, VOICE, RATE, PITCH, filename)
+    print(f"  ✓ 生成音频: {filename.name}")
 
 
-async def generate_audio_with_retry(text: str, filename: Path, max_retries: int = 3) -> bool:
+async def generate_audio_with_retry(text: str, filename: Path) -> bool:
     """
-    带重试的音频生成
+    按 TTS_RETRY_POLICY 重试音频生成，永久失败会记录到 TTS_FAILURES
     
     Args:
         text: 要转换的英文文本
         filename: 输出的 MP3 文件路径
-        max_retries: 最大重试次数
         
     Returns:
         成功返回 True，失败返回 False
     """
-    for attempt in range(max_retries):
-        try:
-            success = await generate_audio(text, filename)
-            if success:
-                return True
-            else:
-                # generate_audio 内部已打印错误，这里只记录重试
-                if attempt < max_retries - 1:
-                    print(f"  重试 {attempt + 1}/{max_retries}...")
-                    await asyncio.sleep(1)  # 等待1秒后重试
-        except Exception as e:
-            print(f"  重试 {attempt + 1}/{max_retries} 异常: {e}")
-            if attempt < max_retries - 1:
-                await asyncio.sleep(1)
+    kind, error = await run_with_retry(lambda: generate_audio(text, filename),
+                                       TTS_RETRY_POLICY, TTS_LIMITER, filename.name)
+    if kind is None:
+        return True
     
-    print(f"  ✗ 音频生成重试 {max_retries} 次后仍失败: {filename.name}")
+    if kind == PERMANENT:
+        TTS_FAILURES.add(AUDIO_CACHE.make_key(text, VOICE, RATE, PITCH), text, repr(error))
+    elif kind != INVALID:
+        print(f"  ✗ 音频生成 {TTS_RETRY_POLICY.max_attempts} 次后仍失败: {filename.name}")
     return False
 
 
-async def generate_all_audio(sentences: List[Dict[str, str]]) -> List[Optional[Path]]:
+def record_audio_failure(sentence: Dict[str, str], idx: int, reason: str,
+                         failed_sentences: List[Dict]) -> None:
+    """打印并记录音频生成失败的句子"""
+    print(f"  ✗ 句子 {idx+1} 音频{reason}: {sentence['english'][:50]}...")
+    failed_sentences.append({
+        'index': idx,
+        'english': sentence['english'],
+        'chinese': sentence['chinese'],
+        'keywords': sentence['keywords'],
+        'reason': reason
+    })
+
+
+def prepare_sentence_audio(sentence: Dict[str, str], idx: int,
+                           failed_sentences: List[Dict]) -> Tuple[Optional[Path], Optional[str]]:
     """
-    批量生成所有句子的音频文件
+    合成前的准备：预处理文本、查缓存、查永久失败记录
     
     Args:
-        sentences: 句子数据列表
+        sentence: 句子数据
+        idx: 句子序号（用于日志）
+        failed_sentences: 失败记录列表
         
     Returns:
-        生成的音频文件路径列表（失败的位置为 None）
+        (音频文件路径, 需要合成的文本)；文本为 None 表示无需再合成
+        （命中缓存时直接返回缓存文件路径，不再复制；已记录失败时路径为 None）。
+        文件名与音频缓存相同，由内容哈希决定
     """
-    TEMP_AUDIO_DIR.mkdir(parents=True, exist_ok=True)
+    # 朗读预处理后的文本（卡片上仍显示原句）；无法朗读的文本不发送请求
+    text = TTS_SANITIZE.sanitize(sentence["english"])
+    if text is None:
+        record_audio_failure(sentence, idx, "无法朗读（预处理拒绝）", failed_sentences)
+        return None, None
+    audio_file = TEMP_AUDIO_DIR / AUDIO_CACHE.media_name(text, VOICE, RATE, PITCH)
     
-    # 限制并发数，避免过多请求导致失败
-    CONCURRENT_LIMIT = 3  # 进一步降低并发
-    semaphore = asyncio.Semaphore(CONCURRENT_LIMIT)
+    # 先查缓存，命中则无需占用并发名额；打包时直接从缓存读取
+    cached = AUDIO_CACHE.get(text, VOICE, RATE, PITCH)
+    if cached is not None:
+        return cached, None
     
-    # 记录失败句子到文件
-    failed_log = OUTPUT_DIR / "audio_failed_sentences.txt"
-    failed_sentences = []
+    # 之前的运行中已确认无法合成的句子直接跳过
+    known = TTS_FAILURES.get(AUDIO_CACHE.make_key(text, VOICE, RATE, PITCH))
+    if known is not None:
+        record_audio_failure(sentence, idx, f"已知永久失败: {known['reason']}", failed_sentences)
+        return None, None
     
-    async def generate_with_limit(sentence: Dict[str, str], idx: int) -> Optional[Path]:
-        """带并发限制的音频生成任务"""
-        sent_hash = hashlib.md5(sentence['english'].encode()).hexdigest()[:8]
-        audio_file = TEMP_AUDIO_DIR / f"part1_{sent_hash}.mp3"
-        
-        async with semaphore:
-            # 在请求之间添加小延迟，避免速率限制
-            await asyncio.sleep(0.3)
-            success = await generate_audio_with_retry(sentence["english"], audio_file, max_retries=2)
+    return audio_file, text
+
+
+async def generate_sentence_audio(sentence: Dict[str, str], idx: int,
+                                  failed_sentences: List[Dict]) -> Optional[Path]:
+    """
+    为单个句子生成音频（带缓存与自适应并发限制）
+    
+    Args:
+        sentence: 句子数据
+        idx: 句子序号（用于日志）
+        failed_sentences: 失败记录列表，生成失败时追加到其中
         
-        if success:
-            return audio_file
-        else:
-            # 记录失败句子
-            print(f"  ✗ 句子 {idx+1} 音频生成失败: {sentence['english'][:50]}...")
-            failed_sentences.append({
-                'index': idx,
-                'english': sentence['english'],
-                'chinese': sentence['chinese'],
-                'keywords': sentence['keywords']
-            })
-            return None
+    Returns:
+        音频文件路径，失败返回 None
+    """
+    audio_file, text = prepare_sentence_audio(sentence, idx, failed_sentences)
+    if text is None:
+        return audio_file
     
-    print(f"\n开始生成 {len(sentences)} 个音频文件 (并发限制: {CONCURRENT_LIMIT})...")
+    if await generate_audio_with_retry(text, audio_file):
+        return audio_file
     
-    # 创建所有任务
-    tasks = [generate_with_limit(sentence, idx) for idx, sentence in enumerate(sentences)]
-    results = await asyncio.gather(*tasks)
+    record_audio_failure(sentence, idx, "生成失败", failed_sentences)
+    return None
+
+
+async def generate_sentences_audio(items: List[Tuple[int, Dict[str, str]]],
+                                   failed_sentences: List[Dict]) -> List[Optional[Path]]:
+    """
+    为一组句子生成音频
     
-    # 统计结果
-    successful_audio_files = []
-    failed_count = 0
-    for result in results:
-        if result is None:
-            successful_audio_files.append(None)
-            failed_count += 1
+    TTS_BATCH_MODE 开启时，未命中缓存的句子按 TTS_BATCHER.plan 分批，
+    每批只发一次请求；某批失败或时间戳无法对齐时，该批逐句回退
+    
+    Args:
+        items: [(句子序号, 句子数据), ...]
+        failed_sentences: 失败记录列表
+        
+    Returns:
+        与 items 顺序一致的音频文件路径列表（失败的位置为 None）
+    """
+    if not TTS_BATCH_MODE:
+        return list(await asyncio.gather(*[generate_sentence_audio(sentence, idx, failed_sentences)
+                                           for idx, sentence in items]))
+    
+    results: Dict[int, Optional[Path]] = {}
+    pending = []  # (序号, 句子数据, 音频路径, 待合成文本)
+    for idx, sentence in items:
+        audio_file, text = prepare_sentence_audio(sentence, idx, failed_sentences)
+        if text is None:
+            results[idx] = audio_file
         else:
-            successful_audio_files.append(result)
+            pending.append((idx, sentence, audio_file, text))
     
-    success_count = len(sentences) - failed_count
-    print(f"✓ 音频文件生成完成，成功 {success_count} 个，失败 {failed_count} 个\n")
+    async def fallback(idx: int, sentence: Dict[str, str], audio_file: Path, text: str):
+        if await generate_audio_with_retry(text, audio_file):
+            results[idx] = audio_file
+        else:
+            record_audio_failure(sentence, idx, "生成失败", failed_sentences)
+            results[idx] = None
     
-    # 保存失败句子日志
-    if failed_sentences:
-        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-        with open(failed_log, 'w', encoding='utf-8') as f:
-            f.write(f"音频生成失败句子 ({len(failed_sentences)} 个):\n\n")
-            for item in failed_sentences:
-                f.write(f"索引: {item['index']}\n")
-                f.write(f"英文: {item['english']}\n")
-                f.write(f"中文: {item['chinese']}\n")
-                f.write(f"关键词: {item['keywords']}\n")
-                f.write("-" * 80 + "\n")
-        print(f"  失败句子日志已保存到: {failed_log}")
+    async def run_batch(group: List[Tuple[int, Dict[str, str], Path, str]]):
+        if len(group) == 1:
+            await fallback(*group[0])
+            return
+        
+        segments = None
+        
+        async def attempt():
+            nonlocal segments
+            segments = await TTS_BATCHER.synthesize([text for _, _, _, text in group])
+        
+        await run_with_retry(attempt, TTS_RETRY_POLICY, TTS_LIMITER, f"批量 {len(group)} 句")
+        if segments is None:
+            await asyncio.gather(*[fallback(*item) for item in group])
+            return
+        
+        for (idx, _, audio_file, text), data in zip(group, segments):
+            # 片段直接写入缓存，打包时从缓存读取；缓存写入失败才落盘到临时目录
+            cached = AUDIO_CACHE.put_data(text, VOICE, RATE, PITCH, data, label=audio_file.name)
+            if cached is None:
+                write_atomic(audio_file, data)
+                cached = audio_file
+            results[idx] = cached
+        print(f"  ✓ 批量生成音频: {len(group)} 个")
     
-    return successful_audio_files
+    groups = [[pending[i] for i in batch] for batch in TTS_BATCHER.plan([p[3] for p in pending])]
+    await asyncio.gather(*[run_batch(group) for group in groups])
+    return [results[idx] for idx, _ in items]
 
 
-def create_anki_deck(sentences: List[Dict[str, str]], audio_files: List[Optional[Path]]) -> str:
+def save_failed_audio_log(failed_sentences: List[Dict]):
+    """保存音频生成失败的句子到日志文件"""
+    if not failed_sentences:
+        return
+    
+    failed_log = OUTPUT_DIR / "audio_failed_sentences.txt"
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    with open(failed_log, 'w', encoding='utf-8') as f:
+        f.write(f"音频生成失败句子 ({len(failed_sentences)} 个):\n\n")
+        for item in sorted(failed_sentences, key=lambda x: x['index']):
+            f.write(f"索引: {item['index']}\n")
+            f.write(f"英文: {item['english']}\n")
+            f.write(f"中文: {item['chinese']}\n")
+            f.write(f"关键词: {item['keywords']}\n")
+            f.write(f"原因: {item.get('reason', '生成失败')}\n")
+            f.write("-" * 80 + "\n")
+    print(f"  失败句子日志已保存到: {failed_log}")
+
+
+async def generate_all_audio(sentences: List[Dict[str, str]]) -> List[Optional[Path]]:
     """
-    创建 Anki 卡片包
+    批量生成所有句子的音频文件
     
     Args:
         sentences: 句子数据列表
-        audio_files: 音频文件路径列表（可能包含 None）
         
     Returns:
-        生成的 .apkg 文件路径
+        生成的音频文件路径列表（失败的位置为 None）
     """
-    # 定义卡片模板
-    model = genanki.Model(
-        MODEL_ID,
-        'IELTS Part1 Speaking Model',
-        fields=[
-            {'name': 'Chinese'},
-            {'name': 'Keywords'},
-            {'name': 'English'},
-            {'name': 'Audio'},
-        ],
-        templates=[
-            {
-                'name': 'Card 1',
-                'qfmt': '''
-                    <div style="font-family: Arial; font-size: 24px; text-align: center; margin: 20px;">
-                        {{Chinese}}
-                    </div>
-                    <div style="font-size: 14px; color: #888; text-align: center; margin-top: 15px;">
-                        <i>💡 提示: {{Keywords}}</i>
-                    </div>
-                ''',
-                'afmt': '''
-                    <div style="font-family: Arial; font-size: 24px; text-align: center; margin: 20px;">
-                        {{Chinese}}
-                    </div>
-                    <div style="font-size: 14px; color: #888; text-align: center; margin-top: 15px;">
-                        <i>💡 提示: {{Keywords}}</i>
-                    </div>
-                    <hr>
-                    <div style="font-size: 20px; color: #333; text-align: center; margin: 20px;">
-                        {{English}}
-                    </div>
-                    <div style="text-align: center; margin-top: 15px;">
-                        {{Audio}}
-                    </div>
-                ''',
-            },
-        ],
-        css='''
-            .card {
-                font-family: Arial, sans-serif;
-                background-color: #f9f9f9;
-                padding: 20px;
-            }
-        '''
-    )
+    TEMP_AUDIO_DIR.mkdir(parents=True, exist_ok=True)
     
-    # 创建 Deck
-    deck = genanki.Deck(DECK_ID, "IELTS Speaking Part 1")
+    # 并发数由 TTS_LIMITER 根据成功率和延迟自适应调整
+    failed_sentences = []
     
-    # 创建 Package
-    package = genanki.Package(deck)
+    print(f"\n开始生成 {len(sentences)} 个音频文件 (初始并发: {int(TTS_LIMITER.limit)})...")
     
-    print("开始创建 Anki 卡片...")
+    # 批量模式下未命中缓存的句子合并请求
+    results = await generate_sentences_audio(list(enumerate(sentences)), failed_sentences)
     
-    # 添加卡片
-    cards_with_audio = 0
-    cards_without_audio = 0
-    for idx, (sentence, audio_file) in enumerate(zip(sentences, audio_files)):
+    # 统计结果
+    failed_count = sum(1 for result in results if result is None)
+    success_count = len(sentences) - failed_count
+    print(f"✓ 音频文件生成完成，成功 {success_count} 个，失败 {failed_count} 个")
+    print(f"  音频缓存: {AUDIO_CACHE.summary()}")
+    print(f"  TTS 并发: {TTS_LIMITER.summary()}")
+    print(f"  TTS 预处理: {TTS_SANITIZE.summary()}")
+    if TTS_BATCH_MODE:
+        print(f"  TTS 批量合成: {TTS_BATCHER.summary()}")
+    print(f"  TTS 请求: {TTS_METRICS.summary()}")
+    print()
+    
+    # 保存失败句子日志、预处理记录和请求统计
+    save_failed_audio_log(failed_sentences)
+    TTS_SANITIZE.write(TTS_SANITIZE_LOG)
+    TTS_METRICS.write_csv(TTS_METRICS_CSV)
+    
+    return results
+
+
+class AnkiDeckBuilder:
+    """
+    增量构建 Part 1 卡片包
+
+    卡片可以按任意完成顺序加入（附带排序键），导出时按排序键恢复原始顺序
+    """
+    
+    def __init__(self):
+        # 定义卡片模板
+        self.model = genanki.Model(
+            MODEL_ID,
+            'IELTS Part1 Speaking Model',
+            fields=[
+                {'name': 'Chinese'},
+                {'name': 'Keywords'},
+                {'name': 'English'},
+                {'name': 'Audio'},
+            ],
+            templates=[
+                {
+                    'name': 'Card 1',
+                    'qfmt': '''
+                        <div style="font-family: Arial; font-size: 24px; text-align: center; margin: 20px;">
+                            {{Chinese}}
+                        </div>
+                        <div style="font-size: 14px; color: #888; text-align: center; margin-top: 15px;">
+                            <i>💡 提示: {{Keywords}}</i>
+                        </div>
+                    ''',
+                    'afmt': '''
+                        <div style="font-family: Arial; font-size: 24px; text-align: center; margin: 20px;">
+                            {{Chinese}}
+                        </div>
+                        <div style="font-size: 14px; color: #888; text-align: center; margin-top: 15px;">
+                            <i>💡 提示: {{Keywords}}</i>
+                        </div>
+                        <hr>
+                        <div style="font-size: 20px; color: #333; text-align: center; margin: 20px;">
+                            {{English}}
+                        </div>
+                        <div style="text-align: center; margin-top: 15px;">
+                            {{Audio}}
+                        </div>
+                    ''',
+                },
+            ],
+            css='''
+                .card {
+                    font-family: Arial, sans-serif;
+                    background-color: #f9f9f9;
+                    padding: 20px;
+                }
+            '''
+        )
+        self._entries = []  # (排序键, Note, 音频路径, 内容哈希)
+    
+    def add(self, sentence: Dict[str, str], audio_file: Optional[Path], order=None):
+        """
+        添加一张句子卡片
+        
+        Args:
+            sentence: 句子数据
+            audio_file: 音频文件路径（音频缓存或临时目录中以内容哈希命名的文件，可能为 None）
+            order: 排序键，默认按加入顺序
+        """
+        if order is None:
+            order = len(self._entries)
+        
         # 音频字段
         audio_field = f'[sound:{audio_file.name}]' if audio_file is not None else ''
-        # 创建 Note
+        # 创建 Note（GUID 由牌组 ID 和英文句子决定：重新导入时更新原有卡片而不是新建，复习记录得以保留；
+        # 同一句子出现在 Part 2 牌组中时 GUID 不同，互不覆盖）
         note = genanki.Note(
-            model=model,
+            model=self.model,
             fields=[
                 sentence['chinese'],
                 sentence['keywords'],
                 sentence['english'],
                 audio_field
-            ]
+            ],
+            guid=genanki.guid_for(DECK_ID, sentence['english'])
         )
-        deck.add_note(note)
+        # 音频文件名本身就是内容哈希（含语音参数），更换声音后音频变化的卡片也会进入增量包
+        digest = content_hash(sentence['chinese'], sentence['keywords'], sentence['english'],
+                              audio_file.name if audio_file is not None else "")
+        self._entries.append((order, note, audio_file, digest))
         
-        # 添加音频文件到 Package（如果存在）
-        if audio_file is not None:
-            package.media_files.append(str(audio_file))
-            cards_with_audio += 1
-        else:
-            cards_without_audio += 1
+        count = len(self._entries)
+        if count % 10 == 0:
+            print(f"  ✓ 添加句子卡片 {count}")
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def record_notes(self, manifest: BuildManifest) -> None:
+        """把所有卡片的内容哈希写入构建清单，供下次导出增量包时比较"""
+        for _, note, _, digest in self._entries:
+            manifest.record_note(note.guid, digest)
+    
+    def write(self, output_path: Optional[Path] = None, manifest: Optional[BuildManifest] = None) -> Optional[str]:
+        """
+        按排序键整理卡片并导出 .apkg 文件
+        
+        Args:
+            output_path: 输出文件路径，默认为 OUTPUT_APKG
+            manifest: 提供时只导出与上次构建相比新增或内容变化的卡片（增量包）
+        
+        Returns:
+            生成的 .apkg 文件路径；增量包没有任何变化时不生成文件（并删除旧的增量包），返回 None
+        """
+        output_path = output_path or OUTPUT_APKG
+        entries = self._entries
+        if manifest is not None:
+            entries = [entry for entry in entries if manifest.note_changed(entry[1].guid, entry[3])]
+            if not entries:
+                # 删除上次留下的增量包，避免被当作本次的结果再次导入
+                output_path.unlink(missing_ok=True)
+                print("\n✓ 与上次构建相比没有变化的卡片，未生成增量包")
+                return None
+        
+        # 创建 Deck（增量包使用相同的 Deck ID，导入后合并到原牌组）
+        deck = genanki.Deck(DECK_ID, "IELTS Speaking Part 1")
         
-        if (idx + 1) % 10 == 0 or idx == len(sentences) - 1:
-            print(f"  ✓ 添加句子卡片 {idx + 1}/{len(sentences)}")
+        # 媒体直接从音频所在位置写入 .apkg，不再复制到临时目录
+        writer = ApkgWriter()
+        
+        cards_with_audio = 0
+        cards_without_audio = 0
+        for _, note, audio_file, _ in sorted(entries, key=lambda entry: entry[0]):
+            deck.add_note(note)
+            
+            # 添加音频文件（如果存在），相同内容的音频只写入一次
+            if audio_file is not None:
+                writer.add_media(audio_file.name, audio_file)
+                cards_with_audio += 1
+            else:
+                cards_without_audio += 1
+        
+        # 导出 .apkg 文件
+        writer.write(deck, output_path)
+        print(f"\n✓ 成功生成 Anki 包: {output_path}")
+        print(f"  - {len(entries)} 张句子卡片（{cards_with_audio} 张带音频，{cards_without_audio} 张无音频）")
+        print(f"  - {writer.summary()}")
+        
+        return str(output_path)
+
+
+def create_anki_deck(sentences: List[Dict[str, str]], audio_files: List[Optional[Path]]) -> str:
+    """
+    创建 Anki 卡片包
     
-    # 导出 .apkg 文件
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    package.write_to_file(str(OUTPUT_APKG))
-    print(f"\n✓ 成功生成 Anki 包: {OUTPUT_APKG}")
-    print(f"  - {len(sentences)} 张句子卡片（{cards_with_audio} 张带音频，{cards_without_audio} 张无音频）")
+    Args:
+        sentences: 句子数据列表
+        audio_files: 音频文件路径列表（可能包含 None）
+        
+    Returns:
+        生成的 .apkg 文件路径
+    """
+    builder = AnkiDeckBuilder()
     
-    return str(OUTPUT_APKG)
+    print("开始创建 Anki 卡片...")
+    
+    for sentence, audio_file in zip(sentences, audio_files):
+        builder.add(sentence, audio_file)
+    
+    return builder.write()
+
+
+async def run_streaming_pipeline(batch_texts: List[Union[str, List[str]]], refresh: bool = False,
+                                 resolved: Optional[List[List[Dict[str, str]]]] = None,
+                                 manifest: Optional[BuildManifest] = None,
+                                 sentence_order: Optional[Dict[str, int]] = None,
+                                 delta: bool = False) -> str:
+    """
+    以流水线方式完成 AI 拆解、语音生成和卡片构建
+    
+    每个批次解析完成后，句子立即进入 TTS 队列；每个音频完成后，
+    卡片立即交给卡片构建器。三个阶段同时进行，总耗时接近最慢的阶段
+    
+    Args:
+        batch_texts: 每个批次的文本（需要请求 DeepSeek 的句子）
+        refresh: 为 True 时跳过 LLM 缓存，强制重新请求
+        resolved: 构建清单中已有结果的句子（分组），直接进入 TTS 队列
+        manifest: 构建清单，新解析的句子会记录进去
+        sentence_order: 英文句子 -> 卡片顺序；为 None 时按批次顺序排列
+        delta: 为 True 时另外导出只含变化卡片的增量包（需要 manifest）
+        
+    Returns:
+        生成的 .apkg 文件路径
+    """
+    TEMP_AUDIO_DIR.mkdir(parents=True, exist_ok=True)
+    
+    tts_queue: asyncio.Queue = asyncio.Queue()
+    note_queue: asyncio.Queue = asyncio.Queue()
+    failed_sentences = []
+    builder = AnkiDeckBuilder()
+    parsed_count = 0
+    
+    async def on_batch(batch_idx: int, parsed: List[Dict[str, str]]):
+        """生产者回调：批次解析完成后立即把整批句子送入 TTS 队列（批量模式下合并合成）"""
+        nonlocal parsed_count
+        if manifest is not None and batch_idx >= 0:
+            for sentence in parsed:
+                manifest.record(sentence)
+        await tts_queue.put((batch_idx, parsed_count, parsed))
+        parsed_count += len(parsed)
+    
+    async def tts_worker():
+        """消费者：生成音频后把卡片送入构建队列"""
+        while True:
+            job = await tts_queue.get()
+            if job is None:
+                break
+            batch_idx, first_idx, parsed = job
+            audio_files = await generate_sentences_audio(list(enumerate(parsed, first_idx)), failed_sentences)
+            for pos, (sentence, audio_file) in enumerate(zip(parsed, audio_files)):
+                if sentence_order is not None:
+                    order = (sentence_order.get(sentence['english'], len(sentence_order)), batch_idx, pos)
+                else:
+                    order = (batch_idx, pos)
+                await note_queue.put((order, sentence, audio_file))
+    
+    async def deck_consumer():
+        """消费者：把完成的卡片加入卡片包"""
+        while True:
+            item = await note_queue.get()
+            if item is None:
+                break
+            order, sentence, audio_file = item
+            builder.add(sentence, audio_file, order=order)
+    
+    print(f"  TTS 工作协程: {TTS_PIPELINE_WORKERS} 个 (初始并发: {int(TTS_LIMITER.limit)}，上限: {TTS_CONCURRENCY_MAX})")
+    
+    workers = [asyncio.create_task(tts_worker()) for _ in range(TTS_PIPELINE_WORKERS)]
+    consumer = asyncio.create_task(deck_consumer())
+    
+    try:
+        # 清单中已有结果的句子不经过 DeepSeek，立即开始合成（批次序号为负，不会再记录进清单）
+        for k, group in enumerate(resolved or []):
+            await on_batch(-1 - k, group)
+        if batch_texts:
+            await parse_batches_concurrently(batch_texts, refresh=refresh, on_batch=on_batch)
+        
+        # 生产结束：通知所有 TTS 工作协程退出，再通知卡片构建器退出
+        for _ in workers:
+            await tts_queue.put(None)
+        await asyncio.gather(*workers)
+        await note_queue.put(None)
+        await consumer
+    except BaseException:
+        for task in workers + [consumer]:
+            task.cancel()
+        raise
+    
+    failed_count = len(failed_sentences)
+    print(f"\n✓ 共解析 {parsed_count} 个句子")
+    print(f"  LLM 缓存: {LLM_CACHE.summary()}")
+    print(f"  LLM 分批: {LLM_BATCHER.summary()}")
+    if manifest is not None:
+        print(f"  构建清单: {manifest.summary()}")
+    print(f"✓ 音频生成完成，成功 {parsed_count - failed_count} 个，失败 {failed_count} 个")
+    print(f"  音频缓存: {AUDIO_CACHE.summary()}")
+    print(f"  TTS 并发: {TTS_LIMITER.summary()}")
+    print(f"  TTS 预处理: {TTS_SANITIZE.summary()}")
+    if TTS_BATCH_MODE:
+        print(f"  TTS 批量合成: {TTS_BATCHER.summary()}")
+    print(f"  TTS 请求: {TTS_METRICS.summary()}")
+    save_failed_audio_log(failed_sentences)
+    TTS_SANITIZE.write(TTS_SANITIZE_LOG)
+    TTS_METRICS.write_csv(TTS_METRICS_CSV)
+    
+    apkg_file = builder.write()
+    if manifest is not None:
+        if delta:
+            builder.write(OUTPUT_DELTA_APKG, manifest=manifest)
+        builder.record_notes(manifest)
+    elif delta:
+        print("警告: 增量包需要构建清单（LOCAL_SPLIT_MODE），本次只生成完整卡片包")
+    return apkg_file
 
 
 def cleanup_temp_files():
-    """删除临时音频文件"""
+    """删除临时音频文件，并淘汰过期的音频/LLM 缓存"""
+    evicted = AUDIO_CACHE.evict()
+    if evicted:
+        print(f"✓ 音频缓存淘汰 {evicted} 个旧文件")
+    purged = LLM_CACHE.purge_expired()
+    if purged:
+        print(f"✓ LLM 缓存清除 {purged} 条过期记录")
+    
     if TEMP_AUDIO_DIR.exists():
         for file in TEMP_AUDIO_DIR.glob("*.mp3"):
             try:
@@ -699,14 +1639,72 @@ def cleanup_temp_files():
             print(f"警告: 无法删除临时目录: {e}")
 
 
-async def main():
+def parse_args() -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="雅思口语 Part 1 Anki 卡片生成器")
+    parser.add_argument("--refresh-llm", action="store_true",
+                        help="忽略 LLM 缓存，重新请求 DeepSeek（结果仍会写回缓存）")
+    parser.add_argument("--retry-failed-audio", action="store_true",
+                        help="清空 TTS 永久失败记录，重新尝试之前无法合成的句子")
+    parser.add_argument("--full-rebuild", action="store_true",
+                        help="忽略增量构建清单，所有句子重新经过 DeepSeek（仍使用 LLM 缓存）")
+    parser.add_argument("--delta", action="store_true",
+                        help=f"另外导出只含上次构建后新增或修改卡片的增量包（{OUTPUT_DELTA_APKG.name}）")
+    return parser.parse_args()
+
+
+def manifest_fingerprint() -> str:
+    """影响句子翻译和关键词的配置指纹，任一项变化时清单中的旧结果作废"""
+    return content_hash(LLM_MODEL, str(LLM_TEMPERATURE), LLM_SYSTEM_PROMPT, build_annotate_prompt([]))
+
+
+def plan_incremental_build(qa_pairs: List[Dict[str, str]], unique_items: List[Dict],
+                           manifest: BuildManifest) -> Tuple[List[str], List[List[Dict[str, str]]]]:
+    """
+    对比构建清单，把句子分成需要请求 DeepSeek 的新句子和可直接复用的旧句子
+
+    Args:
+        qa_pairs: 本次的问题-回答对
+        unique_items: 去重后的句子
+        manifest: 构建清单
+
+    Returns:
+        (新句子列表, 复用句子的分组)
+    """
+    added, changed, removed, unchanged = manifest.diff_qa(qa_pairs)
+    print(f"  问题-回答对: 新增 {added}，修改 {changed}，删除 {removed}，未变 {unchanged}")
+    
+    new_sentences, reused = [], []
+    for item in unique_items:
+        cached = manifest.lookup(item['sentence'])
+        if cached is None:
+            new_sentences.append(item['sentence'])
+        else:
+            reused.append(cached)
+    print(f"  句子: 复用 {len(reused)} 个，需要请求 DeepSeek {len(new_sentences)} 个")
+    
+    # 复用的句子按 TTS 批量大小分组，与新句子一样批量合成
+    groups = [reused[i:i + TTS_BATCH_MAX_SENTENCES] for i in range(0, len(reused), TTS_BATCH_MAX_SENTENCES)]
+    return new_sentences, groups
+
+
+async def main(refresh_llm: bool = False, retry_failed_audio: bool = False, full_rebuild: bool = False,
+               delta: bool = False):
     """主执行流程"""
     print("=" * 60)
     print("雅思口语 Part 1 Anki 卡片生成器".center(60))
     print("=" * 60)
     print()
     
+    if retry_failed_audio:
+        cleared = TTS_FAILURES.clear()
+        print(f"✓ 已清空 {cleared} 条 TTS 永久失败记录\n")
+    
     try:
+        # 可选：在读取和解析文本期间后台预热语义模型
+        if SEMANTIC_MODEL_WARMUP and USE_SEMANTIC_DEDUP and SEMANTIC_AVAILABLE:
+            model_registry.warmup_in_background(SEMANTIC_MODEL_NAME)
+        
         # Step 0: 读取输入文件
         print("📄 Step 0: 读取 Part1 文本文件...")
         if not INPUT_FILE.exists():
@@ -730,33 +1728,34 @@ async def main():
         unique_items, source_map = deduplicate_sentences(qa_pairs)
         print()
         
-        # 合并所有独特句子用于 AI 处理
-        combined_text = " ".join([item['sentence'] for item in unique_items])
+        # Step 3-5: 流水线执行 AI 拆解 → 语音生成 → 卡片构建
+        print("🤖 Step 3-5: DeepSeek 拆解句子 → Edge-TTS 生成语音 → 生成 Anki 卡片包（流水线并行）...")
+        # 本地切分模式下按句子对比构建清单，只有新增或修改的句子才请求 DeepSeek
+        # （由模型拆分句子时无法把结果对应回原句，每次完整处理）
+        manifest, resolved, sentence_order = None, [], None
+        new_sentences = [item['sentence'] for item in unique_items]
+        if LOCAL_SPLIT_MODE:
+            manifest = BuildManifest(BUILD_MANIFEST_FILE, manifest_fingerprint())
+            sentence_order = {sentence: i for i, sentence in enumerate(new_sentences)}
+            if not (full_rebuild or refresh_llm):
+                new_sentences, resolved = plan_incremental_build(qa_pairs, unique_items, manifest)
+            for qa in qa_pairs:
+                manifest.record_qa(qa, split_answer_sentences(qa['answer']))
         
-        # Step 3: 调用 AI 拆解句子
-        print("🤖 Step 3: 使用 DeepSeek API 拆解句子...")
-        # 为了效率，分批处理（每批最多 10 个句子）
-        batch_size = 10
-        all_parsed_sentences = []
-        
-        for i in range(0, len(unique_items), batch_size):
-            batch = unique_items[i:i+batch_size]
-            batch_text = " ".join([item['sentence'] for item in batch])
-            
-            print(f"\n  处理批次 {i//batch_size + 1}/{(len(unique_items) + batch_size - 1)//batch_size}...")
-            parsed = parse_text_with_ai(batch_text)
-            all_parsed_sentences.extend(parsed)
-        
-        print(f"\n✓ 共解析 {len(all_parsed_sentences)} 个句子")
-        print()
-        
-        # Step 4: 生成音频文件
-        print("🔊 Step 4: 使用 Edge-TTS 生成语音文件...")
-        audio_files = await generate_all_audio(all_parsed_sentences)
+        # 按估算的输入/输出 token 数分批，短句多装、长句少装
+        # 本地切分模式直接发送去重后的句子列表，返回结果按 id 与句子一一对应
+        batches = LLM_BATCHER.plan(new_sentences)
+        if LOCAL_SPLIT_MODE:
+            batch_texts = batches
+        else:
+            batch_texts = [" ".join(batch) for batch in batches]
+        print(f"  分批: {LLM_BATCHER.summary()}")
         
-        # Step 5: 创建 Anki 卡片包
-        print("📦 Step 5: 生成 Anki 卡片包...")
-        apkg_file = create_anki_deck(all_parsed_sentences, audio_files)
+        apkg_file = await run_streaming_pipeline(batch_texts, refresh=refresh_llm, resolved=resolved,
+                                                 manifest=manifest, sentence_order=sentence_order,
+                                                 delta=delta)
+        if manifest is not None:
+            manifest.save()
         
         print()
         print("=" * 60)
@@ -782,4 +1781,6 @@ async def main():
 
 # ============= 程序入口 =============
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    args = parse_args()
+    asyncio.run(main(refresh_llm=args.refresh_llm, retry_failed_audio=args.retry_failed_audio,
+                     full_rebuild=args.full_rebuild, delta=args.delta))
\ No newline at end of file
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+从格式错误或被截断的 JSON 数组中抢救完整的对象
+逐个用 json.JSONDecoder.raw_decode 解析数组元素，坏掉的元素跳过到下一个 '{'，
+截断处之前的所有完整对象都能保留；调用方只需为缺失的部分重新请求
+"""
+
+import re
+import json
+from typing import Any, List, Tuple
+
+
+_DECODER = json.JSONDecoder()
+
+
+class PartialResponseError(ValueError):
+    """
+    返回内容只有部分条目有效
+
+    pieces 按原顺序排列：已解析的条目为 dict，缺失的部分为需要重新请求的子批次
+    （句子列表或文本），调用方只重新请求子批次，再按顺序拼接
+    """
+
+    def __init__(self, pieces: List[Any], recovered: int, missing: int):
+        super().__init__(f"部分条目无效：保留 {recovered} 项，{missing} 部分需要重新请求")
+        self.pieces = pieces
+        self.recovered = recovered
+        self.missing = missing
+
+
+def strip_code_fence(content: str) -> str:
+    """去掉首尾空白和 Markdown 代码块标记"""
+    content = content.strip()
+    content = re.sub(r'^```json\s*', '', content)
+    content = re.sub(r'^```\s*', '', content)
+    content = re.sub(r'\s*```$', '', content)
+    return content
+
+
+def salvage_json_array(content: str) -> Tuple[List[Any], bool]:
+    """
+    增量解析 JSON 数组，返回所有能完整解析的元素
+
+    Args:
+        content: 模型返回的文本（可以带代码块、前后说明文字，或在任意位置被截断）
+
+    Returns:
+        (元素列表, 是否完整)：完整表示数组正常闭合且没有跳过任何内容；
+        空数组 [] 返回 ([], True)
+
+    Raises:
+        json.JSONDecodeError: 找不到数组开头，或数组不为空却一个元素都解析不出来
+    """
+    content = strip_code_fence(content)
+    start = content.find('[')
+    if start == -1:
+        raise json.JSONDecodeError("找不到 JSON 数组", content, 0)
+
+    items = []
+    complete = True
+    pos = start + 1
+    n = len(content)
+    while True:
+        # 跳过空白和元素之间的逗号
+        while pos < n and content[pos] in ' \t\r\n,':
+            pos += 1
+        if pos >= n:
+            complete = False  # 被截断，数组没有闭合
+            break
+        if content[pos] == ']':
+            # 只有空白的 [] 是合法的空数组；[,,] 之类仍视为无法解析
+            if not items and complete and not content[start + 1:pos].strip():
+                return [], True
+            break
+        try:
+            item, pos = _DECODER.raw_decode(content, pos)
+            items.append(item)
+        except json.JSONDecodeError:
+            complete = False
+            # 跳到下一个对象开头继续解析；没有则视为截断
+            nxt = content.find('{', pos + 1)
+            if nxt == -1:
+                break
+            pos = nxt
+
+    if not items:
+        raise json.JSONDecodeError("没有可解析的数组元素", content, start)
+    return items, complete
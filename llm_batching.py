@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按 token 预算为 DeepSeek 请求分批
+用字符数估算 token（DeepSeek 官方换算：1 个英文字符约 0.3 token，1 个中文字符约 0.6 token），
+按输入和预计输出的 token 数装箱，替代固定句子数的分批；
+输出被截断时由调用方把批次一分为二重新请求，而不是原样重试
+"""
+
+import re
+from typing import List, Optional, Union
+
+
+# 每个字符的 token 数（DeepSeek 文档给出的经验值）
+ASCII_TOKENS_PER_CHAR = 0.3
+CJK_TOKENS_PER_CHAR = 0.6
+
+# 输出估算：每项 JSON 结构（id/键名/引号/缩进）约 20 token，关键词约 10 token，
+# 中文翻译约为英文原句 token 数的 0.8 倍
+ITEM_OVERHEAD_TOKENS = 20
+KEYWORDS_TOKENS = 10
+TRANSLATION_RATIO = 0.8
+
+# 句子边界：句末标点后跟空白和大写字母（split_answer_sentences 切分回答与 split_batch 拆分批次共用，"e.g. this" 不会被拆开）
+SENTENCE_BOUNDARY_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z])')
+
+
+class TruncatedResponseError(Exception):
+    """模型输出达到 max_tokens 被截断（finish_reason == "length"），原样重试只会再次截断"""
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    本地估算文本的 token 数
+
+    Args:
+        text: 任意文本
+
+    Returns:
+        估算的 token 数（向上取整，至少为 1）
+    """
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    other_chars = len(text) - ascii_chars
+    return max(1, int(ascii_chars * ASCII_TOKENS_PER_CHAR + other_chars * CJK_TOKENS_PER_CHAR + 0.999))
+
+
+def estimate_output_tokens(sentence: str, include_english: bool = False) -> int:
+    """
+    估算一个句子在返回 JSON 中占用的 token 数
+
+    Args:
+        sentence: 英文句子
+        include_english: 返回结果是否包含 english 字段（由模型拆分句子时为 True）
+
+    Returns:
+        估算的输出 token 数
+    """
+    tokens = estimate_tokens(sentence)
+    total = ITEM_OVERHEAD_TOKENS + KEYWORDS_TOKENS + int(tokens * TRANSLATION_RATIO + 0.999)
+    if include_english:
+        total += tokens
+    return total
+
+
+def split_batch(batch: Union[str, List[str]]) -> Optional[List[Union[str, List[str]]]]:
+    """
+    把一个批次一分为二
+
+    Args:
+        batch: 句子列表，或由多个句子拼接的文本
+
+    Returns:
+        两个更小的批次（与输入同类型）；只剩一个句子无法再拆时返回 None
+    """
+    if isinstance(batch, str):
+        sentences = [s for s in SENTENCE_BOUNDARY_RE.split(batch.strip()) if s]
+        halves = split_batch(sentences)
+        return None if halves is None else [" ".join(half) for half in halves]
+    if len(batch) < 2:
+        return None
+    mid = len(batch) // 2
+    return [batch[:mid], batch[mid:]]
+
+
+class TokenBudgetBatcher:
+    """按输入/输出 token 预算把句子装箱"""
+
+    def __init__(self, max_input_tokens: int = 1500, max_output_tokens: int = 1500,
+                 max_sentences: int = 40, include_english: bool = False):
+        """
+        Args:
+            max_input_tokens: 每批句子部分的输入 token 上限（不含固定的提示词模板）
+            max_output_tokens: 每批预计输出 token 上限，应明显小于请求的 max_tokens，为估算误差留余量
+            max_sentences: 每批最多句子数（限制单次失败的影响范围）
+            include_english: 返回结果是否包含 english 字段
+        """
+        self.max_input_tokens = max_input_tokens
+        self.max_output_tokens = max_output_tokens
+        self.max_sentences = max_sentences
+        self.include_english = include_english
+        self.batches = 0
+        self.sentences = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.splits = 0  # 因输出截断而拆分的次数
+
+    def plan(self, sentences: List[str]) -> List[List[str]]:
+        """
+        按顺序装箱，任一预算将被超出时开始新的批次
+
+        单个句子超过预算时独占一批
+
+        Args:
+            sentences: 句子列表
+
+        Returns:
+            每批的句子列表（保持原顺序）
+        """
+        batches, current = [], []
+        input_tokens = output_tokens = 0
+        for sentence in sentences:
+            n_in = estimate_tokens(sentence) + 8  # 每项的 {"id": n, "english": ...} 结构
+            n_out = estimate_output_tokens(sentence, self.include_english)
+            if current and (input_tokens + n_in > self.max_input_tokens
+                            or output_tokens + n_out > self.max_output_tokens
+                            or len(current) >= self.max_sentences):
+                batches.append(current)
+                current, input_tokens, output_tokens = [], 0, 0
+            current.append(sentence)
+            input_tokens += n_in
+            output_tokens += n_out
+            self.input_tokens += n_in
+            self.output_tokens += n_out
+        if current:
+            batches.append(current)
+
+        self.batches += len(batches)
+        self.sentences += len(sentences)
+        return batches
+
+    def summary(self) -> str:
+        """返回分批统计"""
+        if not self.batches:
+            return "未分批"
+        return (f"{self.sentences} 个句子分为 {self.batches} 批（平均 {self.sentences / self.batches:.1f} 句/批），"
+                f"估算输入 {self.input_tokens} / 输出 {self.output_tokens} token，截断拆分 {self.splits} 次")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DeepSeek 响应持久缓存
+以 (模型, 温度, 系统提示词, 用户提示词) 的哈希为键，
+将校验通过的解析结果保存在本地 SQLite 中，避免重复请求同一批次
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+
+class LLMCache:
+    """
+    基于 SQLite 的 LLM 响应缓存
+
+    只缓存已经通过结构校验的结果（JSON 可序列化对象），
+    未通过校验的响应不会写入，下次运行会重新请求
+    """
+
+    def __init__(self, db_path: Path, ttl_seconds: Optional[float] = None):
+        """
+        Args:
+            db_path: SQLite 数据库文件路径
+            ttl_seconds: 条目有效期（秒），None 表示永不过期
+        """
+        self.db_path = Path(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """惰性打开数据库连接（首次使用时才创建文件）"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "  key TEXT PRIMARY KEY,"
+                "  model TEXT NOT NULL,"
+                "  value TEXT NOT NULL,"
+                "  created_at REAL NOT NULL"
+                ")"
+            )
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def make_key(model: str, temperature: float, system_prompt: str, user_prompt: str) -> str:
+        """
+        计算缓存键（SHA-256）
+
+        Returns:
+            64 位十六进制哈希字符串
+        """
+        payload = json.dumps([model, temperature, system_prompt, user_prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        查询缓存
+
+        Returns:
+            命中返回缓存的对象，未命中或已过期返回 None
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+        if row is not None:
+            value, created_at = row
+            if self.ttl_seconds is None or time.time() - created_at <= self.ttl_seconds:
+                self.hits += 1
+                return json.loads(value)
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, model: str, value: Any) -> None:
+        """写入（或覆盖）一条缓存"""
+        data = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, value, created_at) VALUES (?, ?, ?, ?)",
+                (key, model, data, time.time())
+            )
+            conn.commit()
+
+    def purge_expired(self) -> int:
+        """
+        删除过期条目
+
+        Returns:
+            删除的条目数
+        """
+        if self.ttl_seconds is None or not self.db_path.exists():
+            return 0
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            conn.commit()
+            return cursor.rowcount
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def summary(self) -> str:
+        """返回本次运行的命中统计"""
+        return f"命中 {self.hits} 次，未命中 {self.misses} 次"
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多牌组合并导出
+把多个 .apkg（Part 1 与各个 Part 2 话题）合并成一个卡片包：
+- 每个牌组、模板和卡片原样保留（GUID 包含牌组，同一句子在不同牌组中是不同的卡片）
+- 媒体按文件名（内容哈希）去重，每个 MP3 只写入一次
+
+用法:
+    python merge_decks.py output/IELTS_All.apkg output/IELTS_Part1_Speaking.apkg output/IELTS_Part2_*.apkg
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import zipfile
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+from genanki.apkg_col import APKG_COL
+from genanki.apkg_schema import APKG_SCHEMA
+
+from apkg_writer import ApkgWriter
+
+
+class MergeStats:
+    """合并统计"""
+
+    def __init__(self):
+        self.packages = 0
+        self.notes = 0
+        self.duplicate_notes = 0
+        self.media = 0
+        self.duplicate_media = 0
+        self.input_bytes = 0
+        self.output_bytes = 0
+
+    def summary(self) -> str:
+        saved = self.input_bytes - self.output_bytes
+        duplicates = f"（跳过重复输入的卡片 {self.duplicate_notes}）" if self.duplicate_notes else ""
+        return (f"{self.packages} 个卡片包 → {self.notes} 张卡片{duplicates}，"
+                f"{self.media} 个媒体文件（跳过重复 {self.duplicate_media}），"
+                f"{self.input_bytes / 1024 / 1024:.1f} MB → {self.output_bytes / 1024 / 1024:.1f} MB"
+                f"（减少 {saved / 1024 / 1024:.1f} MB）")
+
+
+def _merge_json_column(dst: sqlite3.Connection, src: sqlite3.Connection, column: str) -> None:
+    """合并 col 表中以 id 为键的 JSON 字典（models / decks / dconf）"""
+    merged = json.loads(dst.execute(f"SELECT {column} FROM col").fetchone()[0])
+    for key, value in json.loads(src.execute(f"SELECT {column} FROM col").fetchone()[0]).items():
+        merged.setdefault(key, value)
+    dst.execute(f"UPDATE col SET {column} = ?", (json.dumps(merged),))
+
+
+def _free_id(wanted: int, used: set) -> int:
+    """wanted 未被占用时直接使用，否则顺延到下一个空闲的 id"""
+    while wanted in used:
+        wanted += 1
+    used.add(wanted)
+    return wanted
+
+
+def merge_packages(inputs: List[Path], output: Path) -> MergeStats:
+    """
+    合并多个 .apkg
+
+    Args:
+        inputs: 输入卡片包
+        output: 输出文件路径
+
+    Returns:
+        合并统计
+    """
+    stats = MergeStats()
+    writer = ApkgWriter()
+    archives = []
+    tmp_files = []
+
+    fd, db_name = tempfile.mkstemp(suffix=".anki2")
+    os.close(fd)
+    tmp_files.append(db_name)
+    try:
+        dst = sqlite3.connect(db_name)
+        dst.executescript(APKG_SCHEMA)
+        dst.executescript(APKG_COL)
+        guids: Dict[str, int] = {}
+        note_ids, card_ids = set(), set()
+
+        for path in inputs:
+            path = Path(path)
+            stats.packages += 1
+            stats.input_bytes += path.stat().st_size
+            archive = zipfile.ZipFile(path)
+            archives.append(archive)
+
+            fd, src_name = tempfile.mkstemp(suffix=".anki2")
+            os.close(fd)
+            tmp_files.append(src_name)
+            with open(src_name, 'wb') as f:
+                f.write(archive.read('collection.anki2'))
+            src = sqlite3.connect(src_name)
+            try:
+                for column in ("models", "decks", "dconf"):
+                    _merge_json_column(dst, src, column)
+
+                # 卡片全部保留，id 冲突时重新分配；GUID 只会在同一牌组被重复输入时相同
+                # （如完整包和它的增量包），同一集合中 GUID 必须唯一，这种情况保留先出现的一份
+                note_map: Dict[int, int] = {}
+                for row in src.execute("SELECT * FROM notes"):
+                    if row[1] in guids:
+                        stats.duplicate_notes += 1
+                        continue
+                    new_id = _free_id(row[0], note_ids)
+                    guids[row[1]] = new_id
+                    note_map[row[0]] = new_id
+                    dst.execute("INSERT INTO notes VALUES (?,?,?,?,?,?,?,?,?,?,?)", (new_id,) + row[1:])
+                    stats.notes += 1
+                for row in src.execute("SELECT * FROM cards"):
+                    if row[1] not in note_map:
+                        continue
+                    new_id = _free_id(row[0], card_ids)
+                    dst.execute("INSERT INTO cards VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                                (new_id, note_map[row[1]]) + row[2:])
+            finally:
+                src.close()
+
+            # 媒体按文件名去重，写入时才从原卡片包中读取
+            for index, name in json.loads(archive.read('media')).items():
+                if name in writer.media:
+                    stats.duplicate_media += 1
+                    continue
+                writer.add_media(name, lambda archive=archive, index=index: archive.read(index))
+                stats.media += 1
+
+        dst.commit()
+        dst.close()
+        writer.write_collection(db_name, output)
+        stats.output_bytes = Path(output).stat().st_size
+    finally:
+        for archive in archives:
+            archive.close()
+        for name in tmp_files:
+            if os.path.exists(name):
+                os.unlink(name)
+    return stats
+
+
+def parse_args() -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="把多个 Anki 卡片包合并为一个（共用的音频只存一份）")
+    parser.add_argument("output", type=Path, help="输出的 .apkg 文件")
+    parser.add_argument("inputs", type=Path, nargs="+", help="要合并的 .apkg 文件")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    inputs = [path for path in args.inputs if path.resolve() != args.output.resolve()]
+    missing = [path for path in inputs if not path.exists()]
+    if missing:
+        print(f"✗ 错误: 找不到卡片包: {', '.join(map(str, missing))}")
+        sys.exit(1)
+    stats = merge_packages(inputs, args.output)
+    print(f"✓ 成功生成合并卡片包: {args.output}")
+    print(f"  {stats.summary()}")
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地 DeepSeek / OpenAI 兼容模拟服务器
+实现 POST /chat/completions，按确定性规则拆分句子（或为带编号的句子补充翻译和关键词）并返回 JSON，
+可注入延迟、429、5xx 以及格式错误的响应（含 Markdown 代码块），
+并按请求的 max_tokens 截断输出（finish_reason 为 "length"），用于离线压测批处理、重试和缓存
+
+用法:
+    python mock_deepseek_server.py --port 8765 --latency 0.2 --rate-429 0.1
+    DEEPSEEK_BASE_URL=http://127.0.0.1:8765 DEEPSEEK_API_KEY=mock python generate_part1_anki.py
+"""
+
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from llm_batching import SENTENCE_BOUNDARY_RE
+
+
+class MockConfig:
+    """模拟服务器的行为参数"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0,
+                 rate_429: float = 0.0, rate_5xx: float = 0.0,
+                 malformed_rate: float = 0.0, fence_rate: float = 0.0, seed: int = 0):
+        """
+        Args:
+            latency: 每个请求的固定延迟（秒）
+            jitter: 额外延迟上限（秒），由请求内容确定
+            rate_429: 返回 429 的概率
+            rate_5xx: 返回 500/502/503 的概率
+            malformed_rate: 返回格式错误 JSON 的概率（截断、多余文字、缺字段）
+            fence_rate: 用 ```json 代码块包裹响应的概率
+            seed: 参与哈希的种子，改变后得到另一组可复现的故障序列
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.malformed_rate = malformed_rate
+        self.fence_rate = fence_rate
+        self.seed = seed
+
+
+def split_sentences(text: str) -> List[str]:
+    """按 split_answer_sentences 使用的句子边界切分（不过滤短句）"""
+    sentences = SENTENCE_BOUNDARY_RE.split(text.strip())
+    return [s.strip() for s in sentences if s.strip()]
+
+
+def fake_keywords(sentence: str) -> str:
+    """取句子中前 3 个较长的词作为关键词"""
+    words = [w for w in re.findall(r"[A-Za-z']+", sentence) if len(w) > 3]
+    return ", ".join(words[:3]) or sentence.split()[0]
+
+
+def extract_input_text(prompt: str) -> str:
+    """从提示词中取出“输入文本”部分，找不到时使用整个提示词"""
+    match = re.search(r'输入文本：\s*\n(.*?)\n\s*\n返回格式示例', prompt, re.S)
+    return match.group(1).strip() if match else prompt.strip()
+
+
+def extract_numbered_sentences(prompt: str) -> Optional[List[Dict]]:
+    """从本地切分模式的提示词中取出带 id 的句子列表，不是该模式时返回 None"""
+    match = re.search(r'输入句子（JSON）：\s*\n(.*?)\n\s*\n返回格式示例', prompt, re.S)
+    return json.loads(match.group(1)) if match else None
+
+
+def build_sentence_json(prompt: str) -> str:
+    """确定性地生成句子拆解结果；本地切分模式下只按 id 返回翻译和关键词"""
+    numbered = extract_numbered_sentences(prompt)
+    if numbered is not None:
+        items = [{
+            "id": item["id"],
+            "chinese": f"（模拟翻译）{item['english']}",
+            "keywords": fake_keywords(item["english"]),
+        } for item in numbered]
+        return json.dumps(items, ensure_ascii=False, indent=2)
+    items = [{
+        "english": sentence,
+        "chinese": f"（模拟翻译）{sentence}",
+        "keywords": fake_keywords(sentence),
+    } for sentence in split_sentences(extract_input_text(prompt))]
+    return json.dumps(items, ensure_ascii=False, indent=2)
+
+
+def build_notes(prompt: str) -> str:
+    """生成 1 分钟笔记（纯文本）"""
+    words = re.findall(r"[A-Za-z']{5,}", prompt)
+    return "Notes: " + ", ".join(dict.fromkeys(words[:12]))
+
+
+def malform(content: str, variant: int) -> str:
+    """按 variant 生成三种格式错误的响应"""
+    if variant == 0:
+        return content[:max(1, len(content) // 2)]  # 截断
+    if variant == 1:
+        return "Sure! Here is the JSON you asked for:\n" + content + "\nLet me know if you need more."
+    return re.sub(r'"keywords": "[^"]*",?\s*', '', content, count=1)  # 第一项缺少 keywords
+
+
+class MockState:
+    """服务器运行状态：收到的提示词、每个提示词的请求次数和整体统计"""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.lock = threading.Lock()
+        self.attempts: Dict[str, int] = {}
+        self.prompts: List[str] = []  # 按到达顺序记录的用户提示词
+        self.stats = {"requests": 0, "429": 0, "5xx": 0, "malformed": 0, "fenced": 0, "truncated": 0, "ok": 0}
+
+    def draw(self, prompt: str) -> Tuple[float, float, float]:
+        """
+        为本次请求生成三个 [0, 1) 的确定性随机数
+
+        以 (种子, 提示词, 该提示词第几次请求) 的哈希为来源，
+        因此同一输入的故障序列与并发顺序无关，重试会得到新的结果
+        """
+        with self.lock:
+            n = self.attempts.get(prompt, 0)
+            self.attempts[prompt] = n + 1
+            self.prompts.append(prompt)
+            self.stats["requests"] += 1
+        digest = hashlib.sha256(f"{self.config.seed}\x1f{n}\x1f{prompt}".encode('utf-8')).digest()
+        return tuple(int.from_bytes(digest[i:i + 4], "big") / 2 ** 32 for i in (0, 4, 8))
+
+    def count(self, key: str) -> None:
+        with self.lock:
+            self.stats[key] += 1
+
+
+def make_handler(state: MockState):
+    """创建绑定到 state 的请求处理类"""
+
+    class MockDeepSeekHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass  # 压测时不输出每个请求的访问日志
+
+        def _send_json(self, status: int, payload: dict, headers: Optional[Dict[str, str]] = None):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                with state.lock:
+                    self._send_json(200, dict(state.stats))
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            messages = request.get("messages", [])
+            system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+            prompt = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+
+            config = state.config
+            fault, shape, delay = state.draw(prompt)
+            time.sleep(config.latency + delay * config.jitter)
+
+            if fault < config.rate_429:
+                state.count("429")
+                self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                                {"Retry-After": "1"})
+                return
+            if fault < config.rate_429 + config.rate_5xx:
+                state.count("5xx")
+                status = (500, 502, 503)[int(shape * 3)]
+                self._send_json(status, {"error": {"message": "Mock server error", "type": "server_error"}})
+                return
+
+            if "JSON" in system:
+                content = build_sentence_json(prompt)
+                if shape < config.malformed_rate:
+                    state.count("malformed")
+                    content = malform(content, int(delay * 3))
+                elif shape < config.malformed_rate + config.fence_rate:
+                    state.count("fenced")
+                    content = f"```json\n{content}\n```"
+                else:
+                    state.count("ok")
+            else:
+                content = build_notes(prompt)
+                state.count("ok")
+
+            # 与真实服务相同：输出超过 max_tokens 时截断，finish_reason 为 "length"
+            finish_reason = "stop"
+            max_tokens = request.get("max_tokens")
+            if max_tokens and len(content) // 4 > max_tokens:
+                state.count("truncated")
+                content = content[:max_tokens * 4]
+                finish_reason = "length"
+
+            prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+            completion_tokens = len(content) // 4
+            self._send_json(200, {
+                "id": "mock-" + hashlib.md5(prompt.encode('utf-8')).hexdigest()[:12],
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "deepseek-chat"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": finish_reason,
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            })
+
+    return MockDeepSeekHandler
+
+
+def start_mock_server(port: int = 0, config: Optional[MockConfig] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    在后台线程启动模拟服务器
+
+    Args:
+        port: 监听端口，0 表示自动选择
+        config: 行为参数
+
+    Returns:
+        (服务器对象, base_url)；用完后调用 server.shutdown()
+    """
+    state = MockState(config or MockConfig())
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    server.state = state
+    thread = threading.Thread(target=server.serve_forever, name="mock-deepseek", daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def parse_args() -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="本地 DeepSeek 模拟服务器")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="额外延迟上限（秒）")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="返回 429 的概率")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="返回 5xx 的概率")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="返回格式错误 JSON 的概率")
+    parser.add_argument("--fence-rate", type=float, default=0.0, help="用 Markdown 代码块包裹的概率")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    config = MockConfig(args.latency, args.jitter, args.rate_429, args.rate_5xx,
+                        args.malformed_rate, args.fence_rate, args.seed)
+    server, base_url = start_mock_server(args.port, config)
+    print(f"✓ 模拟 DeepSeek 服务器已启动: {base_url}")
+    print(f"  export DEEPSEEK_BASE_URL={base_url}")
+    print(f"  统计信息: {base_url}/stats")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
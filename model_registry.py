@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+sentence-transformers 模型注册表
+首次使用时才导入 sentence_transformers（会连带导入 torch，耗时数秒），
+加载后的模型在整个进程内共享，并可在后台线程中预热
+"""
+
+import time
+import threading
+import importlib.util
+from typing import Dict, Optional
+
+
+_models: Dict[str, object] = {}
+_lock = threading.Lock()
+_timings = {"import": None, "load": {}}  # 导入耗时（秒）与各模型加载耗时
+_import_error: Optional[BaseException] = None  # 导入失败的原因（如 torch 安装损坏）
+
+
+class ModelUnavailableError(ImportError):
+    """sentence_transformers 已安装但无法导入"""
+
+
+def is_available() -> bool:
+    """检查 sentence-transformers 是否已安装（不实际导入），之前导入失败过则视为不可用"""
+    return _import_error is None and importlib.util.find_spec("sentence_transformers") is not None
+
+
+def _import_sentence_transformer():
+    """
+    导入 SentenceTransformer 类；失败时记录原因，之后的调用不再重复尝试导入
+
+    Raises:
+        ModelUnavailableError: 导入失败
+    """
+    global _import_error
+    if _import_error is not None:
+        raise ModelUnavailableError(f"sentence_transformers 无法导入: {_import_error}") from _import_error
+    try:
+        from sentence_transformers import SentenceTransformer
+    except Exception as e:  # 依赖损坏时可能抛出 OSError、RuntimeError 等
+        _import_error = e
+        raise ModelUnavailableError(f"sentence_transformers 无法导入: {e}") from e
+    return SentenceTransformer
+
+
+def get_sentence_model(name: str):
+    """
+    获取共享的 SentenceTransformer 模型，首次调用时导入并加载
+
+    Args:
+        name: 模型名称，如 'all-MiniLM-L6-v2'
+
+    Returns:
+        SentenceTransformer 实例
+
+    Raises:
+        ModelUnavailableError: sentence_transformers 无法导入
+    """
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    # 加锁保证后台预热与主线程不会重复加载
+    with _lock:
+        model = _models.get(name)
+        if model is None:
+            start = time.perf_counter()
+            SentenceTransformer = _import_sentence_transformer()
+            imported = time.perf_counter()
+            model = SentenceTransformer(name)
+            loaded = time.perf_counter()
+
+            if _timings["import"] is None:
+                _timings["import"] = imported - start
+            _timings["load"][name] = loaded - imported
+            _models[name] = model
+    return model
+
+
+def warmup_in_background(name: str) -> Optional[threading.Thread]:
+    """
+    在后台线程中预先导入并加载模型，与文本解析等工作并行
+
+    Returns:
+        预热线程；sentence-transformers 未安装或模型已加载时返回 None
+    """
+    if name in _models or not is_available():
+        return None
+
+    def _warmup():
+        try:
+            get_sentence_model(name)
+        except Exception as e:
+            print(f"  警告: 模型预热失败 ({name}): {e}")
+
+    thread = threading.Thread(target=_warmup, name=f"warmup-{name}", daemon=True)
+    thread.start()
+    return thread
+
+
+def is_loaded(name: str) -> bool:
+    """模型是否已在本进程中加载"""
+    return name in _models
+
+
+def timing_report(name: str) -> str:
+    """
+    返回模型导入/加载耗时说明
+
+    Returns:
+        已加载时为实际耗时，未加载时说明本次跳过了导入和加载
+    """
+    if name not in _timings["load"]:
+        return "未加载模型（跳过 sentence_transformers 导入与模型加载）"
+    return (f"导入 sentence_transformers {_timings['import']:.2f}s，"
+            f"加载 {name} {_timings['load'][name]:.2f}s")
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MP3 帧解析工具
+Edge-TTS 输出为 24kHz / 48kbps 单声道 MP3（MPEG-2 Layer III，每帧 144 字节、24ms），
+这里按帧头解析，切分音频时只在帧边界处截断
+"""
+
+import bisect
+from typing import List, Optional, Tuple
+
+
+# 比特率表（kbps），按 [MPEG-1, MPEG-2/2.5] 区分，只处理 Layer III
+_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+# 采样率表，按版本位（0 = MPEG-2.5, 2 = MPEG-2, 3 = MPEG-1）
+_SAMPLE_RATES = {
+    0: [11025, 12000, 8000],
+    2: [22050, 24000, 16000],
+    3: [44100, 48000, 32000],
+}
+
+
+def parse_frame_header(data: bytes, pos: int = 0) -> Optional[Tuple[int, int, int]]:
+    """
+    解析 pos 处的 MPEG Layer III 帧头
+
+    Args:
+        data: MP3 字节数据
+        pos: 帧头起始位置
+
+    Returns:
+        (帧长度字节数, 每帧采样数, 采样率)；不是合法帧头时返回 None
+    """
+    if pos + 4 > len(data):
+        return None
+    b1, b2 = data[pos + 1], data[pos + 2]
+    if data[pos] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version = (b1 >> 3) & 0x03
+    layer = (b1 >> 1) & 0x03
+    bitrate_index = (b2 >> 4) & 0x0F
+    rate_index = (b2 >> 2) & 0x03
+    padding = (b2 >> 1) & 0x01
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None  # 保留值、非 Layer III 或自由比特率
+
+    mpeg1 = version == 3
+    bitrate = _BITRATES[1 if mpeg1 else 2][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    samples = 1152 if mpeg1 else 576
+    frame_length = samples // 8 * bitrate // sample_rate + padding
+    return frame_length, samples, sample_rate
+
+
+def _skip_id3(data: bytes) -> int:
+    """跳过开头的 ID3v2 标签，返回第一帧可能的起始位置"""
+    if len(data) >= 10 and data[:3] == b"ID3":
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        return 10 + size
+    return 0
+
+
+def iter_frames(data: bytes) -> List[Tuple[int, int, float]]:
+    """
+    列出所有完整的 MP3 帧
+
+    Returns:
+        [(起始字节位置, 帧长度, 帧起始时间秒), ...]；遇到无法解析的数据时停止
+    """
+    frames = []
+    pos = _skip_id3(data)
+    elapsed = 0.0
+    while True:
+        header = parse_frame_header(data, pos)
+        if header is None:
+            break
+        length, samples, sample_rate = header
+        if pos + length > len(data):
+            break  # 末尾不完整的帧
+        frames.append((pos, length, elapsed))
+        elapsed += samples / sample_rate
+        pos += length
+    return frames
+
+
+def duration_seconds(data: bytes) -> float:
+    """按帧头计算 MP3 时长（秒）"""
+    frames = iter_frames(data)
+    if not frames:
+        return 0.0
+    pos, _, start = frames[-1]
+    _, samples, sample_rate = parse_frame_header(data, pos)
+    return start + samples / sample_rate
+
+
+def split_at_times(data: bytes, cut_times: List[float]) -> Optional[List[bytes]]:
+    """
+    在最接近给定时间点的帧边界处把 MP3 切成多段
+
+    切点应落在句间停顿处：Layer III 的比特池可能让每段第一帧引用上一段的数据，
+    停顿处为静音，解码器丢弃该帧不会产生可闻的瑕疵
+
+    Args:
+        data: 完整的 MP3 字节数据
+        cut_times: 递增的切分时间点（秒），n 个切点得到 n + 1 段
+
+    Returns:
+        各段 MP3 字节；某段不含任何帧时返回 None
+    """
+    frames = iter_frames(data)
+    if not frames:
+        return None
+
+    starts = [start for _, _, start in frames]
+    boundaries = [0]
+    for t in cut_times:
+        # 取起始时间最接近 t 的帧
+        k = bisect.bisect_left(starts, t)
+        if k > 0 and (k == len(starts) or t - starts[k - 1] <= starts[k] - t):
+            k -= 1
+        boundaries.append(max(k, boundaries[-1]))
+    boundaries.append(len(frames))
+
+    end_of_data = frames[-1][0] + frames[-1][1]
+    offsets = [pos for pos, _, _ in frames] + [end_of_data]
+    segments = []
+    for a, b in zip(boundaries, boundaries[1:]):
+        if b <= a:
+            return None
+        segments.append(data[offsets[a]:offsets[b]])
+    return segments
+
+
+def validate_mp3(data: bytes, min_duration: float = 0.2) -> Optional[str]:
+    """
+    校验 MP3 数据是否完整可用
+
+    Args:
+        data: MP3 字节数据
+        min_duration: 最短时长（秒），过短视为截断
+
+    Returns:
+        问题说明；数据有效时返回 None
+    """
+    if not data:
+        return "文件为空"
+    start = _skip_id3(data)
+    if parse_frame_header(data, start) is None:
+        return "缺少有效的 MP3 帧头"
+    duration = duration_seconds(data)
+    if duration < min_duration:
+        return f"时长过短 ({duration:.2f}s < {min_duration:.2f}s)"
+    return None
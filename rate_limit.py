@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步限流工具
+用于控制对 DeepSeek / Edge-TTS 等外部服务的请求速率
+"""
+
+import time
+import asyncio
+
+
+class TokenBucket:
+    """
+    令牌桶限流器（asyncio 版本）
+
+    每秒补充 rate 个令牌，最多积累 capacity 个；
+    acquire() 在令牌不足时异步等待，不会阻塞事件循环
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: 每秒补充的令牌数（即长期平均请求速率）
+            capacity: 桶容量（允许的瞬时突发请求数）
+        """
+        if rate <= 0:
+            raise ValueError("rate 必须大于 0")
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """取出令牌，不足时等待补充"""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class AdaptiveLimiter:
+    """
+    AIMD（加性增、乘性减）自适应并发限制器
+
+    - 请求成功且延迟正常、近期成功率足够高时，每完成约 limit 个请求并发上限 +1
+    - 请求失败或被限流时，并发上限乘以 decrease_factor（同一轮请求只降一次）
+    - 延迟明显高于历史最低延迟时保持当前上限，不再增加
+
+    用法:
+        async with limiter.slot() as slot:
+            ok = await do_request()
+            if not ok:
+                slot.fail()
+    """
+
+    def __init__(self, initial: int = 3, min_limit: int = 1, max_limit: int = 16,
+                 decrease_factor: float = 0.5, latency_tolerance: float = 2.0,
+                 min_success_rate: float = 0.95, window: int = 20):
+        """
+        Args:
+            initial: 初始并发上限
+            min_limit: 并发上限的下限
+            max_limit: 并发上限的上限
+            decrease_factor: 失败/限流时的乘性减小系数
+            latency_tolerance: 延迟超过历史最低延迟的多少倍视为拥塞
+            min_success_rate: 允许继续增加并发的最低近期成功率
+            window: 计算近期成功率的请求数
+        """
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.min_success_rate = min_success_rate
+        self.window = window
+
+        self.in_flight = 0
+        self.peak_limit = int(self.limit)
+        self.decreases = 0
+        self._recent = []  # 近期结果（True/False）
+        self._min_latency = None
+        self._epoch = 0  # 每次降速加 1，用于忽略同一轮中其他请求的失败
+        self._condition = None
+        self._loop = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        """
+        返回当前事件循环的 Condition
+
+        asyncio.Condition 绑定到第一次使用它的事件循环；模块级的限制器会被多次 asyncio.run
+        复用（如批量构建、测试），事件循环变化时重新创建，并发上限等统计保留
+        """
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+        return self._condition
+
+    async def acquire(self) -> int:
+        """
+        等待空闲名额
+
+        Returns:
+            获取名额时的轮次编号（传给 release）
+        """
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+            return self._epoch
+
+    async def release(self, epoch: int, success: bool, latency: float, throttled: bool = False,
+                      cancelled: bool = False) -> None:
+        """
+        归还名额并根据结果调整并发上限
+
+        cancelled 表示请求被取消（如其他任务失败、程序退出）或结果与服务端无关（如参数错误），
+        不代表服务端状态，只归还名额，不计入成功率也不降速
+        """
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            if cancelled:
+                condition.notify_all()
+                return
+            self._recent.append(success)
+            if len(self._recent) > self.window:
+                self._recent.pop(0)
+
+            if not success or throttled:
+                # 同一轮发出的请求往往一起失败，只按第一次失败降速
+                if epoch == self._epoch:
+                    self.limit = max(float(self.min_limit), int(self.limit) * self.decrease_factor)
+                    self._epoch += 1
+                    self.decreases += 1
+            else:
+                if self._min_latency is None or latency < self._min_latency:
+                    self._min_latency = latency
+                congested = latency > self._min_latency * self.latency_tolerance
+                success_rate = sum(self._recent) / len(self._recent)
+                if not congested and success_rate >= self.min_success_rate:
+                    self.limit = min(float(self.max_limit), self.limit + 1.0 / int(self.limit))
+                    self.peak_limit = max(self.peak_limit, int(self.limit))
+
+            condition.notify_all()
+
+    def slot(self) -> "_LimiterSlot":
+        """返回一个异步上下文管理器，自动计时并在退出时归还名额"""
+        return _LimiterSlot(self)
+
+    def summary(self) -> str:
+        """返回当前状态说明"""
+        return f"当前并发上限 {int(self.limit)}，峰值 {self.peak_limit}，降速 {self.decreases} 次"
+
+
+class _LimiterSlot:
+    """
+    AdaptiveLimiter.slot() 返回的上下文管理器；抛出异常或调用 fail() 视为失败，
+    被取消或调用 ignore() 时只归还名额
+    """
+
+    def __init__(self, limiter: AdaptiveLimiter):
+        self._limiter = limiter
+        self._epoch = 0
+        self._start = 0.0
+        self._failed = False
+        self._throttled = False
+        self._ignored = False
+
+    def fail(self, throttled: bool = False) -> None:
+        """标记本次请求失败（throttled 表示被服务端限流）"""
+        self._failed = True
+        self._throttled = self._throttled or throttled
+
+    def ignore(self) -> None:
+        """标记本次结果与服务端状态无关（如参数错误），既不算成功也不算失败"""
+        self._ignored = True
+
+    async def __aenter__(self) -> "_LimiterSlot":
+        self._epoch = await self._limiter.acquire()
+        self._start = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        success = exc_type is None and not self._failed
+        cancelled = self._ignored or (exc_type is not None and issubclass(exc_type, asyncio.CancelledError))
+        await self._limiter.release(self._epoch, success, time.monotonic() - self._start, self._throttled,
+                                    cancelled=cancelled)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+验证 IVF 近似去重与精确去重的一致性
+"""
+import sys
+
+import numpy as np
+import pytest
+
+from ann_index import assignment_recall, ivf_duplicate_assignments
+from generate_part1_anki import SEMANTIC_THRESHOLD, semantic_duplicate_assignments
+
+
+def clustered_embeddings(n: int, dim: int, seed: int, noise: float = 0.4) -> np.ndarray:
+    """每 3 个句子共用一个中心的随机嵌入（同一中心的句子互为重复）"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n // 3, dim))
+    return (centers[rng.integers(0, len(centers), n)] + rng.normal(scale=noise, size=(n, dim))).astype(np.float32)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_matches_exact_assignments(seed):
+    embeddings = clustered_embeddings(4000, 384, seed)
+    exact = semantic_duplicate_assignments(embeddings, SEMANTIC_THRESHOLD)
+    approx, verified = ivf_duplicate_assignments(embeddings, SEMANTIC_THRESHOLD, seed=seed)
+
+    recall, agreement = assignment_recall(exact, approx)
+    print(f"seed={seed}: 重复召回 {recall:.2%}，结果一致 {agreement:.2%}，校验 {verified} 对")
+    assert recall >= 0.98
+    assert agreement >= 0.98
+    # 候选对远少于全量两两比较
+    assert verified < len(embeddings) * (len(embeddings) - 1) // 2 // 4
+
+
+def test_assignments_point_to_similar_kept_sentences():
+    embeddings = clustered_embeddings(2000, 64, seed=3)
+    approx, _ = ivf_duplicate_assignments(embeddings, SEMANTIC_THRESHOLD)
+    unit = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    for i, target in enumerate(approx):
+        if target >= 0:
+            assert target < i
+            assert approx[target] == -1
+            assert unit[i] @ unit[target] >= SEMANTIC_THRESHOLD - 1e-6
+
+
+def test_single_large_cluster_is_processed_in_blocks():
+    embeddings = np.tile(np.arange(1, 9, dtype=np.float32), (1500, 1))
+    embeddings[-1] = 0  # 零向量与任何句子都不相似
+    approx, _ = ivf_duplicate_assignments(embeddings, SEMANTIC_THRESHOLD, num_clusters=1, block_size=64)
+    assert approx[0] == -1
+    assert approx[1:-1] == [0] * 1498
+    assert approx[-1] == -1
+
+
+def test_empty_and_tiny_inputs():
+    assert ivf_duplicate_assignments(np.empty((0, 8)), SEMANTIC_THRESHOLD) == ([], 0)
+    assert ivf_duplicate_assignments(np.ones((1, 8)), SEMANTIC_THRESHOLD) == ([-1], 0)
+    approx, _ = ivf_duplicate_assignments(np.ones((2, 8)), SEMANTIC_THRESHOLD, num_clusters=5, num_probes=9)
+    assert approx == [-1, 0]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q", "-s"]))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ApkgWriter 导出的 .apkg 结构：媒体清单、MP3 不压缩、collection.anki2 可以打开
+"""
+import sys
+import json
+import sqlite3
+import zipfile
+
+import genanki
+import pytest
+
+from apkg_writer import ApkgWriter
+
+MODEL = genanki.Model(1607392319, 'Test Model', fields=[{'name': 'Front'}, {'name': 'Audio'}],
+                      templates=[{'name': 'Card 1', 'qfmt': '{{Front}}', 'afmt': '{{Audio}}'}])
+
+
+def test_media_stored_and_collection_opens(tmp_path):
+    from_file = tmp_path / "a.mp3"
+    from_file.write_bytes(b"ID3" + b"\x00" * 500)
+    from_bytes = b"ID3" + b"\x01" * 300
+    from_other = b"ID3" + b"\x02" * 200
+
+    deck = genanki.Deck(2059400110, "Test Deck")
+    for i, name in enumerate(["a.mp3", "b.mp3", "c.mp3", "a.mp3"]):
+        deck.add_note(genanki.Note(model=MODEL, fields=[f"sentence {i}", f"[sound:{name}]"]))
+
+    writer = ApkgWriter()
+    writer.add_media("a.mp3", from_file)
+    writer.add_media("b.mp3", from_bytes)
+    writer.add_media("c.mp3", lambda: from_other)
+    writer.add_media("a.mp3", b"ignored")  # 同名媒体只保留第一次添加的来源
+    output = writer.write(deck, tmp_path / "out" / "deck.apkg")
+
+    with zipfile.ZipFile(output) as z:
+        # 媒体清单的键是 ZIP 中的条目名（从 0 开始的序号），值是卡片引用的文件名
+        media = json.loads(z.read('media'))
+        assert media == {"0": "a.mp3", "1": "b.mp3", "2": "c.mp3"}
+        assert z.read("0") == from_file.read_bytes()
+        assert z.read("1") == from_bytes
+        assert z.read("2") == from_other
+        for index in media:
+            assert z.getinfo(index).compress_type == zipfile.ZIP_STORED
+        assert z.getinfo('collection.anki2').compress_type == zipfile.ZIP_DEFLATED
+        (tmp_path / "collection.anki2").write_bytes(z.read('collection.anki2'))
+    assert writer.media_bytes == 500 + 3 + 300 + 3 + 200 + 3
+
+    conn = sqlite3.connect(tmp_path / "collection.anki2")
+    try:
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        fields = sorted(row[0] for row in conn.execute("SELECT flds FROM notes"))
+        assert fields == [f"sentence {i}\x1f[sound:{name}]"
+                          for i, name in enumerate(["a.mp3", "b.mp3", "c.mp3", "a.mp3"])]
+        assert conn.execute("SELECT COUNT(*) FROM cards").fetchone()[0] == 4
+        decks = json.loads(conn.execute("SELECT decks FROM col").fetchone()[0])
+        assert "Test Deck" in [d["name"] for d in decks.values()]
+    finally:
+        conn.close()
+
+    # 没有留下临时文件
+    assert [p.name for p in output.parent.iterdir()] == ["deck.apkg"]
+
+
+def test_failed_write_keeps_previous_package(tmp_path):
+    output = tmp_path / "deck.apkg"
+    output.write_bytes(b"previous")
+    writer = ApkgWriter()
+    writer.add_media("missing.mp3", tmp_path / "missing.mp3")
+    with pytest.raises(FileNotFoundError):
+        writer.write(genanki.Deck(2059400111, "Empty"), output)
+    assert output.read_bytes() == b"previous"
+    assert [p.name for p in tmp_path.iterdir()] == ["deck.apkg"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音频缓存淘汰：过期 / 超出大小的条目，以及中断写入遗留的临时文件
+"""
+import os
+import sys
+import time
+
+import pytest
+
+import audio_cache
+from audio_cache import AudioCache
+
+
+def make_file(path, size: int, age: float):
+    """创建 size 字节、mtime 为 age 秒前的文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"\0" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_evict_keeps_temp_files_being_written(tmp_path):
+    cache = AudioCache(tmp_path)
+    writing = make_file(tmp_path / "ab" / "writing.tmp", 10, age=5)
+    stale = make_file(tmp_path / "ab" / "stale.tmp", 10, age=audio_cache.TMP_GRACE_SECONDS + 60)
+    cache.evict()
+    assert writing.exists()
+    assert not stale.exists()
+
+
+def test_evict_by_age_and_size(tmp_path):
+    cache = AudioCache(tmp_path, max_bytes=250, max_age_days=1)
+    expired = make_file(tmp_path / "aa" / "expired.mp3", 100, age=2 * 86400)
+    oldest = make_file(tmp_path / "bb" / "oldest.mp3", 100, age=300)
+    middle = make_file(tmp_path / "cc" / "middle.mp3", 100, age=200)
+    newest = make_file(tmp_path / "dd" / "newest.mp3", 100, age=100)
+
+    # 先淘汰过期条目，总大小仍超过 250 字节时再删除最久未使用的
+    assert cache.evict() == 2
+    assert not expired.exists() and not oldest.exists()
+    assert middle.exists() and newest.exists()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
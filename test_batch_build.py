@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+用模拟 DeepSeek 服务器和假 TTS 后端测试 Part 2 批量构建（无需网络和 API 费用）
+"""
+import sys
+import json
+import sqlite3
+import asyncio
+import zipfile
+from pathlib import Path
+
+import pytest
+
+import mock_deepseek_server
+
+SHARED = "I have always believed that reading is the best way to relax."
+SENTENCES_PER_TOPIC = 6
+
+
+def make_topics(g, root: Path, count: int) -> Path:
+    """
+    生成 count 个话题目录，每个话题都包含同一个共用句子
+
+    Returns:
+        引用前两个话题的 JSON 清单路径
+    """
+    for t in range(count):
+        topic_dir = root / f"topic{t}"
+        topic_dir.mkdir(parents=True)
+        sentences = [SHARED] + [f"In topic {t} I want to talk about detail number {i} today."
+                                for i in range(SENTENCES_PER_TOPIC - 1)]
+        (topic_dir / g.INPUT_FILE.name).write_text(" ".join(sentences), encoding='utf-8')
+        (topic_dir / g.QUESTION_FILE.name).write_text(f"Describe thing {t}\nYou should say: what", encoding='utf-8')
+    manifest = root / "topics.json"
+    manifest.write_text(json.dumps([
+        {"answer": f"topic{t}/{g.INPUT_FILE.name}", "question": f"topic{t}/{g.QUESTION_FILE.name}"}
+        for t in range(2)
+    ]), encoding='utf-8')
+    return manifest
+
+
+def read_package(path: Path, workdir: Path):
+    """返回卡片包中的 (卡片 GUID 列表, 每个牌组的卡片数, 媒体文件数)"""
+    db = workdir / f"{path.stem}.anki2"
+    with zipfile.ZipFile(path) as z:
+        db.write_bytes(z.read('collection.anki2'))
+        media = len(json.loads(z.read('media')))
+    conn = sqlite3.connect(db)
+    guids = [row[0] for row in conn.execute("SELECT guid FROM notes")]
+    per_deck = sorted(row[0] for row in conn.execute("SELECT COUNT(*) FROM cards GROUP BY did"))
+    conn.close()
+    return guids, per_deck, media
+
+
+@pytest.fixture
+def batch(part2, mock_deepseek, monkeypatch, tmp_path):
+    """指向模拟服务器的 generate_anki_cards，以及 4 个话题的目录和 JSON 清单"""
+    server, base_url = mock_deepseek()
+    monkeypatch.setattr(part2, "DEEPSEEK_BASE_URL", base_url)
+    manifest = make_topics(part2, tmp_path / "topics", 4)
+    return part2, server, manifest
+
+
+def test_directory_one_package_per_topic(batch):
+    g, server, manifest = batch
+    outputs = asyncio.run(g.run_batch(manifest.parent, concurrency=3))
+    assert len(outputs) == 4
+    assert all(Path(output).exists() for output in outputs)
+    # 每个话题两次请求：句子拆解 + 1分钟笔记
+    assert server.state.stats["requests"] == 8
+
+
+def test_manifest_combined_keeps_every_topic(batch, tmp_path):
+    g, server, manifest = batch
+    combined = g.OUTPUT_DIR / "all.apkg"
+    outputs = asyncio.run(g.run_batch(manifest, combined=combined, concurrency=2))
+    assert outputs == [str(combined)]
+
+    guids, per_deck, media = read_package(combined, tmp_path)
+    # 2 个话题各 6 张句子卡片 + 1 张笔记卡片，共用句子在两个牌组中都保留；音频只存一份
+    assert len(guids) == len(set(guids)) == 2 * (SENTENCES_PER_TOPIC + 1)
+    assert per_deck == [SENTENCES_PER_TOPIC + 1] * 2
+    assert media == 2 * SENTENCES_PER_TOPIC - 1
+
+    # 再次运行全部命中 LLM 缓存
+    requests = server.state.stats["requests"]
+    asyncio.run(g.run_batch(manifest, combined=combined, concurrency=2))
+    assert server.state.stats["requests"] == requests
+
+
+def test_failed_topic_does_not_stop_batch(batch, monkeypatch, capsys):
+    g, server, manifest = batch
+    build_sentence_json = mock_deepseek_server.build_sentence_json
+
+    def truncate_topic1(prompt):
+        """topic1 的句子拆解返回被截断的 JSON，使该话题在解析时失败"""
+        content = build_sentence_json(prompt)
+        return content[:len(content) // 2] if "In topic 1 " in prompt else content
+
+    monkeypatch.setattr(mock_deepseek_server, "build_sentence_json", truncate_topic1)
+    outputs = asyncio.run(g.run_batch(manifest.parent, concurrency=2))
+
+    # topic1 已发出请求但失败，其余话题照常导出
+    assert any("In topic 1 " in prompt for prompt in server.state.prompts)
+    questions = [(manifest.parent / f"topic{t}" / g.QUESTION_FILE.name).read_text(encoding='utf-8')
+                 for t in (0, 2, 3)]
+    expected = [g.OUTPUT_DIR / f"{g.topic_names(question)[0]}.apkg" for question in questions]
+    assert sorted(map(Path, outputs)) == sorted(expected)
+    assert all(path.exists() for path in expected)
+    out = capsys.readouterr().out
+    assert "✗ 话题失败 (topic1)" in out
+    assert "完成 3/4 个话题" in out
+    assert "✗ 失败的话题: topic1" in out
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+验证加速后的去重算法与原始逐一比较算法结果完全一致
+"""
+import sys
+import time
+from difflib import SequenceMatcher
+from pathlib import Path
+
+import pytest
+
+import generate_part1_anki as g
+from generate_part1_anki import parse_part1_text, normalize_sentence, deduplicate_sentences_string
+
+PART1_TEXT = Path(__file__).parent / 'Part1文本.md'
+
+
+def reference_string_dedup(qa_pairs, threshold=0.75):
+    """原始的字符串去重算法（逐一比较，作为对照）"""
+    import re
+    all_sentences = []
+    for qa in qa_pairs:
+        answer = qa['answer']
+        sentences = re.split(r'(?<=[.!?])\s+(?=[A-Z])', answer)
+        sentences = [s.strip() for s in sentences if s.strip()]
+        for sent in sentences:
+            if len(sent.split()) < 3:
+                continue
+            all_sentences.append({
+                'sentence': sent,
+                'topic': qa['topic'],
+                'question': qa['question'],
+                'full_answer': answer
+            })
+
+    unique_sentences = []
+    source_map = {}
+    normalized_set = set()
+    for item in all_sentences:
+        sent = item['sentence']
+        normalized = normalize_sentence(sent)
+        is_duplicate = False
+        for existing in unique_sentences:
+            existing_sent = existing['sentence']
+            len_ratio = len(sent) / len(existing_sent) if existing_sent else 0
+            if len_ratio < 0.7 or len_ratio > 1.43:
+                continue
+            if SequenceMatcher(None, sent.lower(), existing_sent.lower()).ratio() >= threshold:
+                is_duplicate = True
+                source_map.setdefault(existing_sent, []).append(f"{item['topic']} - {item['question']}")
+                break
+        if not is_duplicate and normalized in normalized_set:
+            for existing in unique_sentences:
+                if normalize_sentence(existing['sentence']) == normalized:
+                    is_duplicate = True
+                    source_map.setdefault(existing['sentence'], []).append(f"{item['topic']} - {item['question']}")
+                    break
+        if not is_duplicate:
+            unique_sentences.append(item)
+            source_map[sent] = [f"{item['topic']} - {item['question']}"]
+            normalized_set.add(normalized)
+    return unique_sentences, source_map
+
+
+def reference_semantic_assignments(embeddings, threshold=0.75):
+    """原始的语义去重循环（逐一计算余弦相似度，作为对照）"""
+    from numpy import dot
+    from numpy.linalg import norm
+    kept = []
+    assignments = []
+    for i, emb in enumerate(embeddings):
+        target = -1
+        for j in kept:
+            if dot(emb, embeddings[j]) / (norm(emb) * norm(embeddings[j])) >= threshold:
+                target = j
+                break
+        if target < 0:
+            kept.append(i)
+        assignments.append(target)
+    return assignments
+
+
+def test_string_dedup():
+    print("=== 字符串去重 ===")
+    qa_pairs = parse_part1_text(PART1_TEXT.read_text(encoding='utf-8'))
+
+    start = time.perf_counter()
+    expected = reference_string_dedup(qa_pairs, g.SIMILARITY_THRESHOLD)
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = deduplicate_sentences_string(qa_pairs)
+    indexed_time = time.perf_counter() - start
+
+    print(f"原始算法: {reference_time:.2f}s，加速算法: {indexed_time:.2f}s")
+    assert actual == expected
+
+
+def test_semantic_dedup():
+    print("\n=== 语义去重（随机嵌入）===")
+    if g.np is None:
+        pytest.skip("numpy 未安装")
+    np = g.np
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(200, 32)).astype(np.float32)
+    embeddings = centers[rng.integers(0, len(centers), 1500)] + rng.normal(scale=0.5, size=(1500, 32))
+    embeddings = embeddings.astype(np.float32)
+
+    expected = reference_semantic_assignments(embeddings, g.SEMANTIC_THRESHOLD)
+    for block_size in (7, 64, 512):
+        actual = g.semantic_duplicate_assignments(embeddings, g.SEMANTIC_THRESHOLD, block_size)
+        assert actual == expected, f"block_size={block_size} 结果不一致"
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+嵌入缓存：只编码新句子、按输入顺序返回、索引与矩阵不一致时重建
+"""
+import json
+import sys
+import hashlib
+
+import numpy as np
+import pytest
+
+from embedding_cache import EmbeddingStore, normalize_for_embedding
+
+
+def stub_vector(sentence: str) -> np.ndarray:
+    """由句子内容确定的 8 维向量"""
+    seed = int.from_bytes(hashlib.sha1(sentence.encode('utf-8')).digest()[:4], 'little')
+    return np.random.default_rng(seed).normal(size=8).astype(np.float32)
+
+
+class StubModel:
+    """记录每次 encode 收到的句子的假模型"""
+
+    def __init__(self):
+        self.loads = 0
+        self.calls = []
+
+    def load(self):
+        self.loads += 1
+        return self
+
+    def encode(self, sentences, convert_to_tensor=False, **kwargs):
+        self.calls.append(list(sentences))
+        return np.stack([stub_vector(s) for s in sentences])
+
+
+def expected(sentences):
+    """假模型对这些句子（规范化后）应返回的向量"""
+    return np.stack([stub_vector(normalize_for_embedding(s)) for s in sentences])
+
+
+def populate(tmp_path, sentences):
+    """用假模型写入缓存，返回写入时使用的 EmbeddingStore"""
+    model = StubModel()
+    store = EmbeddingStore(tmp_path, "stub/model")
+    store.encode(sentences, model.load)
+    return store
+
+
+def test_only_new_sentences_are_encoded(tmp_path):
+    model = StubModel()
+    store = EmbeddingStore(tmp_path, "stub/model")
+    sentences = ["I like tea.", "I  like tea.", "She runs daily.", "I like tea."]
+    result = store.encode(sentences, model.load)
+    # 仅空白不同的句子和同一批内的重复句子只编码一次
+    assert model.calls == [["I like tea.", "She runs daily."]]
+    np.testing.assert_array_equal(result, expected(sentences))
+
+    # 新实例从磁盘读取，已有句子不加载模型
+    model = StubModel()
+    store = EmbeddingStore(tmp_path, "stub/model")
+    result = store.encode(list(reversed(sentences)), model.load)
+    assert model.loads == 0 and model.calls == []
+    np.testing.assert_array_equal(result, expected(list(reversed(sentences))))
+    assert store.summary() == "命中 4 句，新编码 0 句"
+
+    # 混合新旧句子时只编码新的，结果仍按输入顺序
+    mixed = ["New one here.", "She runs daily.", "Another new one.", "I like tea."]
+    result = store.encode(mixed, model.load)
+    assert model.calls == [["New one here.", "Another new one."]]
+    np.testing.assert_array_equal(result, expected(mixed))
+
+
+@pytest.mark.parametrize("damage", ["truncated_matrix", "corrupt_file", "duplicate_rows"])
+def test_inconsistent_cache_is_rebuilt(tmp_path, damage):
+    sentences = ["First sentence here.", "Second sentence here.", "Third sentence here."]
+    store = populate(tmp_path, sentences)
+    if damage == "truncated_matrix":
+        np.save(store.matrix_path, np.load(store.matrix_path)[:1])
+    elif damage == "corrupt_file":
+        data = store.matrix_path.read_bytes()
+        store.matrix_path.write_bytes(data[:len(data) // 2])
+    else:
+        index = json.loads(store.index_path.read_text(encoding='utf-8'))
+        store.index_path.write_text(json.dumps(dict.fromkeys(index, 0)), encoding='utf-8')
+
+    model = StubModel()
+    store = EmbeddingStore(tmp_path, "stub/model")
+    result = store.encode(sentences, model.load)
+    assert model.calls == [sentences]
+    np.testing.assert_array_equal(result, expected(sentences))
+
+    # 重建后的缓存可以正常复用
+    model = StubModel()
+    result = EmbeddingStore(tmp_path, "stub/model").encode(sentences, model.load)
+    assert model.calls == []
+    np.testing.assert_array_equal(result, expected(sentences))
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+用模拟 DeepSeek 服务器和假 TTS 后端测试 Part 1 增量构建（无需网络和 API 费用）
+"""
+import sys
+import json
+import time
+import sqlite3
+import asyncio
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from mock_deepseek_server import MockConfig, extract_numbered_sentences
+
+PART1_TEXT = Path(__file__).parent / "Part1文本.md"
+NEW_SENTENCE = "Nowadays I mostly take pictures of the night skyline from the roof of my building."
+
+
+def requested_sentences(server, start: int = 0):
+    """模拟服务器从第 start 个请求起收到的所有待标注句子"""
+    sentences = []
+    for prompt in server.state.prompts[start:]:
+        sentences.extend(item["english"] for item in extract_numbered_sentences(prompt) or [])
+    return sentences
+
+
+def read_notes(path: Path, workdir: Path):
+    """按卡片顺序返回 .apkg 中每张卡片的字段 (中文, 关键词, 英文, 音频)，以及媒体文件名列表"""
+    db = workdir / f"{path.stem}.anki2"
+    with zipfile.ZipFile(path) as z:
+        db.write_bytes(z.read('collection.anki2'))
+        media = sorted(json.loads(z.read('media')).values())
+    conn = sqlite3.connect(db)
+    notes = [row[0].split("\x1f") for row in conn.execute("SELECT flds FROM notes ORDER BY id")]
+    conn.close()
+    return notes, media
+
+
+def media_bytes(path: Path):
+    """返回 .apkg 中 媒体文件名 → 内容"""
+    with zipfile.ZipFile(path) as z:
+        return {name: z.read(entry) for entry, name in json.loads(z.read('media')).items()}
+
+
+def deck_sentences(path: Path, workdir: Path):
+    """按卡片顺序返回 .apkg 中的英文句子"""
+    return [fields[2] for fields in read_notes(path, workdir)[0]]
+
+
+def build(g) -> float:
+    """运行一次完整流程，返回耗时（秒）"""
+    start = time.perf_counter()
+    asyncio.run(g.main())
+    return time.perf_counter() - start
+
+
+@pytest.fixture
+def project(part1, mock_deepseek, monkeypatch, tmp_path):
+    """指向模拟服务器（每个请求 0.3 秒延迟）和临时输入文件的 generate_part1_anki"""
+    server, base_url = mock_deepseek(MockConfig(latency=0.3))
+    monkeypatch.setattr(part1, "DEEPSEEK_BASE_URL", base_url)
+    monkeypatch.setattr(part1, "INPUT_FILE", tmp_path / PART1_TEXT.name)
+    part1.INPUT_FILE.write_text(PART1_TEXT.read_text(encoding='utf-8'), encoding='utf-8')
+    return part1, server
+
+
+def edit_first_answer(g, index: int = 0) -> str:
+    """把第一个回答的第 index 句换成 NEW_SENTENCE，返回被替换的句子"""
+    content = g.INPUT_FILE.read_text(encoding='utf-8')
+    old = g.split_answer_sentences(g.parse_part1_text(content)[0]['answer'])[index]
+    assert content.count(old) == 1
+    g.INPUT_FILE.write_text(content.replace(old, NEW_SENTENCE), encoding='utf-8')
+    return old
+
+
+def expected_order(g):
+    """当前输入去重后的句子顺序（即卡片顺序）"""
+    qa_pairs = g.parse_part1_text(g.INPUT_FILE.read_text(encoding='utf-8'))
+    unique_items, _ = g.deduplicate_sentences(qa_pairs)
+    return [item['sentence'] for item in unique_items]
+
+
+def test_one_answer_edit_only_requests_changed_sentence(project, tmp_path):
+    g, server = project
+    first = build(g)
+    previous = deck_sentences(g.OUTPUT_APKG, tmp_path)
+    assert previous == expected_order(g)
+
+    requests = len(server.state.prompts)
+    tts_requests = g.TTS_BACKEND.requests
+    old = edit_first_answer(g)
+    rebuild = build(g)
+    print(f"首次构建 {first:.2f}s，修改一个回答后重建 {rebuild:.2f}s")
+
+    # 只有上次没有的句子到达 DeepSeek（新句子，以及原先被旧句子去重掉、现在重新保留的句子），
+    # 其余句子沿用清单中的结果，卡片顺序与输入一致
+    sentences = deck_sentences(g.OUTPUT_APKG, tmp_path)
+    added = [sentence for sentence in sentences if sentence not in previous]
+    assert NEW_SENTENCE in added and len(added) <= 3
+    assert sorted(requested_sentences(server, requests)) == sorted(added)
+    assert sentences == expected_order(g)
+    assert old not in sentences
+    # 重建只为新增的句子请求 DeepSeek 和 TTS
+    assert len(server.state.prompts) - requests < requests
+    assert 0 < g.TTS_BACKEND.requests - tts_requests <= len(added)
+
+
+def test_unchanged_input_sends_no_requests(project, tmp_path):
+    g, server = project
+    build(g)
+    requests = len(server.state.prompts)
+    tts_requests = g.TTS_BACKEND.requests
+    assert tts_requests > 0
+    build(g)
+    # LLM 结果和音频都来自缓存，重建不发出任何请求
+    assert len(server.state.prompts) == requests
+    assert g.TTS_BACKEND.requests == tts_requests
+    assert deck_sentences(g.OUTPUT_APKG, tmp_path) == expected_order(g)
+
+
+def test_delta_contains_only_changed_note(project, tmp_path):
+    g, server = project
+    asyncio.run(g.main(delta=True))
+    full, _ = read_notes(g.OUTPUT_APKG, tmp_path)
+    # 第一次构建没有上次的记录，增量包包含全部卡片
+    assert read_notes(g.OUTPUT_DELTA_APKG, tmp_path)[0] == full
+
+    edit_first_answer(g, index=1)
+    asyncio.run(g.main(delta=True))
+    notes, media = read_notes(g.OUTPUT_DELTA_APKG, tmp_path)
+    assert [fields[2] for fields in notes] == [NEW_SENTENCE]
+    assert media == [notes[0][3][len("[sound:"):-1]]
+    # 增量包里的卡片和音频与完整卡片包中的同一张卡片完全相同
+    assert notes[0] in read_notes(g.OUTPUT_APKG, tmp_path)[0]
+    with zipfile.ZipFile(g.OUTPUT_DELTA_APKG) as z:
+        assert sorted(z.namelist()) == sorted(['collection.anki2', 'media', '0'])
+    assert media_bytes(g.OUTPUT_DELTA_APKG)[media[0]] == media_bytes(g.OUTPUT_APKG)[media[0]]
+    assert g.OUTPUT_DELTA_APKG.stat().st_size < g.OUTPUT_APKG.stat().st_size / 50
+
+    # 没有变化时不生成增量包，上次的增量包也被删除
+    asyncio.run(g.main(delta=True))
+    assert not g.OUTPUT_DELTA_APKG.exists()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
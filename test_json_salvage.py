@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+格式错误 / 被截断的 JSON 抢救，以及缺失部分的定位（确定性用例，无需模拟服务器）
+"""
+import sys
+import json
+
+import pytest
+
+from json_salvage import PartialResponseError, salvage_json_array
+from generate_part1_anki import parse_ai_response, parse_annotate_response
+
+TEXT = "I live in Shenzhen. It is a big city. I like the sea."
+ITEMS = [
+    {"english": "I live in Shenzhen.", "chinese": "我住在深圳。", "keywords": "live, Shenzhen"},
+    {"english": "It is a big city.", "chinese": "它是一个大城市。", "keywords": "big, city"},
+    {"english": "I like the sea.", "chinese": "我喜欢大海。", "keywords": "like, sea"},
+]
+
+
+def dumps(items) -> str:
+    return json.dumps(items, ensure_ascii=False, indent=2)
+
+
+@pytest.mark.parametrize("content, expected, complete", [
+    # 完整数组
+    ('[{"a": 1}, {"a": 2}]', [{"a": 1}, {"a": 2}], True),
+    # 在对象中间被截断
+    ('[{"a": 1}, {"a": 2}, {"a": 3, "b": "unfini', [{"a": 1}, {"a": 2}], False),
+    # 在两个元素之间被截断
+    ('[{"a": 1},\n  ', [{"a": 1}], False),
+    # 中间的元素损坏，之后的元素仍然保留
+    ('[{"a": 1}, {"a": 2,, "b"}, {"a": 3}]', [{"a": 1}, {"a": 3}], False),
+    # 前后有说明文字和代码块
+    ('Sure! Here it is:\n```json\n[{"a": 1}]\n```\nLet me know.', [{"a": 1}], True),
+    ('```json\n[{"a": 1}]\n```', [{"a": 1}], True),
+    # 字符串中的 ] 和 { 不会结束数组或被当作新元素
+    ('[{"s": "a ] b"}, {"s": "{not an object}"}]', [{"s": "a ] b"}, {"s": "{not an object}"}], True),
+    # 合法的空数组
+    ('[]', [], True),
+    ('```json\n[ \n ]\n```', [], True),
+])
+def test_salvage_json_array(content, expected, complete):
+    assert salvage_json_array(content) == (expected, complete)
+
+
+@pytest.mark.parametrize("content", ["no json here", "[", '[{"a": ', "[,,]", '[{"a": }]'])
+def test_salvage_nothing_raises(content):
+    with pytest.raises(json.JSONDecodeError):
+        salvage_json_array(content)
+
+
+def test_parse_complete_response():
+    assert parse_ai_response(dumps(ITEMS), TEXT) == ITEMS
+
+
+def test_parse_empty_response():
+    assert parse_ai_response("[]", TEXT) == []
+
+
+def test_parse_missing_middle_sentence_is_rerequested():
+    broken = dumps(ITEMS).replace('"keywords": "big, city"', '"keywords": ""')
+    with pytest.raises(PartialResponseError) as info:
+        parse_ai_response(broken, TEXT)
+    assert info.value.pieces == [ITEMS[0], "It is a big city.", ITEMS[2]]
+    assert (info.value.recovered, info.value.missing) == (2, 1)
+
+
+def test_parse_truncated_tail_is_rerequested():
+    truncated = dumps(ITEMS)[:dumps(ITEMS).index('"It is a big city.') + 10]
+    with pytest.raises(PartialResponseError) as info:
+        parse_ai_response(truncated, TEXT)
+    assert info.value.pieces == [ITEMS[0], "It is a big city. I like the sea."]
+
+
+def test_parse_without_text_or_valid_items_raises():
+    with pytest.raises(ValueError):
+        parse_ai_response(dumps(ITEMS)[:-5])
+    with pytest.raises(ValueError):
+        parse_ai_response(dumps([{"english": "x"}]), TEXT)
+
+
+def test_annotate_missing_ids_grouped():
+    sentences = [item["english"] for item in ITEMS] + ["Extra one.", "Extra two."]
+    annotations = [{"id": 1, "chinese": "一", "keywords": "one"},
+                   {"id": 3, "chinese": "三", "keywords": "three"}]
+    with pytest.raises(PartialResponseError) as info:
+        parse_annotate_response(dumps(annotations), sentences)
+    assert info.value.pieces == [
+        {"english": sentences[0], "chinese": "一", "keywords": "one"},
+        [sentences[1]],
+        {"english": sentences[2], "chinese": "三", "keywords": "three"},
+        sentences[3:],
+    ]
+    assert (info.value.recovered, info.value.missing) == (2, 2)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按 token 预算分批，以及截断后把批次一分为二
+"""
+import sys
+
+import pytest
+
+from llm_batching import TokenBudgetBatcher, split_batch
+from generate_part1_anki import split_answer_sentences
+
+TEXT = ("I like many sports, e.g. swimming and running. My favourite is swimming. "
+        "I swim at 6 a.m. before class! Do you swim? The pool is near my home.")
+
+
+def test_split_text_batch_on_sentence_boundaries():
+    halves = split_batch(TEXT)
+    # "e.g. swimming"、"6 a.m. before" 后面不是大写字母，不是句子边界
+    assert halves == [
+        "I like many sports, e.g. swimming and running. My favourite is swimming.",
+        "I swim at 6 a.m. before class! Do you swim? The pool is near my home.",
+    ]
+    # 与切分回答的规则一致：拆开后的句子正好是原文的句子
+    assert [s for half in halves for s in split_answer_sentences(half)] == split_answer_sentences(TEXT)
+
+
+def test_split_list_batch_and_single_sentence():
+    assert split_batch(["a", "b", "c"]) == [["a"], ["b", "c"]]
+    assert split_batch(["only one"]) is None
+    assert split_batch("One sentence, e.g. this one.") is None
+
+
+def test_plan_respects_budget():
+    sentences = split_answer_sentences(TEXT) * 20
+    batcher = TokenBudgetBatcher(max_input_tokens=100, max_output_tokens=200, max_sentences=8)
+    batches = batcher.plan(sentences)
+    assert [s for batch in batches for s in batch] == sentences
+    assert all(len(batch) <= 8 for batch in batches)
+    assert batcher.sentences == len(sentences)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多牌组合并：卡片全部保留，共用的音频只写入一次
+"""
+import sys
+import json
+import asyncio
+import sqlite3
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from merge_decks import merge_packages
+
+SHARED = {'english': "I have always believed that reading is the best way to relax.",
+          'chinese': "我一直认为阅读是最好的放松方式。", 'keywords': "reading, relax"}
+
+
+def topic_sentences(topic: int):
+    """一个话题的句子：共用句子 + 3 个独有句子"""
+    return [SHARED] + [{'english': f"In topic {topic} I talk about detail number {i}.",
+                        'chinese': f"话题 {topic} 细节 {i}", 'keywords': "detail"} for i in range(3)]
+
+
+def read_package(path):
+    """返回卡片包中的 (GUID 列表, 每个牌组的卡片数, 媒体文件名列表, 句子卡片引用的音频)"""
+    with zipfile.ZipFile(path) as z:
+        db = path.parent / (path.name + ".anki2")
+        db.write_bytes(z.read('collection.anki2'))
+        media = list(json.loads(z.read('media')).values())
+    conn = sqlite3.connect(db)
+    guids = [row[0] for row in conn.execute("SELECT guid FROM notes")]
+    per_deck = sorted(row[0] for row in conn.execute("SELECT COUNT(*) FROM cards GROUP BY did"))
+    sounds = {row[0].split("[sound:")[1].rstrip("]") for row in conn.execute("SELECT flds FROM notes")
+              if "[sound:" in row[0]}
+    conn.close()
+    return guids, per_deck, media, sounds
+
+
+def test_merge_keeps_every_deck_and_stores_media_once(part2):
+    g = part2
+    packages = []
+    for topic in range(2):
+        sentences = topic_sentences(topic)
+        audio_files = asyncio.run(g.generate_all_audio(sentences))
+        packages.append(Path(g.create_anki_deck(sentences, audio_files, 'notes', '', f't{topic}', f'Topic {topic}')))
+
+    # 音频以内容哈希命名，与缓存文件同名
+    expected_name = g.AUDIO_CACHE.media_name(SHARED['english'], g.VOICE, g.RATE, g.PITCH)
+    assert expected_name == g.AUDIO_CACHE.path_for(
+        g.AUDIO_CACHE.make_key(SHARED['english'], g.VOICE, g.RATE, g.PITCH)).name
+    assert expected_name in read_package(packages[0])[3]
+
+    output = g.OUTPUT_DIR / "all.apkg"
+    stats = merge_packages(packages, output)
+    guids, per_deck, media, sounds = read_package(output)
+
+    # 每个话题 4 张句子卡片 + 1 张笔记卡片，共用句子在两个牌组中都保留
+    assert len(guids) == len(set(guids)) == 10
+    assert per_deck == [5, 5]
+    assert stats.duplicate_notes == 0
+    # 共用句子的音频只存一份：2 × 4 - 1
+    assert sorted(media) == sorted(set(media)) and len(media) == 7
+    assert stats.duplicate_media == 1
+    assert sounds == set(media)
+
+
+def test_same_package_twice_keeps_one_copy(part2, tmp_path):
+    g = part2
+    sentences = topic_sentences(0)
+    audio_files = asyncio.run(g.generate_all_audio(sentences))
+    package = Path(g.create_anki_deck(sentences, audio_files, 'notes', '', 't0', 'Topic 0'))
+
+    stats = merge_packages([package, package], tmp_path / "twice.apkg")
+    guids, per_deck, media, _ = read_package(tmp_path / "twice.apkg")
+    assert len(guids) == 5 and per_deck == [5] and len(media) == 4
+    assert stats.duplicate_notes == 5
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+用本地模拟 DeepSeek 服务器测试 Step 3 的并发批处理、重试和缓存（无需网络和 API 费用）
+"""
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from llm_batching import TokenBudgetBatcher
+from mock_deepseek_server import MockConfig, split_sentences
+
+PART1_TEXT = Path(__file__).parent / "Part1文本.md"
+
+
+def load_batch_texts(g, local_split: bool = False):
+    """与 main() 相同的方式按 token 预算构造批次（本地切分模式下每批为句子列表）"""
+    qa_pairs = g.parse_part1_text(PART1_TEXT.read_text(encoding='utf-8'))
+    unique_items, _ = g.deduplicate_sentences_string(qa_pairs)
+    batcher = TokenBudgetBatcher(include_english=not local_split)
+    batches = batcher.plan([item['sentence'] for item in unique_items])
+    print(f"分批: {batcher.summary()}")
+    return batches if local_split else [" ".join(batch) for batch in batches]
+
+
+def run_with_faults(g, monkeypatch, mock_deepseek, local_split: bool, max_output_tokens: int = 4096):
+    """注入延迟、429、5xx 和格式错误，检查解析结果完整且第二次运行全部命中缓存"""
+    mode = "本地切分" if local_split else "模型切分"
+    print(f"=== 模拟服务器（{mode}，max_tokens={max_output_tokens}）===")
+    server, base_url = mock_deepseek(MockConfig(latency=0.05, jitter=0.1, rate_429=0.1, rate_5xx=0.05,
+                                                malformed_rate=0.1, fence_rate=0.2, seed=0))
+    monkeypatch.setattr(g, "DEEPSEEK_BASE_URL", base_url)
+    monkeypatch.setattr(g, "LLM_MAX_OUTPUT_TOKENS", max_output_tokens)
+    batch_texts = load_batch_texts(g, local_split=local_split)
+
+    start = time.perf_counter()
+    results = asyncio.run(g.parse_batches_concurrently(batch_texts))
+    first = time.perf_counter() - start
+    requests = server.state.stats["requests"]
+
+    start = time.perf_counter()
+    cached = asyncio.run(g.parse_batches_concurrently(batch_texts))
+    second = time.perf_counter() - start
+    print(f"{len(batch_texts)} 个批次，首次 {first:.2f}s，缓存 {second:.2f}s")
+    print(f"服务器统计: {server.state.stats}")
+
+    expected = [batch if local_split else split_sentences(batch) for batch in batch_texts]
+    assert [[item['english'] for item in batch] for batch in results] == expected
+    assert cached == results
+    assert server.state.stats["requests"] == requests, "第二次运行仍有请求"
+    return server
+
+
+def test_parse_with_faults(part1, monkeypatch, mock_deepseek):
+    run_with_faults(part1, monkeypatch, mock_deepseek, local_split=False)
+
+
+def test_annotate_with_faults(part1, monkeypatch, mock_deepseek):
+    run_with_faults(part1, monkeypatch, mock_deepseek, local_split=True)
+
+
+def test_truncation_splits_batches(part1, monkeypatch, mock_deepseek):
+    server = run_with_faults(part1, monkeypatch, mock_deepseek, local_split=True, max_output_tokens=1200)
+    assert server.state.stats["truncated"] > 0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+sentence-transformers 已安装但无法导入（如 torch 损坏）时，语义去重回退到字符串去重
+"""
+import sys
+import types
+import importlib.machinery
+
+import pytest
+
+import model_registry
+
+QA_PAIRS = [
+    {"topic": "Work", "question": "Do you work?",
+     "answer": "I work as a teacher in a small school. I really enjoy my job there."},
+    {"topic": "Study", "question": "Do you study?",
+     "answer": "I work as a teacher in a small school. I also study English at night."},
+]
+
+
+@pytest.fixture
+def broken_import(monkeypatch):
+    """让 from sentence_transformers import SentenceTransformer 抛出 ImportError（find_spec 仍能找到）"""
+    module = types.ModuleType("sentence_transformers")
+    module.__spec__ = importlib.machinery.ModuleSpec("sentence_transformers", None)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+    monkeypatch.setattr(model_registry, "_import_error", None)
+    monkeypatch.setattr(model_registry, "_models", {})
+
+
+def test_failed_import_is_reported_unavailable(broken_import):
+    assert model_registry.is_available()
+    with pytest.raises(model_registry.ModelUnavailableError):
+        model_registry.get_sentence_model("all-MiniLM-L6-v2")
+    assert not model_registry.is_available()
+    # 不再重复尝试导入
+    with pytest.raises(model_registry.ModelUnavailableError):
+        model_registry.get_sentence_model("all-MiniLM-L6-v2")
+
+
+def test_semantic_dedup_falls_back_to_string(broken_import, part1, monkeypatch):
+    monkeypatch.setattr(part1, "USE_SEMANTIC_DEDUP", True)
+    monkeypatch.setattr(part1, "SEMANTIC_AVAILABLE", True)
+    expected = part1.deduplicate_sentences_string(QA_PAIRS)
+    assert part1.deduplicate_sentences(QA_PAIRS) == expected
+    # 之后的调用直接使用字符串去重
+    assert part1.deduplicate_sentences(QA_PAIRS) == expected
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AdaptiveLimiter：跨事件循环复用、取消不降速
+"""
+import sys
+import asyncio
+
+import pytest
+
+from rate_limit import AdaptiveLimiter
+
+
+async def contend(limiter: AdaptiveLimiter, workers: int = 3):
+    """workers 个协程争用名额，返回同时持有名额的最大数量"""
+    holding = peak = 0
+
+    async def worker():
+        nonlocal holding, peak
+        async with limiter.slot():
+            holding += 1
+            peak = max(peak, holding)
+            await asyncio.sleep(0.01)
+            holding -= 1
+
+    await asyncio.gather(*[worker() for _ in range(workers)])
+    return peak
+
+
+def test_reused_across_event_loops():
+    limiter = AdaptiveLimiter(initial=1, max_limit=1)
+    # 第二次 asyncio.run 在有争用时不能因 Condition 绑定旧事件循环而出错
+    for _ in range(3):
+        assert asyncio.run(contend(limiter)) == 1
+    assert limiter.in_flight == 0
+
+
+def test_cancel_does_not_lower_limit():
+    limiter = AdaptiveLimiter(initial=4, max_limit=8)
+
+    async def run():
+        async def hold():
+            async with limiter.slot():
+                await asyncio.sleep(10)
+
+        tasks = [asyncio.create_task(hold()) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(run())
+    assert limiter.in_flight == 0
+    assert limiter.limit == 4 and limiter.decreases == 0
+
+
+def test_failure_lowers_limit_once_per_round():
+    limiter = AdaptiveLimiter(initial=4, max_limit=8)
+
+    async def run():
+        async def fail():
+            async with limiter.slot() as slot:
+                await asyncio.sleep(0.01)
+                slot.fail(throttled=True)
+
+        await asyncio.gather(*[fail() for _ in range(4)])
+
+    asyncio.run(run())
+    assert limiter.limit == 2 and limiter.decreases == 1
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -3,10 +3,13 @@
 测试语义相似度去重
 """
 import re
-from sentence_transformers import SentenceTransformer
+from pathlib import Path
 import numpy as np
 from typing import List, Dict, Tuple
 
+from embedding_cache import EmbeddingStore
+from model_registry import get_sentence_model
+
 def parse_part1_text(content: str) -> List[Dict[str, str]]:
     """
     解析 Part1 文本，提取话题、问题和回答
@@ -83,13 +86,11 @@ def parse_part1_text(content: str) -> List[Dict[str, str]]:
     print(f"✓ 解析到 {len(qa_pairs)} 个问题-回答对")
     return qa_pairs
 
-# 加载模型
-print("加载 sentence-transformers 模型...")
-model = SentenceTransformer('all-MiniLM-L6-v2')
+embedding_store = EmbeddingStore(Path(".cache") / "embeddings", 'all-MiniLM-L6-v2')
 
 def compute_embeddings(sentences: List[str]) -> np.ndarray:
     """计算句子嵌入"""
-    return model.encode(sentences, convert_to_tensor=False)  # 返回 numpy 数组
+    return embedding_store.encode(sentences, lambda: get_sentence_model('all-MiniLM-L6-v2'))  # 返回 numpy 数组
 
 def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
     """计算余弦相似度"""
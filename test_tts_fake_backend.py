@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+用本地假 TTS 后端压测音频生成流程（无需网络）
+注入限流和网络错误，检查自适应并发、重试和批量切分后每个句子都得到有效音频
+"""
+import sys
+import time
+import asyncio
+
+import pytest
+
+from mp3_utils import validate_mp3
+from rate_limit import AdaptiveLimiter
+from tts_backends import FakeTTSBackend
+from tts_batch import BatchSynthesizer
+from tts_retry import RetryPolicy
+from tts_stream import TTSMetrics
+
+
+def make_sentences(n: int):
+    """生成 n 个互不相同的测试句子"""
+    words = ["travel", "music", "weekend", "family", "reading", "coffee", "weather", "city"]
+    return [{
+        'english': f"Sentence {i} is about {words[i % len(words)]} and {words[(i * 3) % len(words)]}.",
+        'chinese': f"句子 {i}",
+        'keywords': words[i % len(words)],
+    } for i in range(n)]
+
+
+def run_once(g, monkeypatch, batch_mode: bool, n: int = 300) -> int:
+    """
+    注入限流和网络错误后跑一遍 generate_all_audio
+
+    Returns:
+        得到有效音频的句子数
+    """
+    backend = FakeTTSBackend(latency=0.02, jitter=0.02, error_rate=0.05, capacity=6, seed=1)
+    metrics = TTSMetrics()
+    monkeypatch.setattr(g, "TTS_BACKEND", backend)
+    monkeypatch.setattr(g, "TTS_METRICS", metrics)
+    monkeypatch.setattr(g, "TTS_BATCHER", BatchSynthesizer(g.VOICE, g.RATE, g.PITCH, metrics=metrics, backend=backend))
+    monkeypatch.setattr(g, "TTS_BATCH_MODE", batch_mode)
+    monkeypatch.setattr(g, "TTS_LIMITER", AdaptiveLimiter(initial=3, max_limit=16))
+    monkeypatch.setattr(g, "TTS_RETRY_POLICY", RetryPolicy(max_attempts=6, base_delay=0.05, max_delay=0.5))
+
+    start = time.perf_counter()
+    results = asyncio.run(g.generate_all_audio(make_sentences(n)))
+    elapsed = time.perf_counter() - start
+
+    print(f"假后端: {backend.summary()}，耗时 {elapsed:.2f}s")
+    return sum(1 for path in results if path is not None and validate_mp3(path.read_bytes()) is None)
+
+
+def test_per_sentence(part1, monkeypatch):
+    assert run_once(part1, monkeypatch, batch_mode=False) == 300
+
+
+def test_batched(part1, monkeypatch):
+    assert run_once(part1, monkeypatch, batch_mode=True) == 300
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
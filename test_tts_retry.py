@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TTS 重试策略：失败分类，以及哪些失败会被判定为永久失败
+"""
+import sys
+import asyncio
+
+import aiohttp
+import pytest
+from edge_tts.exceptions import NoAudioReceived
+
+from rate_limit import AdaptiveLimiter
+from tts_retry import (RetryPolicy, run_with_retry, classify_tts_error,
+                       RETRYABLE, PERMANENT, INVALID)
+
+POLICY = RetryPolicy(max_attempts=3, base_delay=0.0)
+
+
+def run(errors):
+    """依次抛出 errors 中的异常（None 表示成功），返回 (失败类型, 尝试次数)"""
+    calls = 0
+
+    async def attempt():
+        nonlocal calls
+        error = errors[min(calls, len(errors) - 1)]
+        calls += 1
+        if error is not None:
+            raise error
+
+    kind, _ = asyncio.run(run_with_retry(attempt, POLICY, AdaptiveLimiter()))
+    return kind, calls
+
+
+def test_classify():
+    assert classify_tts_error(NoAudioReceived("no audio")) == RETRYABLE
+    assert classify_tts_error(TypeError("unexpected keyword 'boundary'")) == INVALID
+    assert classify_tts_error(ValueError("invalid voice")) == INVALID
+    assert classify_tts_error(aiohttp.ClientConnectionError()) == RETRYABLE
+
+
+def test_transient_no_audio_is_retried():
+    assert run([NoAudioReceived("no audio"), None]) == (None, 2)
+
+
+def test_no_audio_on_every_attempt_is_permanent():
+    assert run([NoAudioReceived("no audio")]) == (PERMANENT, 3)
+
+
+def test_mixed_failures_are_not_permanent():
+    kind, calls = run([NoAudioReceived("no audio"), aiohttp.ClientConnectionError(), NoAudioReceived("no audio")])
+    assert kind == RETRYABLE and calls == 3
+
+
+def test_invalid_arguments_stop_without_persisting():
+    assert run([TypeError("unexpected keyword 'boundary'")]) == (INVALID, 1)
+
+
+def test_invalid_arguments_leave_limit_unchanged():
+    limiter = AdaptiveLimiter(initial=3, max_limit=8)
+
+    async def attempt():
+        raise ValueError("invalid voice")
+
+    for _ in range(5):
+        kind, _ = asyncio.run(run_with_retry(attempt, POLICY, limiter))
+        assert kind == INVALID
+    # 参数错误既不降速，也不作为成功让并发上限增加
+    assert limiter.limit == 3 and limiter.decreases == 0
+    assert limiter.in_flight == 0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
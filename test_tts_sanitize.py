@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TTS 文本预处理：空白、全角标点和无法朗读的文本
+"""
+import sys
+
+import pytest
+
+from tts_sanitize import sanitize_for_tts
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("I like reading.\nIt helps me relax.", "I like reading. It helps me relax."),
+    ("Hello\tworld", "Hello world"),
+    ("Hello  world ,  again", "Hello world, again"),
+    ("Wait,what?Yes", "Wait,what?Yes"),             # 普通 ASCII 标点不补空格
+    ("I love it！Really，yes", "I love it! Really, yes"),
+    ("“Hi” — she said…", "\"Hi\", she said..."),
+    ("I like tea 我喜欢茶 a lot", "I like tea a lot"),
+    ("Great day 😀", "Great day"),
+])
+def test_sanitize(text, expected):
+    assert sanitize_for_tts(text)[0] == expected
+
+
+def test_change_labels():
+    assert sanitize_for_tts("Hello\tworld")[1] == ["合并多余空白"]
+    assert sanitize_for_tts("Wait,what?Yes")[1] == []
+    assert "全角标点后补空格" in sanitize_for_tts("Really，yes")[1]
+
+
+@pytest.mark.parametrize("text", ["", "   ", "我喜欢茶", "😀 ！"])
+def test_rejected(text):
+    assert sanitize_for_tts(text)[0] is None
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可替换的 TTS 后端
+- edge: 真实的 Edge-TTS 服务（默认）
+- fake: 本地确定性假后端，按文本生成静音 MP3 帧和 WordBoundary/SentenceBoundary 事件，
+        可配置延迟、容量和错误注入，用于离线测试和压测并发/重试逻辑
+
+两者都通过 communicate(...) 返回带 async stream() 方法的对象，接口与 edge_tts.Communicate 相同
+"""
+
+import os
+import re
+import random
+import asyncio
+import hashlib
+from typing import AsyncGenerator, Dict, Optional
+
+import aiohttp
+import edge_tts
+import yarl
+from edge_tts.exceptions import NoAudioReceived
+from multidict import CIMultiDict, CIMultiDictProxy
+
+
+class EdgeTTSBackend:
+    """Edge-TTS 在线服务"""
+
+    name = "edge"
+
+    def communicate(self, text: str, voice: str, rate: str = "+0%", pitch: str = "+0Hz",
+                    boundary: str = "SentenceBoundary") -> edge_tts.Communicate:
+        return edge_tts.Communicate(text, voice, rate=rate, pitch=pitch, boundary=boundary)
+
+
+# MPEG-2 Layer III、48kbps、24kHz、单声道、无填充：与 Edge-TTS 输出格式相同，每帧 144 字节、24ms
+_FRAME_HEADER = bytes([0xFF, 0xF3, 0x64, 0xC4])
+SILENT_FRAME = _FRAME_HEADER + bytes(140)  # 边信息全为 0，解码为静音
+FRAME_TICKS = 240_000  # 每帧时长（100ns 为单位）
+_FAKE_URL = yarl.URL("wss://fake-tts.local/")
+
+
+def _throttled_error() -> aiohttp.WSServerHandshakeError:
+    """构造与真实服务相同类型的 429 握手错误"""
+    info = aiohttp.RequestInfo(_FAKE_URL, "GET", CIMultiDictProxy(CIMultiDict()), _FAKE_URL)
+    return aiohttp.WSServerHandshakeError(info, (), status=429, message="Too Many Requests")
+
+
+class _FakeCommunicate:
+    """FakeTTSBackend.communicate() 返回的对象"""
+
+    def __init__(self, backend: "FakeTTSBackend", text: str, boundary: str):
+        self._backend = backend
+        self._text = text
+        self._boundary = boundary
+
+    async def stream(self) -> AsyncGenerator[Dict, None]:
+        backend = self._backend
+        backend.requests += 1
+        backend.in_flight += 1
+        try:
+            backend.peak_in_flight = max(backend.peak_in_flight, backend.in_flight)
+            await asyncio.sleep(backend.latency + backend.rng.uniform(0, backend.jitter))
+
+            # 超过容量或随机注入的限流/网络错误
+            if backend.capacity and backend.in_flight > backend.capacity:
+                backend.errors += 1
+                raise _throttled_error()
+            roll = backend.rng.random()
+            if roll < backend.throttle_rate:
+                backend.errors += 1
+                raise _throttled_error()
+            if roll < backend.throttle_rate + backend.error_rate:
+                backend.errors += 1
+                raise aiohttp.ClientConnectionError("fake backend: connection reset")
+
+            events = backend.render(self._text, self._boundary)
+            if not events:
+                raise NoAudioReceived("No audio was received. Please verify that your parameters are correct.")
+            for event in events:
+                yield event
+        finally:
+            backend.in_flight -= 1
+
+
+class FakeTTSBackend:
+    """
+    确定性的本地假后端
+
+    同一文本总是生成相同的音频：每个词按长度生成若干静音帧，句间插入停顿，
+    并按真实服务的格式产生 WordBoundary 或 SentenceBoundary 事件
+    """
+
+    name = "fake"
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0,
+                 capacity: int = 0, seed: int = 0):
+        """
+        Args:
+            latency: 每次请求的固定延迟（秒）
+            jitter: 额外随机延迟的上限（秒）
+            error_rate: 随机网络错误的概率
+            throttle_rate: 随机 429 限流的概率
+            capacity: 同时处理的请求数上限，超过时返回 429；0 表示不限
+            seed: 随机种子（延迟抖动和错误注入可复现）
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.capacity = capacity
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def communicate(self, text: str, voice: str, rate: str = "+0%", pitch: str = "+0Hz",
+                    boundary: str = "SentenceBoundary") -> _FakeCommunicate:
+        return _FakeCommunicate(self, text, boundary)
+
+    @staticmethod
+    def render(text: str, boundary: str = "SentenceBoundary"):
+        """
+        生成音频块和边界事件
+
+        Returns:
+            事件列表（与 edge_tts 的 stream() 输出格式相同）；没有可朗读的词时返回空列表
+        """
+        events = []
+        frames = 4  # 开头的静音
+        for sentence in re.split(r'(?<=[.!?])\s+', text.strip()):
+            words = re.findall(r"[A-Za-z0-9][A-Za-z0-9'’-]*", sentence)
+            if not words:
+                continue
+            sentence_start = frames
+            for word in words:
+                # 词长决定时长，再加上由文本哈希决定的少量变化，保证确定性
+                n = 6 + 2 * len(word) + hashlib.md5(word.encode()).digest()[0] % 3
+                if boundary == "WordBoundary":
+                    events.append({"type": "WordBoundary", "offset": frames * FRAME_TICKS,
+                                   "duration": n * FRAME_TICKS, "text": word})
+                events.append({"type": "audio", "data": SILENT_FRAME * n})
+                frames += n
+            if boundary != "WordBoundary":
+                events.append({"type": "SentenceBoundary", "offset": sentence_start * FRAME_TICKS,
+                               "duration": (frames - sentence_start) * FRAME_TICKS, "text": sentence})
+            events.append({"type": "audio", "data": SILENT_FRAME * 10})  # 句间停顿
+            frames += 10
+        return events
+
+    def summary(self) -> str:
+        """返回假后端的请求统计"""
+        return f"{self.requests} 次请求，注入错误 {self.errors} 次，最大同时请求 {self.peak_in_flight}"
+
+
+def get_backend(name: Optional[str] = None):
+    """
+    按名称创建后端；未指定时读取环境变量 TTS_BACKEND（默认 edge）
+
+    fake 后端的参数从环境变量读取：
+    TTS_FAKE_LATENCY, TTS_FAKE_JITTER, TTS_FAKE_ERROR_RATE,
+    TTS_FAKE_THROTTLE_RATE, TTS_FAKE_CAPACITY, TTS_FAKE_SEED
+    """
+    name = (name or os.getenv("TTS_BACKEND") or "edge").lower()
+    if name == "edge":
+        return EdgeTTSBackend()
+    if name == "fake":
+        return FakeTTSBackend(
+            latency=float(os.getenv("TTS_FAKE_LATENCY", "0.05")),
+            jitter=float(os.getenv("TTS_FAKE_JITTER", "0")),
+            error_rate=float(os.getenv("TTS_FAKE_ERROR_RATE", "0")),
+            throttle_rate=float(os.getenv("TTS_FAKE_THROTTLE_RATE", "0")),
+            capacity=int(os.getenv("TTS_FAKE_CAPACITY", "0")),
+            seed=int(os.getenv("TTS_FAKE_SEED", "0")),
+        )
+    raise ValueError(f"未知的 TTS 后端: {name}（可选 edge / fake）")
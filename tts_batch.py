@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Edge-TTS 批量合成
+把多个句子拼成一次请求，根据 WordBoundary 事件的时间戳把返回的音频
+切成每句一个 MP3，显著减少 WebSocket 连接数；对不齐时返回 None，由调用方逐句回退
+"""
+
+import re
+import time
+from typing import List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from mp3_utils import split_at_times, validate_mp3, duration_seconds
+from tts_stream import InvalidAudioError, StreamStats, TTSMetrics
+from tts_backends import EdgeTTSBackend
+
+
+TICKS_PER_SECOND = 10_000_000  # WordBoundary 的 offset/duration 单位为 100ns
+# edge_tts 会把超过 4096 字节（XML 转义后）的文本拆成多次请求，留出余量保证一批只连接一次
+MAX_BATCH_BYTES = 4000
+
+
+def _alnum(text: str) -> str:
+    """只保留小写字母和数字，用于把句子与 WordBoundary 文本对齐"""
+    return re.sub(r'[^0-9a-z]', '', text.lower())
+
+
+def align_sentences(sentences: List[str],
+                    boundaries: List[Tuple[int, int, str]]) -> Optional[List[Tuple[int, int]]]:
+    """
+    把 WordBoundary 事件按顺序分配给各个句子
+
+    逐字符比较（忽略大小写、空白和标点），因此不依赖服务端的分词方式
+
+    Args:
+        sentences: 拼接前的句子列表
+        boundaries: [(offset, duration, text), ...]，按时间顺序
+
+    Returns:
+        每个句子的 (首词开始, 末词结束) 时间（100ns）；无法完全对齐时返回 None
+    """
+    spans = []
+    j = 0
+    for sentence in sentences:
+        target = _alnum(sentence)
+        matched = ""
+        first, last = None, None
+        while len(matched) < len(target) and j < len(boundaries):
+            offset, duration, text = boundaries[j]
+            j += 1
+            piece = _alnum(text)
+            if not piece:
+                continue
+            matched += piece
+            if not target.startswith(matched):
+                return None
+            if first is None:
+                first = offset
+            last = offset + duration
+        if not target or matched != target:
+            return None
+        spans.append((first, last))
+
+    # 多出来的事件说明服务端朗读的内容与输入不一致
+    if any(_alnum(text) for _, _, text in boundaries[j:]):
+        return None
+    return spans
+
+
+class BatchSynthesizer:
+    """把多个句子合并成一次 Edge-TTS 请求并切分音频"""
+
+    def __init__(self, voice: str, rate: str = "+0%", pitch: str = "+0Hz",
+                 max_bytes: int = MAX_BATCH_BYTES, max_sentences: int = 40,
+                 metrics: Optional[TTSMetrics] = None, backend=None):
+        """
+        Args:
+            voice: Edge-TTS 语音
+            rate: 语速
+            pitch: 音调
+            max_bytes: 每批文本（XML 转义后）的最大字节数
+            max_sentences: 每批最多句子数（限制单次失败的影响范围）
+            metrics: 记录每次请求字节数和首字节延迟的统计器
+            backend: TTS 后端（见 tts_backends），默认为 Edge-TTS
+        """
+        self.voice = voice
+        self.rate = rate
+        self.pitch = pitch
+        self.max_bytes = max_bytes
+        self.max_sentences = max_sentences
+        self.metrics = metrics
+        self.backend = backend or EdgeTTSBackend()
+        self.requests = 0  # 发出的批量请求数
+        self.sentences = 0  # 批量合成成功的句子数
+        self.misaligned = 0  # 因无法对齐而回退的批次数
+
+    @staticmethod
+    def _join_text(text: str) -> str:
+        """句末补句号，保证拼接后句间有自然停顿"""
+        return text if text[-1] in ".!?" else text + "."
+
+    def plan(self, texts: List[str]) -> List[List[int]]:
+        """
+        按字节数和句子数把文本分批
+
+        Returns:
+            每批的下标列表（保持原顺序）
+        """
+        batches, current, size = [], [], 0
+        for i, text in enumerate(texts):
+            n = len(escape(self._join_text(text)).encode('utf-8')) + 1
+            if current and (size + n > self.max_bytes or len(current) >= self.max_sentences):
+                batches.append(current)
+                current, size = [], 0
+            current.append(i)
+            size += n
+        if current:
+            batches.append(current)
+        return batches
+
+    async def synthesize(self, texts: List[str]) -> Optional[List[bytes]]:
+        """
+        一次请求合成多个句子，并按句切分
+
+        Args:
+            texts: 同一批的句子（已预处理）
+
+        Returns:
+            每句的 MP3 字节；时间戳无法与句子对齐时返回 None
+
+        Raises:
+            InvalidAudioError: 返回的音频无效（可重试）
+            网络或服务端错误原样抛出，由重试策略处理
+        """
+        joined = " ".join(self._join_text(t) for t in texts)
+        communicate = self.backend.communicate(joined, self.voice, rate=self.rate, pitch=self.pitch,
+                                               boundary="WordBoundary")
+        self.requests += 1
+
+        stats = StreamStats(f"batch:{len(texts)}")
+        start = time.monotonic()
+        audio = bytearray()
+        boundaries = []
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                if stats.ttfb is None:
+                    stats.ttfb = time.monotonic() - start
+                audio.extend(chunk["data"])
+            elif chunk["type"] == "WordBoundary":
+                boundaries.append((chunk["offset"], chunk["duration"], chunk["text"]))
+        stats.elapsed = time.monotonic() - start
+        stats.bytes = len(audio)
+
+        audio = bytes(audio)
+        problem = validate_mp3(audio)
+        if problem is not None:
+            raise InvalidAudioError(f"批量 {len(texts)} 句: {problem}")
+        stats.duration = duration_seconds(audio)
+        if self.metrics is not None:
+            self.metrics.record(stats)
+
+        spans = align_sentences(texts, boundaries)
+        segments = None
+        if spans is not None:
+            # 在相邻两句的停顿中点切分，每段各分得一半停顿
+            cuts = [(prev_end + next_start) / 2 / TICKS_PER_SECOND
+                    for (_, prev_end), (next_start, _) in zip(spans, spans[1:])]
+            segments = split_at_times(audio, cuts)
+        # 任何一段无效都整批回退，保证写入卡片的每个文件都可播放
+        if segments is not None and any(validate_mp3(seg) for seg in segments):
+            segments = None
+
+        if segments is None:
+            self.misaligned += 1
+            return None
+        self.sentences += len(texts)
+        return segments
+
+    def summary(self) -> str:
+        """返回本次运行的批量合成统计"""
+        return f"{self.requests} 次请求合成 {self.sentences} 句，{self.misaligned} 批无法对齐已逐句回退"
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Edge-TTS 重试策略
+把失败分为 可重试 / 被限流 / 参数错误 三类：
+可重试与被限流的请求按带抖动的指数退避重试，参数错误立即放弃；
+只有确实由文本本身导致的失败（每次尝试服务端都没有返回音频）才判定为永久失败，
+记录到本地 JSON 文件中，之后的运行不再重复请求
+"""
+
+import json
+import time
+import random
+import asyncio
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import aiohttp
+from edge_tts.exceptions import NoAudioReceived
+
+from rate_limit import AdaptiveLimiter
+
+
+RETRYABLE = "retryable"  # 网络抖动、超时、服务端 5xx、偶发的未返回音频等，稍后重试可能成功
+PERMANENT = "permanent"  # 文本本身无法合成：每次尝试服务端都没有返回音频（由 run_with_retry 判定）
+THROTTLED = "throttled"  # 被服务端限流，需要更长的等待
+INVALID = "invalid"      # 参数或代码错误（语音、语速格式等），重试结果相同，但与文本无关，不记录
+
+
+def classify_tts_error(exc: BaseException) -> str:
+    """
+    判断 TTS 失败的类型
+
+    Args:
+        exc: 合成时抛出的异常
+
+    Returns:
+        RETRYABLE / THROTTLED / INVALID 之一
+    """
+    if isinstance(exc, NoAudioReceived):
+        # 服务端没有返回音频：可能是文本无法朗读，也可能是服务端偶发问题，先重试
+        return RETRYABLE
+    if isinstance(exc, (ValueError, TypeError)):
+        # Communicate 参数校验失败或调用方式错误（如 edge-tts 版本不符），重试结果相同，
+        # 但问题不在文本本身，不能记为永久失败
+        return INVALID
+    if isinstance(exc, aiohttp.ClientResponseError):
+        if exc.status in (429, 503):
+            return THROTTLED
+        return RETRYABLE
+    return RETRYABLE
+
+
+class RetryPolicy:
+    """带完全抖动（full jitter）的指数退避策略"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5,
+                 max_delay: float = 8.0, throttle_multiplier: float = 4.0):
+        """
+        Args:
+            max_attempts: 最大尝试次数（含第一次）
+            base_delay: 第一次重试的退避上限（秒）
+            max_delay: 单次退避的最大值（秒）
+            throttle_multiplier: 被限流时退避时间的放大倍数
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.throttle_multiplier = throttle_multiplier
+
+    def delay(self, attempt: int, kind: str) -> float:
+        """
+        计算第 attempt 次失败（从 0 开始）后的等待时间
+
+        在 [0, min(max_delay, base_delay * 2**attempt)] 中随机取值，
+        避免大量并发请求在同一时刻集中重试
+        """
+        cap = self.base_delay * (2 ** attempt)
+        if kind == THROTTLED:
+            cap *= self.throttle_multiplier
+        return random.uniform(0, min(self.max_delay, cap))
+
+
+class PermanentFailureStore:
+    """
+    永久失败记录（JSON 文件）
+
+    键与音频缓存相同（文本 + 语音参数），因此修改文本或语音后会重新尝试
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._entries: Optional[Dict[str, Dict]] = None
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._entries is None:
+            self._entries = {}
+            if self.path.exists():
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._entries = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"  警告: 永久失败记录损坏，将重新记录: {e}")
+        return self._entries
+
+    def get(self, key: str) -> Optional[Dict]:
+        """返回已记录的失败信息，未记录返回 None"""
+        return self._load().get(key)
+
+    def add(self, key: str, text: str, reason: str) -> None:
+        """记录一条永久失败并立即写回文件"""
+        entries = self._load()
+        entries[key] = {"text": text, "reason": reason, "failed_at": time.time()}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+        tmp_path.replace(self.path)
+
+    def clear(self) -> int:
+        """清空所有记录，返回清除的条数"""
+        count = len(self._load())
+        self._entries = {}
+        if self.path.exists():
+            self.path.unlink()
+        return count
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+
+async def run_with_retry(attempt: Callable[[], Awaitable[None]],
+                         policy: RetryPolicy,
+                         limiter: AdaptiveLimiter,
+                         label: str = "") -> Tuple[Optional[str], Optional[BaseException]]:
+    """
+    按重试策略执行一次 TTS 合成
+
+    每次尝试单独占用一个并发名额；可重试/限流失败会让限制器降速，
+    参数错误既不降速也不计为成功（问题不在服务端）。所有尝试都以“未返回音频”失败时，
+    判定为文本本身无法合成，返回 PERMANENT，由调用方记录
+
+    Args:
+        attempt: 执行一次合成的协程函数，失败时抛出异常
+        policy: 重试策略
+        limiter: 自适应并发限制器
+        label: 日志中显示的名称（如文件名）
+
+    Returns:
+        (失败类型, 最后一次异常)；成功时为 (None, None)
+    """
+    kind, error = None, None
+    no_audio = 0  # 服务端未返回音频的次数
+    for n in range(policy.max_attempts):
+        async with limiter.slot() as slot:
+            try:
+                await attempt()
+                return None, None
+            except Exception as e:
+                kind, error = classify_tts_error(e), e
+                if isinstance(e, NoAudioReceived):
+                    no_audio += 1
+                if kind == INVALID:
+                    slot.ignore()
+                else:
+                    slot.fail(throttled=(kind == THROTTLED))
+
+        if kind == INVALID:
+            print(f"  ✗ 参数错误，不再重试 ({label}): {error}")
+            break
+        if n < policy.max_attempts - 1:
+            wait = policy.delay(n, kind)
+            print(f"  重试 {n + 1}/{policy.max_attempts - 1} ({label}, {kind}, 等待 {wait:.1f}s): {error}")
+            await asyncio.sleep(wait)
+    if no_audio == policy.max_attempts:
+        print(f"  ✗ {no_audio} 次尝试均未返回音频，判定为无法合成 ({label})")
+        kind = PERMANENT
+    return kind, error
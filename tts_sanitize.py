@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TTS 文本预处理
+在请求 Edge-TTS 之前规范化全角标点、智能引号、中文字符等，
+并直接拒绝空文本或无法朗读的文本，避免无谓的网络请求和重试
+"""
+
+import re
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+# 智能引号、破折号等 → ASCII（NFKC 不会处理这些字符）
+_PUNCT_MAP = {
+    "‘": "'", "’": "'", "‚": "'", "‛": "'",
+    "“": '"', "”": '"', "„": '"', "‟": '"',
+    "′": "'", "″": '"',
+    "–": "-", "—": ", ", "―": ", ",
+    "…": "...",
+    "、": ", ", "。": ". ",  # 中文顿号、句号（NFKC 不转换）
+    "《": '"', "》": '"', "「": '"', "」": '"',
+    "『": '"', "』": '"', "【": "(", "】": ")",
+}
+
+# 中日韩文字及其标点
+_CJK_RE = re.compile(r'[\u2e80-\u2fff\u3000-\u303f\u3040-\u30ff\u3100-\u31ff'
+                     r'\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+')
+_SPEAKABLE_RE = re.compile(r'[A-Za-z0-9]')
+# 全角逗号、分号、冒号、感叹号、问号（其后通常不带空格）
+_FULLWIDTH_PUNCT_RE = re.compile(r'[，；：！？]')
+
+
+def _is_dropped(ch: str) -> bool:
+    """控制字符、表情符号等无法朗读的符号（换行、制表符等空白保留，之后合并为空格）"""
+    if ch.isspace():
+        return False
+    category = unicodedata.category(ch)
+    return category[0] == 'C' or category == 'So'
+
+
+def sanitize_for_tts(text: str) -> Tuple[Optional[str], List[str]]:
+    """
+    规范化要朗读的英文文本
+
+    Args:
+        text: 原始英文句子
+
+    Returns:
+        (处理后的文本, 修改说明列表)；文本无法朗读时返回 (None, [拒绝原因])
+    """
+    changes = []
+    if not text or not text.strip():
+        return None, ["空文本"]
+
+    # 全角字母、数字、标点 → 半角（，→ ,  ！→ !  Ａ → A）
+    normalized = unicodedata.normalize("NFKC", text)
+    if normalized != text:
+        changes.append("全角字符转半角")
+
+    mapped = "".join(_PUNCT_MAP.get(ch, ch) for ch in normalized)
+    if mapped != normalized:
+        changes.append("智能引号/破折号/中文标点转 ASCII")
+
+    removed_cjk = _CJK_RE.findall(mapped)
+    if removed_cjk:
+        mapped = _CJK_RE.sub(" ", mapped)
+        changes.append(f"删除中文字符: {''.join(removed_cjk)}")
+
+    kept = "".join(ch for ch in mapped if not _is_dropped(ch))
+    if kept != mapped:
+        changes.append("删除控制字符/表情符号")
+
+    # 合并空白，并去掉标点前多余的空格（"word ," → "word,"）
+    cleaned = re.sub(r'\s+', ' ', kept).strip()
+    cleaned = re.sub(r'\s+([,.!?;:])', r'\1', cleaned)
+    cleaned = re.sub(r'([,;:])\1+', r'\1', cleaned)
+    if cleaned != kept and not changes:
+        changes.append("合并多余空白")
+
+    # 全角标点转成半角后补上空格（"好，then" → ", then"）；原文没有全角标点时不改动
+    if _FULLWIDTH_PUNCT_RE.search(text):
+        spaced = re.sub(r'([,;:!?])(?=[A-Za-z])', r'\1 ', cleaned)
+        if spaced != cleaned:
+            changes.append("全角标点后补空格")
+            cleaned = spaced
+
+    if not _SPEAKABLE_RE.search(cleaned):
+        return None, changes + ["没有可朗读的英文字母或数字"]
+    return cleaned, changes
+
+
+class SanitizeReport:
+    """记录每个句子的预处理结果，并写入日志文件"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Optional[str], List[str]]] = {}
+
+    def sanitize(self, text: str) -> Optional[str]:
+        """
+        处理文本并记录修改（同一文本只记录一次）
+
+        Returns:
+            处理后的文本；无法朗读时返回 None
+        """
+        cleaned, changes = sanitize_for_tts(text)
+        if changes:
+            self._entries[text] = (cleaned, changes)
+        return cleaned
+
+    @property
+    def changed(self) -> int:
+        return sum(1 for cleaned, _ in self._entries.values() if cleaned is not None)
+
+    @property
+    def rejected(self) -> int:
+        return sum(1 for cleaned, _ in self._entries.values() if cleaned is None)
+
+    def summary(self) -> str:
+        return f"修改 {self.changed} 句，拒绝 {self.rejected} 句"
+
+    def write(self, path: Path) -> None:
+        """把修改记录写入文本文件（没有修改时不写）"""
+        if not self._entries:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"TTS 预处理记录 ({self.summary()}):\n\n")
+            for original, (cleaned, changes) in self._entries.items():
+                f.write(f"原文: {original}\n")
+                f.write(f"处理后: {cleaned if cleaned is not None else '(拒绝)'}\n")
+                f.write(f"修改: {'; '.join(changes)}\n")
+                f.write("-" * 80 + "\n")
+        print(f"  TTS 预处理记录已保存到: {path}")
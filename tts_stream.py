@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Edge-TTS 流式写入
+替代 communicate.save()：边接收边写入临时文件，fsync 后校验 MP3 再原子重命名，
+同时记录每次请求的字节数、首字节延迟（TTFB）和总耗时
+"""
+
+import os
+import csv
+import time
+import tempfile
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from mp3_utils import validate_mp3, duration_seconds
+
+
+MIN_AUDIO_SECONDS = 0.2  # 短于此时长的音频视为截断
+
+
+class InvalidAudioError(Exception):
+    """合成结果不是有效的 MP3（为空、缺少帧头或时长过短）"""
+
+
+class StreamStats:
+    """单次 TTS 请求的统计"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.bytes = 0
+        self.ttfb: Optional[float] = None  # 首个音频块到达的耗时（秒）
+        self.elapsed = 0.0  # 请求总耗时（秒）
+        self.duration = 0.0  # 音频时长（秒）
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """写入临时文件并 fsync，再原子替换目标文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+
+
+async def stream_to_file(communicate, path: Path, min_duration: float = MIN_AUDIO_SECONDS) -> StreamStats:
+    """
+    把 communicate.stream() 的音频块写入 path
+
+    数据先写入同目录的临时文件，fsync 并校验通过后才重命名为 path，
+    因此 path 要么不存在，要么是完整有效的 MP3
+
+    Args:
+        communicate: edge_tts.Communicate 实例
+        path: 输出文件路径
+        min_duration: 最短有效时长（秒）
+
+    Returns:
+        本次请求的统计
+
+    Raises:
+        InvalidAudioError: 收到的音频无效（可重试）
+    """
+    stats = StreamStats(path.name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    start = time.monotonic()
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            async for chunk in communicate.stream():
+                if chunk["type"] != "audio":
+                    continue
+                if stats.ttfb is None:
+                    stats.ttfb = time.monotonic() - start
+                f.write(chunk["data"])
+                stats.bytes += len(chunk["data"])
+            f.flush()
+            os.fsync(f.fileno())
+        stats.elapsed = time.monotonic() - start
+
+        with open(tmp_name, 'rb') as f:
+            data = f.read()
+        problem = validate_mp3(data, min_duration)
+        if problem is not None:
+            raise InvalidAudioError(f"{path.name}: {problem}")
+        stats.duration = duration_seconds(data)
+        os.replace(tmp_name, path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+    return stats
+
+
+class TTSMetrics:
+    """收集每次 TTS 请求的统计，输出汇总和逐句 CSV"""
+
+    def __init__(self):
+        self.records: List[StreamStats] = []
+
+    def record(self, stats: StreamStats) -> None:
+        self.records.append(stats)
+
+    @staticmethod
+    def _percentile(values: List[float], q: float) -> float:
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def latency(self) -> Tuple[float, float]:
+        """返回首字节延迟的 (p50, p95)，单位秒"""
+        ttfbs = [r.ttfb for r in self.records if r.ttfb is not None]
+        if not ttfbs:
+            return 0.0, 0.0
+        return self._percentile(ttfbs, 0.5), self._percentile(ttfbs, 0.95)
+
+    def summary(self) -> str:
+        """返回汇总说明"""
+        if not self.records:
+            return "无请求"
+        p50, p95 = self.latency()
+        total_kb = sum(r.bytes for r in self.records) / 1024
+        return (f"{len(self.records)} 次请求，首字节 p50 {p50 * 1000:.0f}ms / p95 {p95 * 1000:.0f}ms，"
+                f"共 {total_kb:.0f} KB")
+
+    def write_csv(self, path: Path) -> None:
+        """把逐次请求的统计写入 CSV（没有请求时不写）"""
+        if not self.records:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["file", "bytes", "ttfb_ms", "elapsed_ms", "audio_seconds"])
+            for r in self.records:
+                ttfb = "" if r.ttfb is None else f"{r.ttfb * 1000:.0f}"
+                writer.writerow([r.label, r.bytes, ttfb, f"{r.elapsed * 1000:.0f}", f"{r.duration:.2f}"])
+        print(f"  TTS 请求统计已保存到: {path}")